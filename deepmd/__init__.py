@@ -1,5 +1,13 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
-"""Root of the deepmd package, exposes all public classes and submodules."""
+"""Root of the deepmd package, exposes all public classes and submodules.
+
+The submodules and classes are imported on first access, so that importing
+this package does not load TensorFlow.
+"""
+
+from typing import (
+    TYPE_CHECKING,
+)
 
 try:
     from importlib import (
@@ -8,25 +16,41 @@ try:
 except ImportError:  # for Python<3.8
     import importlib_metadata as metadata
 
-import deepmd.utils.network as network
-
-from . import (
-    cluster,
-    descriptor,
-    fit,
-    loss,
-    nvnmd,
-    utils,
-)
 from .env import (
     set_mkl,
 )
-from .infer import (
-    DeepEval,
-    DeepPotential,
+from .utils.lazy import (
+    lazy_import,
 )
-from .infer.data_modifier import (
-    DipoleChargeModifier,
+
+if TYPE_CHECKING:
+    import deepmd.utils.network as network
+
+    from . import (
+        cluster,
+        descriptor,
+        fit,
+        loss,
+        nvnmd,
+        utils,
+    )
+    from .infer import (
+        DeepEval,
+        DeepPotential,
+    )
+    from .infer.data_modifier import (
+        DipoleChargeModifier,
+    )
+
+__getattr__, __dir__ = lazy_import(
+    __name__,
+    submodules=["cluster", "descriptor", "fit", "loss", "nvnmd", "utils"],
+    attrs={
+        "network": ".utils",
+        "DeepEval": ".infer",
+        "DeepPotential": ".infer",
+        "DipoleChargeModifier": ".infer.data_modifier",
+    },
 )
 
 set_mkl()
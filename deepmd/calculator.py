@@ -10,9 +10,12 @@ from typing import (
     Dict,
     List,
     Optional,
+    Sequence,
+    Set,
     Union,
 )
 
+import numpy as np
 from ase.calculators.calculator import (
     Calculator,
     PropertyNotImplementedError,
@@ -34,7 +37,10 @@ __all__ = ["DP"]
 class DP(Calculator):
     """Implementation of ASE deepmd calculator.
 
-    Implemented propertie are `energy`, `forces` and `stress`
+    Implemented propertie are `energy`, `forces` and `stress`. Only the
+    requested properties are computed, e.g. the derivatives are skipped if
+    only the energy is requested. A list of `Atoms` can be evaluated at once
+    by :meth:`calculate_batch`.
 
     Parameters
     ----------
@@ -67,6 +73,11 @@ class DP(Calculator):
     >>> dyn = BFGS(water)
     >>> dyn.run(fmax=1e-6)
     >>> print(water.get_positions())
+
+    Evaluate images in one batch
+
+    >>> results = DP(model="frozen_model.pb").calculate_batch(images)
+    >>> print(results[0]["energy"], results[0]["forces"])
     """
 
     name = "DP"
@@ -93,6 +104,60 @@ class DP(Calculator):
             self.type_dict = dict(
                 zip(self.dp.get_type_map(), range(self.dp.get_ntypes()))
             )
+        # the atom types of the last evaluated atomic numbers
+        self._cached_numbers = None
+        self._cached_atype = None
+
+    def _get_atype(self, atoms: "Atoms") -> np.ndarray:
+        """Get the atom types, reusing the last result if the atoms are unchanged."""
+        numbers = atoms.get_atomic_numbers()
+        if self._cached_numbers is None or not np.array_equal(
+            numbers, self._cached_numbers
+        ):
+            symbols = atoms.get_chemical_symbols()
+            _, index, inverse = np.unique(
+                numbers, return_index=True, return_inverse=True
+            )
+            uniq_types = np.array([self.type_dict[symbols[ii]] for ii in index])
+            self._cached_atype = uniq_types[inverse]
+            self._cached_numbers = numbers.copy()
+        return self._cached_atype
+
+    @staticmethod
+    def _get_outputs(properties: Sequence[str]) -> Set[str]:
+        """Get the outputs of DeepPot needed by the properties."""
+        outputs = {"energy"}
+        if "forces" in properties:
+            outputs.add("force")
+        if "virial" in properties or "stress" in properties:
+            outputs.add("virial")
+        return outputs
+
+    @staticmethod
+    def _make_results(
+        ret: Dict[str, np.ndarray], atoms: "Atoms", properties: Sequence[str]
+    ) -> Dict[str, Union[float, np.ndarray]]:
+        """Convert the outputs of DeepPot of one frame to the calculator results."""
+        results = {}
+        results["energy"] = ret["energy"][0]
+        # see https://gitlab.com/ase/ase/-/merge_requests/2485
+        results["free_energy"] = ret["energy"][0]
+        if "force" in ret:
+            results["forces"] = ret["force"]
+        if "virial" in ret:
+            vv = ret["virial"].reshape(3, 3)
+            results["virial"] = vv
+            # convert virial into stress for lattice relaxation
+            if "stress" in properties:
+                if sum(atoms.get_pbc()) > 0:
+                    # the usual convention (tensile stress is positive)
+                    # stress = -virial / volume
+                    stress = -0.5 * (vv + vv.T) / atoms.get_volume()
+                    # Voigt notation
+                    results["stress"] = stress.flat[[0, 4, 8, 5, 2, 1]]
+                else:
+                    raise PropertyNotImplementedError
+        return results
 
     def calculate(
         self,
@@ -107,8 +172,8 @@ class DP(Calculator):
         atoms : Optional[Atoms], optional
             atoms object to run the calculation on, by default None
         properties : List[str], optional
-            unused, only for function signature compatibility,
-            by default ["energy", "forces", "stress"]
+            the properties to compute. The energy is always computed,
+            by default ["energy", "forces", "virial"]
         system_changes : List[str], optional
             unused, only for function signature compatibility, by default all_changes
         """
@@ -120,22 +185,61 @@ class DP(Calculator):
             cell = self.atoms.get_cell().reshape([1, -1])
         else:
             cell = None
-        symbols = self.atoms.get_chemical_symbols()
-        atype = [self.type_dict[k] for k in symbols]
-        e, f, v = self.dp.eval(coords=coord, cells=cell, atom_types=atype)
-        self.results["energy"] = e[0][0]
-        # see https://gitlab.com/ase/ase/-/merge_requests/2485
-        self.results["free_energy"] = e[0][0]
-        self.results["forces"] = f[0]
-        self.results["virial"] = v[0].reshape(3, 3)
-
-        # convert virial into stress for lattice relaxation
-        if "stress" in properties:
-            if sum(atoms.get_pbc()) > 0:
-                # the usual convention (tensile stress is positive)
-                # stress = -virial / volume
-                stress = -0.5 * (v[0].copy() + v[0].copy().T) / atoms.get_volume()
-                # Voigt notation
-                self.results["stress"] = stress.flat[[0, 4, 8, 5, 2, 1]]
+        atype = self._get_atype(self.atoms)
+        ret = self.dp.eval(
+            coords=coord,
+            cells=cell,
+            atom_types=atype,
+            outputs=self._get_outputs(properties),
+        )
+        ret = {kk: vv[0] for kk, vv in ret.items()}
+        self.results.update(self._make_results(ret, self.atoms, properties))
+
+    def calculate_batch(
+        self,
+        images: Sequence["Atoms"],
+        properties: Sequence[str] = ("energy", "forces"),
+    ) -> List[Dict[str, Union[float, np.ndarray]]]:
+        """Evaluate a list of atoms, e.g. the images of NEB, in batches.
+
+        The images with the same atoms and periodicity are evaluated in one
+        call to the model. The results are not stored in the calculator.
+
+        Parameters
+        ----------
+        images : Sequence[Atoms]
+            the atoms to evaluate
+        properties : Sequence[str], optional
+            the properties to compute. The energy is always computed,
+            by default ("energy", "forces")
+
+        Returns
+        -------
+        List[Dict[str, Union[float, np.ndarray]]]
+            the results of each image, with the same keys as `results`
+        """
+        outputs = self._get_outputs(properties)
+        groups = {}
+        for ii, atoms in enumerate(images):
+            key = (atoms.get_atomic_numbers().tobytes(), sum(atoms.get_pbc()) > 0)
+            groups.setdefault(key, []).append(ii)
+        results = [None] * len(images)
+        for (_, pbc), indices in groups.items():
+            group = [images[ii] for ii in indices]
+            coord = np.stack([atoms.get_positions() for atoms in group])
+            if pbc:
+                cell = np.stack([np.array(atoms.get_cell()) for atoms in group])
+                cell = cell.reshape([len(group), 9])
             else:
-                raise PropertyNotImplementedError
+                cell = None
+            ret = self.dp.eval(
+                coords=coord.reshape([len(group), -1]),
+                cells=cell,
+                atom_types=self._get_atype(group[0]),
+                outputs=outputs,
+            )
+            for jj, (ii, atoms) in enumerate(zip(indices, group)):
+                results[ii] = self._make_results(
+                    {kk: vv[jj] for kk, vv in ret.items()}, atoms, properties
+                )
+        return results
@@ -1,9 +1,11 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 """Get local GPU resources."""
 
+import os
 import socket
-import subprocess as sp
-import sys
+from functools import (
+    lru_cache,
+)
 from typing import (
     List,
     Optional,
@@ -16,37 +18,98 @@ from deepmd.env import (
 
 __all__ = ["get_gpus", "get_resource"]
 
+# environment variables listing the visible GPUs, in the order of priority
+CUDA_ENV_HINTS = ("CUDA_VISIBLE_DEVICES", "SLURM_STEP_GPUS", "SLURM_JOB_GPUS")
+ROCM_ENV_HINTS = (
+    "HIP_VISIBLE_DEVICES",
+    "ROCR_VISIBLE_DEVICES",
+    "CUDA_VISIBLE_DEVICES",
+    "SLURM_STEP_GPUS",
+    "SLURM_JOB_GPUS",
+)
+
+
+def _is_built_with_gpu() -> Tuple[bool, bool]:
+    """Check whether TensorFlow is built with CUDA or ROCm."""
+    cuda = tf.test.is_built_with_cuda()
+    rocm = hasattr(tf.test, "is_built_with_rocm") and tf.test.is_built_with_rocm()
+    return cuda, rocm
+
+
+def _count_env_gpus(value: str) -> int:
+    """Count the GPUs listed in an environment variable.
+
+    Like the CUDA runtime, devices after the first invalid entry, e.g. -1, are
+    ignored, so an empty value or -1 hides all the GPUs.
+
+    Parameters
+    ----------
+    value : str
+        comma-separated device indexes or UUIDs
+
+    Returns
+    -------
+    int
+        the number of listed GPUs
+    """
+    count = 0
+    for item in value.split(","):
+        item = item.strip()
+        if not item or item.startswith("-"):
+            break
+        count += 1
+    return count
+
+
+@lru_cache(maxsize=None)
+def _detect_gpus(hint: Optional[str]) -> Optional[List[int]]:
+    """Detect the GPUs from the environment hint or TensorFlow.
+
+    Parameters
+    ----------
+    hint : str, optional
+        the value of the environment variable listing the visible GPUs
+
+    Returns
+    -------
+    Optional[List[int]]
+        List of available GPU IDs. Otherwise, None.
+    """
+    if hint is not None:
+        num_gpus = _count_env_gpus(hint)
+    else:
+        try:
+            num_gpus = len(tf.config.experimental.list_physical_devices("GPU"))
+        except Exception as e:
+            raise RuntimeError("Failed to detect available GPUs due to:\n%s" % e) from e
+    return list(range(num_gpus)) if num_gpus > 0 else None
+
 
 def get_gpus():
     """Get available IDs of GPU cards at local.
     These IDs are valid when used as the TensorFlow device ID.
 
+    The GPUs are counted from the first environment variable set among
+    `CUDA_VISIBLE_DEVICES` (or `HIP_VISIBLE_DEVICES` and
+    `ROCR_VISIBLE_DEVICES` for ROCm), `SLURM_STEP_GPUS` and `SLURM_JOB_GPUS`.
+    If none is set, the physical devices are listed by TensorFlow in the
+    current process. The result is cached for the same environment.
+
     Returns
     -------
     Optional[List[int]]
         List of available GPU IDs. Otherwise, None.
     """
-    if not tf.test.is_built_with_cuda() and not (
-        hasattr(tf.test, "is_built_with_rocm") and tf.test.is_built_with_rocm()
-    ):
-        # TF is built with CPU only, skip expensive subprocess call
+    cuda, rocm = _is_built_with_gpu()
+    if not cuda and not rocm:
+        # TF is built with CPU only, skip device detection
         return None
-    test_cmd = (
-        "from tensorflow.python.client import device_lib; "
-        "devices = device_lib.list_local_devices(); "
-        'gpus = [d.name for d in devices if d.device_type == "GPU"]; '
-        "print(len(gpus))"
-    )
-    with sp.Popen(
-        [sys.executable, "-c", test_cmd], stderr=sp.PIPE, stdout=sp.PIPE
-    ) as p:
-        stdout, stderr = p.communicate()
-        if p.returncode != 0:
-            decoded = stderr.decode("UTF-8")
-            raise RuntimeError("Failed to detect availbe GPUs due to:\n%s" % decoded)
-        decoded = stdout.decode("UTF-8").strip()
-        num_gpus = int(decoded)
-        return list(range(num_gpus)) if num_gpus > 0 else None
+    hint = None
+    for name in ROCM_ENV_HINTS if rocm else CUDA_ENV_HINTS:
+        if name in os.environ:
+            hint = os.environ[name]
+            break
+    return _detect_gpus(hint)
 
 
 def get_resource() -> Tuple[str, List[str], Optional[List[int]]]:
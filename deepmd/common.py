@@ -21,23 +21,24 @@ from typing import (
 )
 
 import numpy as np
-import tensorflow
 import yaml
-from tensorflow.python.framework import (
-    tensor_util,
-)
 
+import deepmd.env
 from deepmd.env import (
     GLOBAL_NP_FLOAT_PRECISION,
-    GLOBAL_TF_FLOAT_PRECISION,
-    op_module,
-    tf,
+)
+from deepmd.utils.lazy import (
+    LazyDict,
 )
 from deepmd.utils.path import (
     DPPath,
 )
 
 if TYPE_CHECKING:
+    from deepmd.env import (
+        tf,
+    )
+
     _DICT_VAL = TypeVar("_DICT_VAL")
     _OBJ = TypeVar("_OBJ")
     try:
@@ -49,17 +50,30 @@ if TYPE_CHECKING:
     ]
     _PRECISION = Literal["default", "float16", "float32", "float64"]
 
+
+def _get_precision_dict() -> Dict[str, Any]:
+    from deepmd.env import (
+        GLOBAL_TF_FLOAT_PRECISION,
+        tf,
+    )
+
+    return {
+        "default": GLOBAL_TF_FLOAT_PRECISION,
+        "float16": tf.float16,
+        "float32": tf.float32,
+        "float64": tf.float64,
+        "bfloat16": tf.bfloat16,
+    }
+
+
 # define constants
-PRECISION_DICT = {
-    "default": GLOBAL_TF_FLOAT_PRECISION,
-    "float16": tf.float16,
-    "float32": tf.float32,
-    "float64": tf.float64,
-    "bfloat16": tf.bfloat16,
-}
+# the values are created on first use to avoid importing TensorFlow
+PRECISION_DICT = LazyDict(
+    ["default", "float16", "float32", "float64", "bfloat16"], _get_precision_dict
+)
 
 
-def gelu(x: tf.Tensor) -> tf.Tensor:
+def gelu(x: "tf.Tensor") -> "tf.Tensor":
     """Gaussian Error Linear Unit.
 
     This is a smoother version of the RELU, implemented by custom operator.
@@ -79,10 +93,14 @@ def gelu(x: tf.Tensor) -> tf.Tensor:
     Original paper
     https://arxiv.org/abs/1606.08415
     """
+    from deepmd.env import (
+        op_module,
+    )
+
     return op_module.gelu_custom(x)
 
 
-def gelu_tf(x: tf.Tensor) -> tf.Tensor:
+def gelu_tf(x: "tf.Tensor") -> "tf.Tensor":
     """Gaussian Error Linear Unit.
 
     This is a smoother version of the RELU, implemented by TF.
@@ -102,6 +120,11 @@ def gelu_tf(x: tf.Tensor) -> tf.Tensor:
     Original paper
     https://arxiv.org/abs/1606.08415
     """
+    import tensorflow
+
+    from deepmd.env import (
+        op_module,
+    )
 
     def gelu_wrapper(x):
         try:
@@ -119,17 +142,29 @@ def gelu_tf(x: tf.Tensor) -> tf.Tensor:
 # TODO anyone can write and there is no good way to keep track of the changes
 data_requirement = {}
 
-ACTIVATION_FN_DICT = {
-    "relu": tf.nn.relu,
-    "relu6": tf.nn.relu6,
-    "softplus": tf.nn.softplus,
-    "sigmoid": tf.sigmoid,
-    "tanh": tf.nn.tanh,
-    "gelu": gelu,
-    "gelu_tf": gelu_tf,
-    "None": None,
-    "none": None,
-}
+
+def _get_activation_fn_dict() -> Dict[str, Any]:
+    from deepmd.env import (
+        tf,
+    )
+
+    return {
+        "relu": tf.nn.relu,
+        "relu6": tf.nn.relu6,
+        "softplus": tf.nn.softplus,
+        "sigmoid": tf.sigmoid,
+        "tanh": tf.nn.tanh,
+        "gelu": gelu,
+        "gelu_tf": gelu_tf,
+        "None": None,
+        "none": None,
+    }
+
+
+ACTIVATION_FN_DICT = LazyDict(
+    ["relu", "relu6", "softplus", "sigmoid", "tanh", "gelu", "gelu_tf", "None", "none"],
+    _get_activation_fn_dict,
+)
 
 
 def add_data_requirement(
@@ -292,7 +327,7 @@ def j_loader(filename: Union[str, Path]) -> Dict[str, Any]:
 
 def get_activation_func(
     activation_fn: Union["_ACTIVATION", None],
-) -> Union[Callable[[tf.Tensor], tf.Tensor], None]:
+) -> Union[Callable[["tf.Tensor"], "tf.Tensor"], None]:
     """Get activation function callable based on string name.
 
     Parameters
@@ -392,8 +427,8 @@ def get_np_precision(precision: "_PRECISION") -> np.dtype:
 
 
 def safe_cast_tensor(
-    input: tf.Tensor, from_precision: tf.DType, to_precision: tf.DType
-) -> tf.Tensor:
+    input: "tf.Tensor", from_precision: "tf.DType", to_precision: "tf.DType"
+) -> "tf.Tensor":
     """Convert a Tensor from a precision to another precision.
 
     If input is not a Tensor or without the specific precision, the method will not
@@ -413,6 +448,14 @@ def safe_cast_tensor(
     tf.Tensor
         casted Tensor
     """
+    from tensorflow.python.framework import (
+        tensor_util,
+    )
+
+    from deepmd.env import (
+        tf,
+    )
+
     if tensor_util.is_tensor(input) and input.dtype == from_precision:
         return tf.cast(input, to_precision)
     return input
@@ -455,6 +498,10 @@ def cast_precision(func: Callable) -> Callable:
 
     @wraps(func)
     def wrapper(self, *args, **kwargs):
+        from deepmd.env import (
+            GLOBAL_TF_FLOAT_PRECISION,
+        )
+
         # only convert tensors
         returned_tensor = func(
             self,
@@ -482,6 +529,15 @@ def cast_precision(func: Callable) -> Callable:
 
 def clear_session():
     """Reset all state generated by DeePMD-kit."""
-    tf.reset_default_graph()
+    # there is no graph to reset if TensorFlow has not been loaded
+    if "tf" in vars(deepmd.env):
+        deepmd.env.tf.reset_default_graph()
     # TODO: remove this line when data_requirement is not a global variable
     data_requirement.clear()
+
+
+def __getattr__(name: str) -> Any:
+    # keep the names imported from deepmd.env available, which load TensorFlow
+    if name in ("GLOBAL_TF_FLOAT_PRECISION", "op_module", "tf"):
+        return getattr(deepmd.env, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
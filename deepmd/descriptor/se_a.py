@@ -37,6 +37,10 @@ from deepmd.utils.compress import (
     get_type_embedding,
     make_data,
 )
+from deepmd.utils.distributed_stat import (
+    gather_stat_dict,
+    split_batches,
+)
 from deepmd.utils.errors import (
     GraphWithoutTensorError,
 )
@@ -346,6 +350,9 @@ class DescrptSeA(DescrptSe):
             Additional keyword arguments.
         """
         if True:
+            data_coord, data_box, data_atype, natoms_vec, mesh = split_batches(
+                data_coord, data_box, data_atype, natoms_vec, mesh
+            )
             sumr = []
             suma = []
             sumn = []
@@ -396,6 +403,7 @@ class DescrptSeA(DescrptSe):
             suma2
                     The sum of square of relative coord statisitcs.
         """
+        stat_dict = gather_stat_dict(stat_dict)
         all_davg = []
         all_dstd = []
         sumr = np.sum(stat_dict["sumr"], axis=0)
@@ -40,6 +40,9 @@ from deepmd.utils.compress import (
     get_two_side_type_embedding,
     make_data,
 )
+from deepmd.utils.distributed_stat import (
+    split_batches,
+)
 from deepmd.utils.graph import (
     get_attention_layer_variables_from_graph_def,
     get_pattern_nodes_from_graph_def,
@@ -290,6 +293,16 @@ class DescrptSeAtten(DescrptSeA):
             Additional keyword arguments.
         """
         if True:
+            (
+                data_coord,
+                data_box,
+                data_atype,
+                natoms_vec,
+                mesh,
+                real_natoms_vec,
+            ) = split_batches(
+                data_coord, data_box, data_atype, natoms_vec, mesh, real_natoms_vec
+            )
             sumr = []
             suma = []
             sumn = []
@@ -19,6 +19,10 @@ from deepmd.env import (
     op_module,
     tf,
 )
+from deepmd.utils.distributed_stat import (
+    gather_stat_dict,
+    split_batches,
+)
 from deepmd.utils.graph import (
     get_tensor_by_name_from_graph,
 )
@@ -249,6 +253,9 @@ class DescrptSeR(DescrptSe):
         **kwargs
             Additional keyword arguments.
         """
+        data_coord, data_box, data_atype, natoms_vec, mesh = split_batches(
+            data_coord, data_box, data_atype, natoms_vec, mesh
+        )
         sumr = []
         sumn = []
         sumr2 = []
@@ -281,6 +288,7 @@ class DescrptSeR(DescrptSe):
             sumr2
                     The sum of square of radial statisitcs.
         """
+        stat_dict = gather_stat_dict(stat_dict)
         all_davg = []
         all_dstd = []
         sumr = np.sum(stat_dict["sumr"], axis=0)
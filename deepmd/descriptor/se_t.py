@@ -19,6 +19,10 @@ from deepmd.env import (
     op_module,
     tf,
 )
+from deepmd.utils.distributed_stat import (
+    gather_stat_dict,
+    split_batches,
+)
 from deepmd.utils.graph import (
     get_tensor_by_name_from_graph,
 )
@@ -240,6 +244,9 @@ class DescrptSeT(DescrptSe):
             Additional keyword arguments.
         """
         if True:
+            data_coord, data_box, data_atype, natoms_vec, mesh = split_batches(
+                data_coord, data_box, data_atype, natoms_vec, mesh
+            )
             sumr = []
             suma = []
             sumn = []
@@ -290,6 +297,7 @@ class DescrptSeT(DescrptSe):
             suma2
                     The sum of square of relative coord statisitcs.
         """
+        stat_dict = gather_stat_dict(stat_dict)
         all_davg = []
         all_dstd = []
         sumr = np.sum(stat_dict["sumr"], axis=0)
@@ -1,38 +1,109 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
-"""Submodule that contains all the DeePMD-Kit entry point scripts."""
+"""Submodule that contains all the DeePMD-Kit entry point scripts.
 
-from ..infer.model_devi import (
-    make_model_devi,
-)
-from .compress import (
-    compress,
-)
-from .convert import (
-    convert,
-)
-from .doc import (
-    doc_train_input,
-)
-from .freeze import (
-    freeze,
-)
-from .gui import (
-    start_dpgui,
+The entry points are imported on first access, so that a command only
+imports the modules it needs.
+"""
+
+from typing import (
+    TYPE_CHECKING,
 )
-from .neighbor_stat import (
-    neighbor_stat,
+
+from deepmd.utils.lazy import (
+    lazy_import,
+    shadow_submodules,
 )
-from .test import (
-    test,
+
+if TYPE_CHECKING:
+    from ..infer.model_devi import (
+        make_model_devi,
+    )
+    from .bench import (
+        bench,
+    )
+    from .compress import (
+        compress,
+    )
+    from .convert import (
+        convert,
+    )
+    from .dedup import (
+        dedup,
+    )
+    from .doc import (
+        doc_train_input,
+    )
+    from .eval_desc import (
+        eval_desc,
+    )
+    from .freeze import (
+        freeze,
+    )
+    from .gui import (
+        start_dpgui,
+    )
+    from .neighbor_stat import (
+        neighbor_stat,
+    )
+    from .test import (
+        test,
+    )
+
+    # import `train` as `train_dp` to avoid the conflict of the
+    # module name `train` and the function name `train`
+    from .train import train as train_dp
+    from .transfer import (
+        transfer,
+    )
+
+_getattr, __dir__ = lazy_import(
+    __name__,
+    attrs={
+        "make_model_devi": "..infer.model_devi",
+        "bench": ".bench",
+        "compress": ".compress",
+        "convert": ".convert",
+        "dedup": ".dedup",
+        "doc_train_input": ".doc",
+        "eval_desc": ".eval_desc",
+        "freeze": ".freeze",
+        "start_dpgui": ".gui",
+        "neighbor_stat": ".neighbor_stat",
+        "test": ".test",
+        "transfer": ".transfer",
+    },
 )
 
-# import `train` as `train_dp` to avoid the conflict of the
-# module name `train` and the function name `train`
-from .train import train as train_dp
-from .transfer import (
-    transfer,
+
+def __getattr__(name: str):
+    if name == "train_dp":
+        # `train` is imported as `train_dp` to avoid the conflict of the
+        # module name `train` and the function name `train`
+        from .train import train as value
+
+        globals()[name] = value
+        return value
+    return _getattr(name)
+
+
+# the functions have the same names as their submodules, so the attributes
+# are kept as the functions even if the submodules are imported
+shadow_submodules(
+    __name__,
+    [
+        "bench",
+        "compress",
+        "convert",
+        "dedup",
+        "eval_desc",
+        "freeze",
+        "neighbor_stat",
+        "test",
+        "transfer",
+    ],
 )
 
+
 __all__ = [
     "doc_train_input",
     "freeze",
@@ -45,4 +116,7 @@ __all__ = [
     "convert",
     "neighbor_stat",
     "start_dpgui",
+    "bench",
+    "eval_desc",
+    "dedup",
 ]
@@ -0,0 +1,314 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Benchmark the inference performance of frozen models."""
+
+import json
+import logging
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+
+from deepmd import (
+    DeepPotential,
+    __version__,
+)
+from deepmd.env import (
+    TF_VERSION,
+)
+from deepmd.infer.model_devi import (
+    calc_model_devi,
+)
+
+if TYPE_CHECKING:
+    from deepmd.infer import (
+        DeepPot,
+    )
+    from deepmd.infer.deep_eval import (
+        DeepEval,
+    )
+
+__all__ = ["bench", "make_synthetic_system"]
+
+log = logging.getLogger(__name__)
+
+
+def make_synthetic_system(
+    natoms: int,
+    density: float,
+    ntypes: int,
+    nframes: int = 1,
+    seed: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Generate a periodic system with atoms on a jittered simple cubic lattice.
+
+    Parameters
+    ----------
+    natoms : int
+        the number of atoms
+    density : float
+        the number density of atoms, in the unit of 1/Angstrom^3
+    ntypes : int
+        the number of atom types. Types are randomly assigned to atoms
+    nframes : int, default: 1
+        the number of frames. Each frame has different displacements
+    seed : int, optional
+        the random seed
+
+    Returns
+    -------
+    coord : np.ndarray
+        the coordinates, in the shape of nframes x natoms x 3
+    box : np.ndarray
+        the boxes, in the shape of nframes x 9
+    atype : np.ndarray
+        the atom types, in the shape of natoms
+    """
+    rng = np.random.default_rng(seed)
+    length = (natoms / density) ** (1.0 / 3.0)
+    nside = int(np.ceil(natoms ** (1.0 / 3.0)))
+    spacing = length / nside
+    grid = np.stack(
+        np.meshgrid(*([np.arange(nside)] * 3), indexing="ij"), axis=-1
+    ).reshape(-1, 3)
+    grid = grid[rng.choice(grid.shape[0], natoms, replace=False)] * spacing
+    # displacements are small enough to keep atoms apart
+    coord = grid[None, :, :] + rng.uniform(
+        -0.2 * spacing, 0.2 * spacing, size=(nframes, natoms, 3)
+    )
+    box = np.tile((np.eye(3) * length).reshape(1, 9), (nframes, 1))
+    atype = rng.integers(ntypes, size=natoms)
+    return coord, box, atype
+
+
+def _timeit(func: Callable, nloop: int, warmup: int) -> np.ndarray:
+    """Call the function and return the wall time of each call, in seconds."""
+    for _ in range(warmup):
+        func()
+    latencies = np.empty(nloop)
+    for ii in range(nloop):
+        tic = time.perf_counter()
+        func()
+        latencies[ii] = time.perf_counter() - tic
+    return latencies
+
+
+def _summary(latencies: np.ndarray, natoms: int, nframes: int) -> Dict[str, float]:
+    mean = float(np.mean(latencies))
+    return {
+        "mean": mean,
+        "min": float(np.min(latencies)),
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "atoms_per_second": natoms * nframes / mean,
+    }
+
+
+def _is_compressed(dp: "DeepEval") -> bool:
+    return any(op.type == "TabulateFusion" for op in dp.graph.get_operations())
+
+
+def _bench_cases(
+    dp: "DeepEval",
+    coord: np.ndarray,
+    box: np.ndarray,
+    atype: np.ndarray,
+) -> Dict[str, Tuple[Callable, int]]:
+    """Get the callables to benchmark for a model.
+
+    Returns
+    -------
+    dict
+        the name of each case, mapped to the callable and the number of frames
+        evaluated by one call
+    """
+    nframes = coord.shape[0]
+    fparam = aparam = None
+    if dp.get_dim_fparam() > 0:
+        fparam = np.zeros((nframes, dp.get_dim_fparam()))
+    if dp.get_dim_aparam() > 0:
+        aparam = np.zeros((nframes, atype.size, dp.get_dim_aparam()))
+    if dp.model_type == "ener":
+        kwargs = {"fparam": fparam, "aparam": aparam}
+        return {
+            "single": (
+                lambda: dp.eval(
+                    coord[:1],
+                    box[:1],
+                    atype,
+                    fparam=None if fparam is None else fparam[:1],
+                    aparam=None if aparam is None else aparam[:1],
+                ),
+                1,
+            ),
+            "batched": (lambda: dp.eval(coord, box, atype, **kwargs), nframes),
+            "atomic": (
+                lambda: dp.eval(coord, box, atype, atomic=True, **kwargs),
+                nframes,
+            ),
+        }
+    elif dp.model_type == "dos":
+        kwargs = {"fparam": fparam, "aparam": aparam}
+        return {
+            "batched": (lambda: dp.eval(coord, box, atype, **kwargs), nframes),
+            "atomic": (
+                lambda: dp.eval(coord, box, atype, atomic=True, **kwargs),
+                nframes,
+            ),
+        }
+    elif dp.model_type in ("dipole", "polar", "wfc"):
+        return {
+            "single": (lambda: dp.eval(coord[:1], box[:1], atype), 1),
+            "batched": (lambda: dp.eval(coord, box, atype), nframes),
+            "global": (lambda: dp.eval(coord, box, atype, atomic=False), nframes),
+        }
+    elif dp.model_type == "global_polar":
+        return {
+            "batched": (lambda: dp.eval(coord, box, atype), nframes),
+        }
+    raise RuntimeError(f"unknown model type {dp.model_type}")
+
+
+def bench(
+    *,
+    models: List[str],
+    natoms: List[int],
+    density: float,
+    ntypes: Optional[int],
+    nframes: int,
+    nloop: int,
+    warmup: int,
+    output: str,
+    seed: Optional[int] = None,
+    **kwargs,
+):
+    """Benchmark the inference performance of frozen models.
+
+    Each model is evaluated on synthetic periodic systems of each size in
+    `natoms`. The latency of single-frame, batched and atomic evaluation is
+    measured, depending on the model type. If more than one energy model is
+    given, the model deviation of them is also measured. The results are
+    written to `output` in the JSON format.
+
+    Parameters
+    ----------
+    models : list of str
+        the frozen models
+    natoms : list of int
+        the numbers of atoms of the synthetic systems
+    density : float
+        the number density of atoms, in the unit of 1/Angstrom^3
+    ntypes : int, optional
+        the number of atom types in the synthetic systems. If not given, all
+        types of the model are used
+    nframes : int
+        the number of frames in a batch
+    nloop : int
+        the number of timed calls of each case
+    warmup : int
+        the number of untimed calls before timing
+    output : str
+        the output JSON file
+    seed : int, optional
+        the random seed to generate the synthetic systems
+    **kwargs
+        additional arguments
+
+    Raises
+    ------
+    RuntimeError
+        if the energy models for model deviation have different type maps
+    """
+    dps = [DeepPotential(mm) for mm in models]
+    results = []
+
+    def record(model, model_type, compressed, case, nn, nf, latencies):
+        summary = _summary(latencies, nn, nf)
+        results.append(
+            {
+                "model": model,
+                "model_type": model_type,
+                "compressed": compressed,
+                "case": case,
+                "natoms": nn,
+                "nframes": nf,
+                **summary,
+            }
+        )
+        log.info(
+            "%-24s %-8s natoms %6d nframes %4d: p50 %.3e s, p99 %.3e s, %.3e atoms/s",
+            model,
+            case,
+            nn,
+            nf,
+            summary["p50"],
+            summary["p99"],
+            summary["atoms_per_second"],
+        )
+
+    for nn in natoms:
+        for mm, dp in zip(models, dps):
+            ntypes_sys = dp.get_ntypes()
+            if ntypes is not None:
+                ntypes_sys = min(ntypes, ntypes_sys)
+            coord, box, atype = make_synthetic_system(
+                nn, density, ntypes_sys, nframes=nframes, seed=seed
+            )
+            compressed = _is_compressed(dp)
+            for case, (func, nf) in _bench_cases(dp, coord, box, atype).items():
+                latencies = _timeit(func, nloop, warmup)
+                record(mm, dp.model_type, compressed, case, nn, nf, latencies)
+
+        ener_models = [
+            (mm, dp) for mm, dp in zip(models, dps) if dp.model_type == "ener"
+        ]
+        if len(ener_models) > 1:
+            devi_dps: List["DeepPot"] = [dp for _, dp in ener_models]
+            type_map = devi_dps[0].get_type_map()
+            if any(dp.get_type_map() != type_map for dp in devi_dps[1:]):
+                raise RuntimeError(
+                    "The models for model deviation should have the same type map"
+                )
+            ntypes_sys = devi_dps[0].get_ntypes()
+            if ntypes is not None:
+                ntypes_sys = min(ntypes, ntypes_sys)
+            coord, box, atype = make_synthetic_system(
+                nn, density, ntypes_sys, nframes=nframes, seed=seed
+            )
+            latencies = _timeit(
+                lambda: calc_model_devi(coord, box, atype, devi_dps),
+                nloop,
+                warmup,
+            )
+            record(
+                "+".join(mm for mm, _ in ener_models),
+                "model_devi",
+                any(_is_compressed(dp) for dp in devi_dps),
+                "model_devi",
+                nn,
+                nframes,
+                latencies,
+            )
+
+    with open(output, "w") as fp:
+        json.dump(
+            {
+                "deepmd_version": __version__,
+                "tf_version": TF_VERSION,
+                "density": density,
+                "nloop": nloop,
+                "warmup": warmup,
+                "seed": seed,
+                "results": results,
+            },
+            fp,
+            indent=2,
+        )
+    log.info("benchmark results are written to %s", output)
@@ -0,0 +1,559 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Remove near-duplicate frames from systems and subsample them by diversity."""
+
+import json
+import logging
+import os
+from concurrent.futures import (
+    ProcessPoolExecutor,
+)
+from pathlib import (
+    Path,
+)
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import h5py
+import numpy as np
+
+from deepmd.common import (
+    expand_sys_str,
+)
+from deepmd.entrypoints.eval_desc import (
+    pool_descriptor,
+)
+from deepmd.infer.neighbor_list import (
+    NeighborListCache,
+)
+from deepmd.utils.data import (
+    DeepmdData,
+)
+from deepmd.utils.path import (
+    DPPath,
+)
+
+__all__ = [
+    "FingerprintIndex",
+    "dedup",
+    "diversity_subsample",
+    "structure_fingerprint",
+]
+
+log = logging.getLogger(__name__)
+
+
+def structure_fingerprint(
+    coord: np.ndarray,
+    box: Optional[np.ndarray],
+    atype: np.ndarray,
+    ntypes: int,
+    rcut: float,
+    nbins: int,
+) -> np.ndarray:
+    """Compute the fingerprint of a frame from its pair distances.
+
+    The fingerprint is the histogram of the distances between neighbors
+    within `rcut`, for each pair of atom types, divided by the number of atoms.
+
+    Parameters
+    ----------
+    coord : np.ndarray
+        the coordinates, in the shape of natoms x 3
+    box : np.ndarray, optional
+        the cell, in the shape of 9. None for non-PBC systems
+    atype : np.ndarray
+        the atom types, in the shape of natoms. Virtual atoms whose types are
+        negative are ignored
+    ntypes : int
+        the number of atom types
+    rcut : float
+        the cutoff radius
+    nbins : int
+        the number of bins of each histogram
+
+    Returns
+    -------
+    np.ndarray
+        the fingerprint, in the shape of ntypes x ntypes x nbins flattened
+    """
+    real = atype >= 0
+    coord = np.reshape(coord, [-1, 3])[real]
+    atype = atype[real]
+    nloc = atype.size
+    nlist = NeighborListCache(rcut, 0.0)
+    nlist.build(coord, box, atype)
+    ext_coord = nlist.extend_coord(coord, box)
+    numneigh = nlist.mesh[16 + nloc : 16 + 2 * nloc]
+    jlist = nlist.mesh[16 + 2 * nloc :]
+    ii = np.repeat(np.arange(nloc), numneigh)
+    dist = np.linalg.norm(ext_coord[jlist] - ext_coord[ii], axis=1)
+    ibin = np.minimum((dist / rcut * nbins).astype(int), nbins - 1)
+    pair = atype[ii] * ntypes + atype[nlist.mapping[jlist]]
+    hist = np.bincount(pair * nbins + ibin, minlength=ntypes * ntypes * nbins)
+    return hist / max(nloc, 1)
+
+
+class FingerprintIndex:
+    """Index of fingerprints for the search of near duplicates.
+
+    The fingerprints are hashed by the locality-sensitive hashing (LSH) of
+    random projections: each of the `ntables` hash tables projects the
+    fingerprint onto `nproj` random Gaussian directions, and quantizes the
+    projections by `width`. Fingerprints closer than `width` are likely to
+    share a bucket in at least one table, so only the fingerprints in the same
+    buckets are compared. Fingerprints with different keys, e.g. frames of
+    different compositions, are never compared.
+
+    Parameters
+    ----------
+    dim : int
+        the dimension of fingerprints
+    width : float
+        the width of buckets
+    ntables : int, default: 8
+        the number of hash tables
+    nproj : int, default: 4
+        the number of projections of each table
+    seed : int, optional
+        the random seed of the projections
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        width: float,
+        ntables: int = 8,
+        nproj: int = 4,
+        seed: Optional[int] = None,
+    ):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.proj = rng.normal(size=(dim, ntables * nproj))
+        self.offset = rng.uniform(0.0, width, size=ntables * nproj)
+        self.ntables = ntables
+        self.nproj = nproj
+        self.tables = [{} for _ in range(ntables)]
+        self.fingerprints = []
+
+    def hash(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Hash the fingerprints.
+
+        Parameters
+        ----------
+        fingerprints : np.ndarray
+            the fingerprints, in the shape of nframes x dim
+
+        Returns
+        -------
+        np.ndarray
+            the hashes, in the shape of nframes x ntables x nproj
+        """
+        hashes = np.floor((fingerprints @ self.proj + self.offset) / self.width)
+        return hashes.astype(np.int64).reshape([-1, self.ntables, self.nproj])
+
+    def add_unique(
+        self, key: bytes, fingerprints: np.ndarray, threshold: float
+    ) -> np.ndarray:
+        """Add the fingerprints which are not near duplicates of added ones.
+
+        The fingerprints are processed in order, so the first one of
+        duplicates is kept.
+
+        Parameters
+        ----------
+        key : bytes
+            the key of the fingerprints
+        fingerprints : np.ndarray
+            the fingerprints, in the shape of nframes x dim
+        threshold : float
+            fingerprints closer than this distance are duplicates
+
+        Returns
+        -------
+        np.ndarray
+            whether each fingerprint is added, in the shape of nframes
+        """
+        hashes = self.hash(fingerprints)
+        added = np.zeros(fingerprints.shape[0], dtype=bool)
+        for ii, fp in enumerate(fingerprints):
+            buckets = [
+                table.setdefault((key, hh.tobytes()), [])
+                for table, hh in zip(self.tables, hashes[ii])
+            ]
+            candidates = {jj for bucket in buckets for jj in bucket}
+            if candidates:
+                others = np.array([self.fingerprints[jj] for jj in candidates])
+                if np.min(np.linalg.norm(others - fp, axis=1)) < threshold:
+                    continue
+            idx = len(self.fingerprints)
+            self.fingerprints.append(fp)
+            for bucket in buckets:
+                bucket.append(idx)
+            added[ii] = True
+        return added
+
+
+def diversity_subsample(
+    fingerprints: np.ndarray,
+    keys: List[bytes],
+    nsel: int,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """Select frames which cover the space of fingerprints evenly.
+
+    The fingerprints are hashed into buckets by random projections, with the
+    width of buckets doubled until there are no more buckets than `nsel`.
+    Frames are then taken from the buckets in turn, so that sparse regions
+    are not outweighed by dense ones.
+
+    Parameters
+    ----------
+    fingerprints : np.ndarray
+        the normalized fingerprints, in the shape of nframes x dim
+    keys : list of bytes
+        the key of each frame. Frames with different keys are never put in
+        the same bucket
+    nsel : int
+        the number of frames to select
+    seed : int, optional
+        the random seed
+
+    Returns
+    -------
+    np.ndarray
+        the sorted indexes of the selected frames
+    """
+    nframes = fingerprints.shape[0]
+    if nsel >= nframes:
+        return np.arange(nframes)
+    rng = np.random.default_rng(seed)
+    _, key_idx = np.unique(np.array(keys, dtype=object), return_inverse=True)
+    # the fingerprints are normalized, so there are only a few buckets per key
+    # when the width is larger than their diameter
+    width = 1e-3
+    while True:
+        index = FingerprintIndex(fingerprints.shape[1], width, 1, 4, seed=rng)
+        hashes = index.hash(fingerprints).reshape([nframes, -1])
+        _, bucket = np.unique(
+            np.concatenate([key_idx[:, None], hashes], axis=1),
+            axis=0,
+            return_inverse=True,
+        )
+        bucket = bucket.reshape([-1])
+        nbucket = bucket.max() + 1
+        if nbucket <= nsel or width > 4.0:
+            break
+        width *= 2.0
+    # the rank of each frame in its bucket, in random order
+    perm = rng.permutation(nframes)
+    order = perm[np.argsort(bucket[perm], kind="stable")]
+    start = np.searchsorted(bucket[order], np.arange(nbucket))
+    rank = np.empty(nframes, dtype=int)
+    rank[order] = np.arange(nframes) - start[bucket[order]]
+    # take frames from the buckets in turn, in a random order of buckets
+    bucket_order = rng.permutation(nbucket)
+    sel = np.lexsort((bucket_order[bucket], rank))[:nsel]
+    return np.sort(sel)
+
+
+def _normalize(fingerprints: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(fingerprints, axis=1, keepdims=True)
+    return fingerprints / np.maximum(norm, 1e-12)
+
+
+def _composition_keys(atype: np.ndarray, ntypes: int) -> List[bytes]:
+    return [
+        np.bincount(tt[tt >= 0], minlength=ntypes).astype(np.int64).tobytes()
+        for tt in atype
+    ]
+
+
+def _get_type_map(all_sys: List[str]) -> Tuple[Optional[List[str]], int]:
+    """Get the union of the type maps of systems and the number of types."""
+    type_map = []
+    ntypes = 0
+    for sys_path in all_sys:
+        root = DPPath(sys_path)
+        atom_type = (root / "type.raw").load_txt(ndmin=1).astype(int)
+        ntypes = max(ntypes, np.max(atom_type, initial=-1) + 1)
+        if (root / "type_map.raw").is_file():
+            for name in (root / "type_map.raw").load_txt(dtype=str, ndmin=1):
+                if name not in type_map:
+                    type_map.append(name)
+    if len(type_map) == 0:
+        return None, ntypes
+    return type_map, max(ntypes, len(type_map))
+
+
+def _structure_fingerprints(
+    sys_path: str,
+    set_prefix: str,
+    type_map: Optional[List[str]],
+    ntypes: int,
+    rcut: float,
+    nbins: int,
+) -> Tuple[List[bytes], np.ndarray, List[int]]:
+    """Compute the structure fingerprints of all frames of a system."""
+    data = DeepmdData(sys_path, set_prefix, type_map=type_map, sort_atoms=False)
+    keys, fps, set_nframes = [], [], []
+    for set_name in data.dirs:
+        set_data = data.load_set(set_name)
+        nframes = set_data["coord"].shape[0]
+        for ii in range(nframes):
+            fps.append(
+                structure_fingerprint(
+                    set_data["coord"][ii],
+                    set_data["box"][ii] if data.pbc else None,
+                    set_data["type"][ii],
+                    ntypes,
+                    rcut,
+                    nbins,
+                )
+            )
+        keys.extend(_composition_keys(set_data["type"], ntypes))
+        set_nframes.append(nframes)
+    return keys, np.array(fps), set_nframes
+
+
+def _descriptor_fingerprints(
+    dp, sys_path: str, set_prefix: str
+) -> Tuple[List[bytes], np.ndarray, List[int]]:
+    """Compute the mean descriptors of all frames of a system."""
+    data = DeepmdData(
+        sys_path, set_prefix, type_map=dp.get_type_map(), sort_atoms=False
+    )
+    ntypes = dp.get_ntypes()
+    keys, fps, set_nframes = [], [], []
+    for set_name in data.dirs:
+        set_data = data.load_set(set_name)
+        descriptor = dp.eval_descriptor(
+            set_data["coord"],
+            set_data["box"] if data.pbc else None,
+            set_data["type"] if data.mixed_type else data.get_atom_type(),
+            mixed_type=data.mixed_type,
+        )
+        fps.append(pool_descriptor(descriptor, "mean", atype=set_data["type"]))
+        keys.extend(_composition_keys(set_data["type"], ntypes))
+        set_nframes.append(set_data["coord"].shape[0])
+    return keys, np.concatenate(fps), set_nframes
+
+
+def _write_system(
+    sys_path: str,
+    set_prefix: str,
+    set_nframes: List[int],
+    keep: np.ndarray,
+    out_dir: Optional[Path],
+    out_group: Optional[h5py.Group],
+):
+    """Write the kept frames of a system in the layout of the input."""
+    root = DPPath(sys_path)
+    dirs = sorted(root.glob(set_prefix + ".*"))
+    files = {"type.raw": (root / "type.raw").load_txt(ndmin=1).astype(int)}
+    if (root / "type_map.raw").is_file():
+        files["type_map.raw"] = (root / "type_map.raw").load_txt(dtype=str, ndmin=1)
+    nopbc = (root / "nopbc").is_file()
+    if out_dir is not None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.savetxt(out_dir / "type.raw", files["type.raw"], fmt="%d")
+        if "type_map.raw" in files:
+            np.savetxt(out_dir / "type_map.raw", files["type_map.raw"], fmt="%s")
+        if nopbc:
+            (out_dir / "nopbc").touch()
+    else:
+        out_group.create_dataset("type.raw", data=files["type.raw"])
+        if "type_map.raw" in files:
+            out_group.create_dataset(
+                "type_map.raw", data=files["type_map.raw"].astype("S")
+            )
+        if nopbc:
+            out_group.create_dataset("nopbc", data=True)
+    iset = 0
+    for set_name, keep_set in zip(dirs, np.split(keep, np.cumsum(set_nframes)[:-1])):
+        if not np.any(keep_set):
+            continue
+        out_set = f"{set_prefix}.{iset:03d}"
+        if out_dir is not None:
+            (out_dir / out_set).mkdir(exist_ok=True)
+        else:
+            out_group.create_group(out_set)
+        for path in set_name.glob("*.npy"):
+            arr = path.load_numpy()
+            arr = arr.reshape([keep_set.size, -1])[keep_set]
+            name = os.path.basename(str(path))
+            if out_dir is not None:
+                np.save(out_dir / out_set / name, arr)
+            else:
+                out_group[out_set].create_dataset(name, data=arr)
+        iset += 1
+
+
+def dedup(
+    *,
+    system: str,
+    datafile: Optional[str],
+    set_prefix: str,
+    output: str,
+    model: Optional[str] = None,
+    rcut: float = 6.0,
+    nbins: int = 32,
+    threshold: float = 0.05,
+    nframes: Optional[int] = None,
+    seed: Optional[int] = None,
+    jobs: int = 1,
+    **kwargs,
+):
+    """Remove near-duplicate frames from systems and subsample them.
+
+    Each frame is described by a fingerprint, which is either the histograms
+    of the neighbor distances of each pair of atom types, or the descriptor of
+    a model averaged over atoms. Fingerprints are normalized to the unit
+    length, indexed by the locality-sensitive hashing of random projections,
+    and a frame is dropped if a kept frame of the same composition, in any
+    system, is closer than `threshold`. If `nframes` is given, the remaining
+    frames are further subsampled to cover the space of fingerprints evenly.
+
+    The kept frames are written in the same layout as the input: each system
+    to `output/NNNNNN`, or to the group `NNNNNN` of the HDF5 file if
+    `output` ends with `.h5` or `.hdf5`. The original paths and the numbers of
+    frames are listed in `index.json` in the output directory, or in the
+    attributes of the HDF5 groups.
+
+    Parameters
+    ----------
+    system : str
+        the system directory. Recursively detect systems in this directory
+    datafile : str, optional
+        the path to the list of systems. If given, `system` is ignored
+    set_prefix : str
+        the set prefix
+    output : str
+        the output directory or HDF5 file
+    model : str, optional
+        the frozen energy model whose descriptors are used as the
+        fingerprints. If not given, the distance histograms are used
+    rcut : float, default: 6.0
+        the cutoff radius of the distance histograms
+    nbins : int, default: 32
+        the number of bins of the distance histograms
+    threshold : float, default: 0.05
+        frames whose normalized fingerprints are closer than this distance are
+        duplicates. Deduplication is disabled if it is not positive
+    nframes : int, optional
+        the total number of frames to keep after deduplication. If not
+        given, all unique frames are kept
+    seed : int, optional
+        the random seed
+    jobs : int, default: 1
+        the number of processes computing the distance histograms of systems
+        in parallel
+    **kwargs
+        additional arguments
+
+    Raises
+    ------
+    RuntimeError
+        if no valid system was found
+    """
+    if datafile is not None:
+        with open(datafile) as f:
+            all_sys = f.read().splitlines()
+    else:
+        all_sys = expand_sys_str(system)
+    if len(all_sys) == 0:
+        raise RuntimeError("Did not find valid system")
+
+    # fingerprints of all systems
+    if model is not None:
+        from deepmd.infer import (
+            DeepPot,
+        )
+
+        dp = DeepPot(model)
+        results = [_descriptor_fingerprints(dp, ss, set_prefix) for ss in all_sys]
+    else:
+        type_map, ntypes = _get_type_map(all_sys)
+        args = (set_prefix, type_map, ntypes, rcut, nbins)
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(
+                    executor.map(
+                        _structure_fingerprints,
+                        all_sys,
+                        *[[aa] * len(all_sys) for aa in args],
+                    )
+                )
+        else:
+            results = [_structure_fingerprints(ss, *args) for ss in all_sys]
+
+    # deduplicate frames in the order of systems
+    fps = _normalize(np.concatenate([rr[1] for rr in results]))
+    keys = [kk for rr in results for kk in rr[0]]
+    keep = np.ones(len(keys), dtype=bool)
+    if threshold > 0.0:
+        index = FingerprintIndex(fps.shape[1], 4.0 * threshold, seed=seed)
+        groups: Dict[bytes, List[int]] = {}
+        for ii, kk in enumerate(keys):
+            groups.setdefault(kk, []).append(ii)
+        for key, idx in groups.items():
+            keep[idx] = index.add_unique(key, fps[idx], threshold)
+    nunique = int(np.sum(keep))
+    if nframes is not None and nframes < nunique:
+        uidx = np.nonzero(keep)[0]
+        sel = diversity_subsample(fps[uidx], [keys[ii] for ii in uidx], nframes, seed)
+        keep[:] = False
+        keep[uidx[sel]] = True
+    log.info(
+        "# %d frames in total, %d unique, %d kept",
+        len(keys),
+        nunique,
+        int(np.sum(keep)),
+    )
+
+    # write systems
+    is_h5 = output.endswith((".h5", ".hdf5"))
+    h5_file = h5py.File(output, "w") if is_h5 else None
+    summary = []
+    offset = 0
+    try:
+        for ii, (sys_path, rr) in enumerate(zip(all_sys, results)):
+            set_nframes = rr[2]
+            sys_keep = keep[offset : offset + sum(set_nframes)]
+            offset += sum(set_nframes)
+            name = f"{ii:06d}"
+            nkeep = int(np.sum(sys_keep))
+            log.info("# %s: %d of %d frames kept", sys_path, nkeep, sum(set_nframes))
+            if nkeep == 0:
+                continue
+            if h5_file is not None:
+                group = h5_file.create_group(name)
+                group.attrs["system"] = str(sys_path)
+                _write_system(sys_path, set_prefix, set_nframes, sys_keep, None, group)
+            else:
+                _write_system(
+                    sys_path,
+                    set_prefix,
+                    set_nframes,
+                    sys_keep,
+                    Path(output) / name,
+                    None,
+                )
+            summary.append(
+                {
+                    "system": str(sys_path),
+                    "output": name,
+                    "nframes": sum(set_nframes),
+                    "kept": nkeep,
+                }
+            )
+    finally:
+        if h5_file is not None:
+            h5_file.close()
+    if not is_h5:
+        Path(output).mkdir(parents=True, exist_ok=True)
+        with open(Path(output) / "index.json", "w") as f:
+            json.dump({"systems": summary}, f, indent=2)
@@ -0,0 +1,258 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Extract the descriptors of systems with a frozen model."""
+
+import json
+import logging
+from pathlib import (
+    Path,
+)
+from typing import (
+    TYPE_CHECKING,
+    Optional,
+)
+
+import h5py
+import numpy as np
+
+from deepmd.common import (
+    expand_sys_str,
+)
+from deepmd.infer import (
+    DeepPot,
+)
+from deepmd.utils.data import (
+    DeepmdData,
+)
+
+if TYPE_CHECKING:
+    from deepmd.utils.path import (
+        DPPath,
+    )
+
+__all__ = ["eval_desc", "pool_descriptor"]
+
+log = logging.getLogger(__name__)
+
+
+def pool_descriptor(
+    descriptor: np.ndarray, pooling: str, atype: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Pool the descriptors of atoms in each frame.
+
+    Parameters
+    ----------
+    descriptor : np.ndarray
+        the descriptors, in the shape of nframes x natoms x ndescrpt
+    pooling : str
+        "none", "mean" or "max"
+    atype : np.ndarray, optional
+        the atom types, in the shape of nframes x natoms. Virtual atoms whose
+        types are negative are excluded from pooling
+
+    Returns
+    -------
+    np.ndarray
+        the descriptors, in the shape of nframes x ndescrpt if pooled,
+        otherwise unchanged
+    """
+    if pooling == "none":
+        return descriptor
+    if atype is not None and np.any(atype < 0):
+        mask = (atype >= 0)[:, :, None]
+        if pooling == "mean":
+            return np.sum(descriptor * mask, axis=1) / np.maximum(
+                np.sum(mask, axis=1), 1
+            )
+        if pooling == "max":
+            return np.max(np.where(mask, descriptor, -np.inf), axis=1)
+    elif pooling == "mean":
+        return np.mean(descriptor, axis=1)
+    elif pooling == "max":
+        return np.max(descriptor, axis=1)
+    raise ValueError(f"unknown pooling {pooling}")
+
+
+def _get_nframes(set_name: "DPPath") -> int:
+    # only the header is read
+    shape = (set_name / "coord.npy").get_numpy_shape()
+    return 1 if len(shape) == 1 else shape[0]
+
+
+def eval_desc(
+    *,
+    model: str,
+    system: str,
+    datafile: Optional[str],
+    set_prefix: str,
+    output: str,
+    pooling: str = "none",
+    dtype: str = "float32",
+    format: str = "npy",
+    chunk_atoms: int = 65536,
+    **kwargs,
+):
+    """Evaluate the descriptors of systems and write them to the disk.
+
+    The sets of each system are loaded one by one, and the frames are
+    evaluated in chunks of about `chunk_atoms` atoms, which are written to the
+    output before the next chunk is evaluated, so the memory usage does not
+    grow with the size of systems. Each chunk is further split into batches
+    by the automatic batch size of the model.
+
+    The descriptors of each system are written to `output/NNNNNN.npy` in the
+    npy format, which can be opened by `numpy.load(..., mmap_mode="r")`, or to
+    the dataset `NNNNNN` of `output/descriptors.h5` in the HDF5 format. The
+    paths, shapes and outputs of systems are listed in `output/index.json`.
+
+    Parameters
+    ----------
+    model : str
+        the frozen energy model
+    system : str
+        the system directory. Recursively detect systems in this directory
+    datafile : str, optional
+        the path to the list of systems. If given, `system` is ignored
+    set_prefix : str
+        the set prefix
+    output : str
+        the output directory
+    pooling : str, default: "none"
+        pooling of the descriptors over atoms in each frame: "none", "mean" or
+        "max". If pooled, the shape of the descriptors of a system is nframes x
+        ndescrpt, otherwise nframes x natoms x ndescrpt
+    dtype : str, default: "float32"
+        the data type of the output, "float32" or "float16"
+    format : str, default: "npy"
+        the output format, "npy" or "hdf5"
+    chunk_atoms : int, default: 65536
+        the number of atoms evaluated and written at once
+    **kwargs
+        additional arguments
+
+    Raises
+    ------
+    RuntimeError
+        if no valid system was found
+    ValueError
+        if the output format is unknown
+    """
+    if datafile is not None:
+        with open(datafile) as f:
+            all_sys = f.read().splitlines()
+    else:
+        all_sys = expand_sys_str(system)
+    if len(all_sys) == 0:
+        raise RuntimeError("Did not find valid system")
+    if format not in ("npy", "hdf5"):
+        raise ValueError(f"unknown format {format}")
+    dtype = np.dtype(dtype)
+
+    dp = DeepPot(model)
+    out_dir = Path(output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    h5_file = h5py.File(out_dir / "descriptors.h5", "w") if format == "hdf5" else None
+    index = []
+    try:
+        for ii, sys_path in enumerate(all_sys):
+            data = DeepmdData(
+                sys_path,
+                set_prefix,
+                shuffle_test=False,
+                type_map=dp.get_type_map(),
+                sort_atoms=False,
+            )
+            if dp.get_dim_fparam() > 0:
+                data.add(
+                    "fparam",
+                    dp.get_dim_fparam(),
+                    atomic=False,
+                    must=True,
+                    high_prec=False,
+                )
+            if dp.get_dim_aparam() > 0:
+                data.add(
+                    "aparam",
+                    dp.get_dim_aparam(),
+                    atomic=True,
+                    must=True,
+                    high_prec=False,
+                )
+            natoms = data.get_natoms()
+            nframes = sum(_get_nframes(dd) for dd in data.dirs)
+            # the number of frames in a chunk
+            nchunk = max(chunk_atoms // max(natoms, 1), 1)
+            name = f"{ii:06d}"
+            out = None
+            iframe = 0
+            for set_name in data.dirs:
+                set_data = data.load_set(set_name)
+                set_nframes = set_data["coord"].shape[0]
+                for start in range(0, set_nframes, nchunk):
+                    end = min(start + nchunk, set_nframes)
+                    if data.mixed_type:
+                        atype = set_data["type"][start:end]
+                    else:
+                        atype = data.get_atom_type()
+                    descriptor = dp.eval_descriptor(
+                        set_data["coord"][start:end],
+                        set_data["box"][start:end] if data.pbc else None,
+                        atype,
+                        fparam=set_data["fparam"][start:end]
+                        if dp.get_dim_fparam() > 0
+                        else None,
+                        aparam=set_data["aparam"][start:end]
+                        if dp.get_dim_aparam() > 0
+                        else None,
+                        mixed_type=data.mixed_type,
+                    )
+                    descriptor = pool_descriptor(
+                        descriptor,
+                        pooling,
+                        atype=set_data["type"][start:end] if data.mixed_type else None,
+                    ).astype(dtype)
+                    if out is None:
+                        shape = (nframes, *descriptor.shape[1:])
+                        if h5_file is not None:
+                            out = h5_file.create_dataset(name, shape=shape, dtype=dtype)
+                            out.attrs["system"] = str(sys_path)
+                        else:
+                            out = np.lib.format.open_memmap(
+                                out_dir / f"{name}.npy",
+                                mode="w+",
+                                dtype=dtype,
+                                shape=shape,
+                            )
+                    out[iframe : iframe + descriptor.shape[0]] = descriptor
+                    iframe += descriptor.shape[0]
+            if isinstance(out, np.memmap):
+                out.flush()
+            index.append(
+                {
+                    "system": str(sys_path),
+                    "output": name if h5_file is not None else f"{name}.npy",
+                    "shape": list(out.shape),
+                }
+            )
+            log.info(
+                "# descriptors of %s (%d frames) are written to %s",
+                sys_path,
+                nframes,
+                index[-1]["output"],
+            )
+            del out
+    finally:
+        if h5_file is not None:
+            h5_file.close()
+    with open(out_dir / "index.json", "w") as f:
+        json.dump(
+            {
+                "model": str(model),
+                "pooling": pooling,
+                "dtype": dtype.name,
+                "format": format,
+                "file": "descriptors.h5" if format == "hdf5" else None,
+                "systems": index,
+            },
+            f,
+            indent=2,
+        )
@@ -2,6 +2,9 @@
 """DeePMD-Kit entry point module."""
 
 import argparse
+from importlib import (
+    import_module,
+)
 from pathlib import (
     Path,
 )
@@ -14,24 +17,9 @@ from typing import (
 from deepmd.common import (
     clear_session,
 )
-from deepmd.entrypoints import (
-    compress,
-    convert,
-    doc_train_input,
-    freeze,
-    make_model_devi,
-    neighbor_stat,
-    start_dpgui,
-    test,
-    train_dp,
-    transfer,
-)
 from deepmd.loggers import (
     set_log_handles,
 )
-from deepmd.nvnmd.entrypoints.train import (
-    train_nvnmd,
-)
 from deepmd_cli.main import (
     get_ll,
     main_parser,
@@ -40,6 +28,25 @@ from deepmd_cli.main import (
 
 __all__ = ["main", "parse_args", "get_ll", "main_parser"]
 
+# the module and the function of the entry point of each command, which are
+# imported only when the command is run to avoid loading unused modules
+COMMANDS = {
+    "train": ("deepmd.entrypoints.train", "train"),
+    "freeze": ("deepmd.entrypoints.freeze", "freeze"),
+    "test": ("deepmd.entrypoints.test", "test"),
+    "transfer": ("deepmd.entrypoints.transfer", "transfer"),
+    "compress": ("deepmd.entrypoints.compress", "compress"),
+    "doc-train-input": ("deepmd.entrypoints.doc", "doc_train_input"),
+    "model-devi": ("deepmd.infer.model_devi", "make_model_devi"),
+    "convert-from": ("deepmd.entrypoints.convert", "convert"),
+    "neighbor-stat": ("deepmd.entrypoints.neighbor_stat", "neighbor_stat"),
+    "train-nvnmd": ("deepmd.nvnmd.entrypoints.train", "train_nvnmd"),
+    "gui": ("deepmd.entrypoints.gui", "start_dpgui"),
+    "bench": ("deepmd.entrypoints.bench", "bench"),
+    "eval-desc": ("deepmd.entrypoints.eval_desc", "eval_desc"),
+    "dedup": ("deepmd.entrypoints.dedup", "dedup"),
+}
+
 
 def main(args: Optional[Union[List[str], argparse.Namespace]] = None):
     """DeePMD-Kit entry point.
@@ -70,28 +77,9 @@ def main(args: Optional[Union[List[str], argparse.Namespace]] = None):
 
     dict_args = vars(args)
 
-    if args.command == "train":
-        train_dp(**dict_args)
-    elif args.command == "freeze":
-        freeze(**dict_args)
-    elif args.command == "test":
-        test(**dict_args)
-    elif args.command == "transfer":
-        transfer(**dict_args)
-    elif args.command == "compress":
-        compress(**dict_args)
-    elif args.command == "doc-train-input":
-        doc_train_input(**dict_args)
-    elif args.command == "model-devi":
-        make_model_devi(**dict_args)
-    elif args.command == "convert-from":
-        convert(**dict_args)
-    elif args.command == "neighbor-stat":
-        neighbor_stat(**dict_args)
-    elif args.command == "train-nvnmd":  # nvnmd
-        train_nvnmd(**dict_args)
-    elif args.command == "gui":
-        start_dpgui(**dict_args)
+    if args.command in COMMANDS:
+        module, func = COMMANDS[args.command]
+        getattr(import_module(module), func)(**dict_args)
     elif args.command is None:
         pass
     else:
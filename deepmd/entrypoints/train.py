@@ -10,9 +10,12 @@ import time
 from typing import (
     Any,
     Dict,
+    List,
     Optional,
 )
 
+import numpy as np
+
 from deepmd.common import (
     data_requirement,
     expand_sys_str,
@@ -46,9 +49,17 @@ from deepmd.utils.argcheck import (
 from deepmd.utils.compat import (
     update_deepmd_input,
 )
+from deepmd.utils.data_shard import (
+    shard_systems,
+)
 from deepmd.utils.data_system import (
     DeepmdDataSystem,
 )
+from deepmd.utils.distributed_stat import (
+    distributed_stat,
+    get_rank,
+    get_size,
+)
 from deepmd.utils.finetune import (
     replace_model_params_with_pretrained_model,
 )
@@ -66,6 +77,9 @@ __all__ = ["train"]
 
 log = logging.getLogger(__name__)
 
+# the number of training steps before timing in the benchmark mode
+BENCHMARK_WARMUP = 10
+
 
 def train(
     *,
@@ -80,6 +94,8 @@ def train(
     is_compress: bool = False,
     skip_neighbor_stat: bool = False,
     finetune: Optional[str] = None,
+    benchmark: int = 0,
+    benchmark_output: str = "benchmark.json",
     **kwargs,
 ):
     """Run DeePMD model training.
@@ -108,6 +124,11 @@ def train(
         skip checking neighbor statistics
     finetune : Optional[str]
         path to pretrained model or None
+    benchmark : int, default=0
+        if positive, measure the training throughput on this number of steps
+        instead of training
+    benchmark_output : str, default="benchmark.json"
+        path for dump file with benchmark results
     **kwargs
         additional arguments
 
@@ -146,7 +167,9 @@ def train(
     jdata = normalize(jdata)
 
     if not is_compress and not skip_neighbor_stat:
-        jdata = update_sel(jdata)
+        # each rank scans a part of the data
+        with distributed_stat(run_opt._HVD):
+            jdata = update_sel(jdata)
 
     with open(output, "w") as fp:
         json.dump(jdata, fp, indent=4)
@@ -165,10 +188,22 @@ def train(
     run_opt.print_resource_summary()
     if origin_type_map is not None:
         jdata["model"]["origin_type_map"] = origin_type_map
-    _do_work(jdata, run_opt, is_compress)
+    _do_work(
+        jdata,
+        run_opt,
+        is_compress,
+        benchmark=benchmark,
+        benchmark_output=benchmark_output,
+    )
 
 
-def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = False):
+def _do_work(
+    jdata: Dict[str, Any],
+    run_opt: RunOptions,
+    is_compress: bool = False,
+    benchmark: int = 0,
+    benchmark_output: str = "benchmark.json",
+):
     """Run serial model training.
 
     Parameters
@@ -179,6 +214,11 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
         object with run configuration
     is_compress : Bool
         indicates whether in model compress mode
+    benchmark : int, default=0
+        if positive, measure the training throughput on this number of steps
+        instead of training
+    benchmark_output : str, default="benchmark.json"
+        path for dump file with benchmark results
 
     Raises
     ------
@@ -211,6 +251,11 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
     # check the multi-task mode
     multi_task_mode = "fitting_net_dict" in jdata["model"]
 
+    # the precision of the data stored in memory
+    data_prec = get_data_prec(jdata)
+    if data_prec is not None:
+        log.info(f"the training data are stored in {np.dtype(data_prec).name}")
+
     # decouple the training data from the model compress process
     train_data = None
     valid_data = None
@@ -218,15 +263,26 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
         # init data
         if not multi_task_mode:
             train_data = get_data(
-                jdata["training"]["training_data"], rcut, ipt_type_map, modifier
+                jdata["training"]["training_data"],
+                rcut,
+                ipt_type_map,
+                modifier,
+                rank=run_opt.my_rank,
+                size=run_opt.world_size,
+                data_prec=data_prec,
             )
             train_data.print_summary("training")
-            if jdata["training"].get("validation_data", None) is not None:
+            if jdata["training"].get("validation_data", None) is not None and (
+                run_opt.is_chief
+                or not jdata["training"]["training_data"].get("shard", False)
+            ):
+                # only the chief validates the model
                 valid_data = get_data(
                     jdata["training"]["validation_data"],
                     rcut,
                     train_data.type_map,
                     modifier,
+                    data_prec=data_prec,
                 )
                 valid_data.print_summary("validation")
         else:
@@ -242,15 +298,20 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
                         ipt_type_map,
                         modifier,
                         multi_task_mode,
+                        rank=run_opt.my_rank,
+                        size=run_opt.world_size,
+                        data_prec=data_prec,
                     )
                     train_data[data_systems].print_summary(
                         f"training in {data_systems}"
                     )
-                    if (
-                        jdata["training"]["data_dict"][data_systems].get(
-                            "validation_data", None
-                        )
-                        is not None
+                    if jdata["training"]["data_dict"][data_systems].get(
+                        "validation_data", None
+                    ) is not None and (
+                        run_opt.is_chief
+                        or not jdata["training"]["data_dict"][data_systems][
+                            "training_data"
+                        ].get("shard", False)
                     ):
                         valid_data[data_systems] = get_data(
                             jdata["training"]["data_dict"][data_systems][
@@ -260,6 +321,7 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
                             train_data[data_systems].type_map,
                             modifier,
                             multi_task_mode,
+                            data_prec=data_prec,
                         )
                         valid_data[data_systems].print_summary(
                             f"validation in {data_systems}"
@@ -270,6 +332,9 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
 
     # get training info
     stop_batch = j_must_have(jdata["training"], "numb_steps")
+    if benchmark > 0:
+        # the learning rate decays as if the benchmark steps were the whole training
+        stop_batch = benchmark + BENCHMARK_WARMUP
     origin_type_map = jdata["model"].get("origin_type_map", None)
     if (
         origin_type_map is not None and not origin_type_map
@@ -279,7 +344,13 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
         ).get_type_map()
     model.build(train_data, stop_batch, origin_type_map=origin_type_map)
 
-    if not is_compress:
+    if benchmark > 0:
+        results = model.benchmark(train_data, benchmark, numb_warmup=BENCHMARK_WARMUP)
+        if run_opt.is_chief:
+            with open(benchmark_output, "w") as fp:
+                json.dump(results, fp, indent=4)
+        log.info("finished benchmark")
+    elif not is_compress:
         # train the model with the provided systems in a cyclic way
         start_time = time.time()
         model.train(train_data, valid_data)
@@ -291,7 +362,16 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
         log.info("finished compressing")
 
 
-def get_data(jdata: Dict[str, Any], rcut, type_map, modifier, multi_task_mode=False):
+def get_data(
+    jdata: Dict[str, Any],
+    rcut,
+    type_map,
+    modifier,
+    multi_task_mode=False,
+    rank: int = 0,
+    size: int = 1,
+    data_prec: Optional[type] = None,
+):
     systems = j_must_have(jdata, "systems")
     if isinstance(systems, str):
         systems = expand_sys_str(systems)
@@ -319,6 +399,31 @@ def get_data(jdata: Dict[str, Any], rcut, type_map, modifier, multi_task_mode=Fa
     sys_probs = jdata.get("sys_probs", None)
     auto_prob = jdata.get("auto_prob", "prob_sys_size")
     optional_type_map = not multi_task_mode
+    sys_sets = None
+
+    if size > 1 and jdata.get("shard", False):
+        if not type_map:
+            raise RuntimeError(
+                "type_map should be set in the model to shard the data systems"
+            )
+        shard = shard_systems(
+            systems,
+            batch_size,
+            rank,
+            size,
+            sys_probs=sys_probs,
+            auto_prob_style=auto_prob,
+        )
+        if shard is None:
+            log.warning(
+                "the data systems cannot be sharded to %d ranks, "
+                "so all the systems are loaded by each rank" % size
+            )
+        else:
+            systems = shard["systems"]
+            sys_sets = shard["sys_sets"]
+            batch_size = shard["batch_size"]
+            sys_probs = shard["sys_probs"]
 
     data = DeepmdDataSystem(
         systems=systems,
@@ -332,12 +437,67 @@ def get_data(jdata: Dict[str, Any], rcut, type_map, modifier, multi_task_mode=Fa
         trn_all_set=True,  # sample from all sets
         sys_probs=sys_probs,
         auto_prob_style=auto_prob,
+        sys_sets=sys_sets,
+        is_shard=sys_sets is not None,
+        sampler=jdata.get("sampler", "random"),
+        bucket_natoms=jdata.get("bucket_natoms"),
+        data_prec=data_prec,
     )
     data.add_dict(data_requirement)
 
     return data
 
 
+def _get_precisions(jdata: Any) -> List[str]:
+    """Get the precisions of all the networks in the model parameters."""
+    if isinstance(jdata, dict):
+        precisions = []
+        for kk, vv in jdata.items():
+            if kk == "precision":
+                precisions.append(vv)
+            else:
+                precisions.extend(_get_precisions(vv))
+        return precisions
+    if isinstance(jdata, list):
+        return [pp for vv in jdata for pp in _get_precisions(vv)]
+    return []
+
+
+def get_data_prec(jdata: Dict[str, Any]) -> Optional[type]:
+    """Get the precision of the data stored in memory.
+
+    With `training/data_prec` of "auto", the data are stored in float32 if the
+    mixed precision is enabled or all the networks of the model run in float32
+    or lower, otherwise in the default precision. The energies and the reduced
+    items are always stored in `GLOBAL_ENER_FLOAT_PRECISION`.
+
+    Parameters
+    ----------
+    jdata : Dict[str, Any]
+        arguments read form json/yaml control file
+
+    Returns
+    -------
+    type, optional
+        the numpy precision of the data, or None for the default precision
+    """
+    data_prec = jdata["training"].get("data_prec", "auto")
+    if data_prec == "default":
+        return None
+    elif data_prec in ("float32", "float64"):
+        return np.dtype(data_prec).type
+    elif data_prec != "auto":
+        raise RuntimeError("unknown data_prec " + data_prec)
+    if jdata["training"].get("mixed_precision") is not None:
+        return np.float32
+    precisions = _get_precisions(jdata["model"])
+    if len(precisions) > 0 and all(
+        pp in ("float32", "float16", "bfloat16") for pp in precisions
+    ):
+        return np.float32
+    return None
+
+
 def get_modifier(modi_data=None):
     modifier: Optional[DipoleChargeModifier]
     if modi_data is not None:
@@ -348,6 +508,8 @@ def get_modifier(modi_data=None):
                 modi_data["sys_charge_map"],
                 modi_data["ewald_h"],
                 modi_data["ewald_beta"],
+                fused=modi_data.get("fused", False),
+                cache_dir=modi_data.get("cache_dir", None),
             )
         else:
             raise RuntimeError("unknown modifier type " + str(modi_data["type"]))
@@ -388,7 +550,12 @@ def get_nbor_stat(jdata, rcut, one_type: bool = False):
     multi_task_mode = "data_dict" in jdata["training"]
     if not multi_task_mode:
         train_data = get_data(
-            jdata["training"]["training_data"], max_rcut, type_map, None
+            jdata["training"]["training_data"],
+            max_rcut,
+            type_map,
+            None,
+            rank=get_rank(),
+            size=get_size(),
         )
         train_data.get_batch()
     else:
@@ -402,6 +569,8 @@ def get_nbor_stat(jdata, rcut, one_type: bool = False):
                 max_rcut,
                 type_map,
                 None,
+                rank=get_rank(),
+                size=get_size(),
             )
             tmp_data.get_batch()
             assert (
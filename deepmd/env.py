@@ -1,5 +1,10 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
-"""Module that sets tensorflow working environment and exports inportant constants."""
+"""Module that sets tensorflow working environment and exports inportant constants.
+
+TensorFlow, the op libraries, the package constants and the default session
+config are loaded on the first access of the corresponding attributes, so
+that importing this module, e.g. to read the data precision, is cheap.
+"""
 
 import ctypes
 import logging
@@ -19,6 +24,8 @@ from typing import (
     TYPE_CHECKING,
     Any,
     Dict,
+    List,
+    Optional,
     Tuple,
 )
 
@@ -27,13 +34,27 @@ from packaging.version import (
     Version,
 )
 
-import deepmd.lib
-
 if TYPE_CHECKING:
     from types import (
         ModuleType,
     )
 
+    import tensorflow.compat.v1 as tf
+
+    # loaded on first access, see `__getattr__`
+    tfv2: ModuleType
+    tf_py_version: str
+    SHARED_LIB_DIR: Path
+    CONFIG_FILE: Path
+    GLOBAL_CONFIG: Dict[str, str]
+    MODEL_VERSION: str
+    TF_VERSION: str
+    TF_CXX11_ABI_FLAG: int
+    GLOBAL_TF_FLOAT_PRECISION: tf.DType
+    default_tf_session_config: tf.ConfigProto
+    op_module: ModuleType
+    op_grads_module: ModuleType
+
 
 def dlopen_library(module: str, filename: str):
     """Dlopen a library from a module.
@@ -56,29 +77,47 @@ def dlopen_library(module: str, filename: str):
             ctypes.CDLL(str(libs[0].absolute()))
 
 
-# dlopen pip cuda library before tensorflow
-if platform.system() == "Linux":
-    dlopen_library("nvidia.cuda_runtime.lib", "libcudart.so*")
-    dlopen_library("nvidia.cublas.lib", "libcublasLt.so*")
-    dlopen_library("nvidia.cublas.lib", "libcublas.so*")
-    dlopen_library("nvidia.cufft.lib", "libcufft.so*")
-    dlopen_library("nvidia.curand.lib", "libcurand.so*")
-    dlopen_library("nvidia.cusolver.lib", "libcusolver.so*")
-    dlopen_library("nvidia.cusparse.lib", "libcusparse.so*")
-    dlopen_library("nvidia.cudnn.lib", "libcudnn.so*")
+def _import_tf() -> "ModuleType":
+    """Import TensorFlow with the v1 behavior."""
+    # dlopen pip cuda library before tensorflow
+    if platform.system() == "Linux":
+        dlopen_library("nvidia.cuda_runtime.lib", "libcudart.so*")
+        dlopen_library("nvidia.cublas.lib", "libcublasLt.so*")
+        dlopen_library("nvidia.cublas.lib", "libcublas.so*")
+        dlopen_library("nvidia.cufft.lib", "libcufft.so*")
+        dlopen_library("nvidia.curand.lib", "libcurand.so*")
+        dlopen_library("nvidia.cusolver.lib", "libcusolver.so*")
+        dlopen_library("nvidia.cusparse.lib", "libcusparse.so*")
+        dlopen_library("nvidia.cudnn.lib", "libcudnn.so*")
+
+    # import tensorflow v1 compatability
+    try:
+        import tensorflow.compat.v1 as tf
 
+        tf.disable_v2_behavior()
+    except ImportError:
+        import tensorflow as tf
+    return tf
 
-# import tensorflow v1 compatability
-try:
-    import tensorflow.compat.v1 as tf
 
-    tf.disable_v2_behavior()
-except ImportError:
-    import tensorflow as tf
-try:
-    import tensorflow.compat.v2 as tfv2
-except ImportError:
-    tfv2 = None
+def _import_tfv2() -> "ModuleType":
+    """Import the TensorFlow v2 API after TensorFlow is set up."""
+    _get("tf")
+    try:
+        import tensorflow.compat.v2 as tfv2
+    except ImportError:
+        tfv2 = None
+    return tfv2
+
+
+def _get_tf_py_version() -> str:
+    """Get the version of the TensorFlow Python library."""
+    tf = _get("tf")
+    try:
+        return tf.version.VERSION
+    except AttributeError:
+        return tf.__version__
+
 
 __all__ = [
     "GLOBAL_CONFIG",
@@ -105,14 +144,6 @@ __all__ = [
 ]
 
 SHARED_LIB_MODULE = "lib"
-SHARED_LIB_DIR = Path(deepmd.lib.__path__[0])
-CONFIG_FILE = SHARED_LIB_DIR / "run_config.ini"
-
-# Python library version
-try:
-    tf_py_version = tf.version.VERSION
-except AttributeError:
-    tf_py_version = tf.__version__
 
 EMBEDDING_NET_PATTERN = str(
     r"filter_type_\d+/matrix_\d+_\d+|"
@@ -326,21 +357,19 @@ def get_tf_session_config() -> Any:
                 set_env_if_empty(
                     "XLA_FLAGS", "--xla_gpu_cuda_data_dir=" + cuda_data_dir
                 )
+    tf = _get("tf")
     config = tf.ConfigProto(
         gpu_options=tf.GPUOptions(allow_growth=True),
         intra_op_parallelism_threads=intra,
         inter_op_parallelism_threads=inter,
     )
-    if Version(tf_py_version) >= Version("1.15") and int(
+    if Version(_get("tf_py_version")) >= Version("1.15") and int(
         os.environ.get("DP_AUTO_PARALLELIZATION", 0)
     ):
         config.graph_options.rewrite_options.custom_optimizers.add().name = "dpparallel"
     return config
 
 
-default_tf_session_config = get_tf_session_config()
-
-
 def reset_default_tf_session_config(cpu_only: bool):
     """Limit tensorflow session to CPU or not.
 
@@ -349,7 +378,7 @@ def reset_default_tf_session_config(cpu_only: bool):
     cpu_only : bool
         If enabled, no GPU device is visible to the TensorFlow Session.
     """
-    global default_tf_session_config
+    default_tf_session_config = _get("default_tf_session_config")
     if cpu_only:
         default_tf_session_config.device_count["GPU"] = 0
     else:
@@ -379,11 +408,17 @@ def get_module(module_name: str) -> "ModuleType":
         ext = ".so"
         prefix = "lib"
 
-    module_file = (SHARED_LIB_DIR / (prefix + module_name)).with_suffix(ext).resolve()
+    module_file = (
+        (_get("SHARED_LIB_DIR") / (prefix + module_name)).with_suffix(ext).resolve()
+    )
 
     if not module_file.is_file():
         raise FileNotFoundError(f"module {module_name} does not exist")
     else:
+        tf = _get("tf")
+        tf_py_version = _get("tf_py_version")
+        TF_CXX11_ABI_FLAG = _get("TF_CXX11_ABI_FLAG")
+        TF_VERSION = _get("TF_VERSION")
         try:
             module = tf.load_op_library(str(module_file))
         except tf.errors.NotFoundError as e:
@@ -447,43 +482,35 @@ def get_module(module_name: str) -> "ModuleType":
 
 
 def _get_package_constants(
-    config_file: Path = CONFIG_FILE,
+    config_file: Optional[Path] = None,
 ) -> Dict[str, str]:
     """Read package constants set at compile time by CMake to dictionary.
 
     Parameters
     ----------
     config_file : str, optional
-        path to CONFIG file, by default "run_config.ini"
+        path to CONFIG file, by default "run_config.ini" in the library directory
 
     Returns
     -------
     Dict[str, str]
         dictionary with package constants
     """
+    if config_file is None:
+        config_file = _get("CONFIG_FILE")
     config = ConfigParser()
     config.read(config_file)
     return dict(config.items("CONFIG"))
 
 
-GLOBAL_CONFIG = _get_package_constants()
-MODEL_VERSION = GLOBAL_CONFIG["model_version"]
-TF_VERSION = GLOBAL_CONFIG["tf_version"]
-TF_CXX11_ABI_FLAG = int(GLOBAL_CONFIG["tf_cxx11_abi_flag"])
-
-op_module = get_module("deepmd_op")
-op_grads_module = get_module("op_grads")
-
 # FLOAT_PREC
 dp_float_prec = os.environ.get("DP_INTERFACE_PREC", "high").lower()
 if dp_float_prec in ("high", ""):
     # default is high
-    GLOBAL_TF_FLOAT_PRECISION = tf.float64
     GLOBAL_NP_FLOAT_PRECISION = np.float64
     GLOBAL_ENER_FLOAT_PRECISION = np.float64
     global_float_prec = "double"
 elif dp_float_prec == "low":
-    GLOBAL_TF_FLOAT_PRECISION = tf.float32
     GLOBAL_NP_FLOAT_PRECISION = np.float32
     GLOBAL_ENER_FLOAT_PRECISION = np.float64
     global_float_prec = "float"
@@ -495,7 +522,7 @@ else:
     )
 
 
-def global_cvt_2_tf_float(xx: tf.Tensor) -> tf.Tensor:
+def global_cvt_2_tf_float(xx: "tf.Tensor") -> "tf.Tensor":
     """Cast tensor to globally set TF precision.
 
     Parameters
@@ -508,10 +535,10 @@ def global_cvt_2_tf_float(xx: tf.Tensor) -> tf.Tensor:
     tf.Tensor
         output tensor cast to `GLOBAL_TF_FLOAT_PRECISION`
     """
-    return tf.cast(xx, GLOBAL_TF_FLOAT_PRECISION)
+    return _get("tf").cast(xx, _get("GLOBAL_TF_FLOAT_PRECISION"))
 
 
-def global_cvt_2_ener_float(xx: tf.Tensor) -> tf.Tensor:
+def global_cvt_2_ener_float(xx: "tf.Tensor") -> "tf.Tensor":
     """Cast tensor to globally set energy precision.
 
     Parameters
@@ -524,4 +551,75 @@ def global_cvt_2_ener_float(xx: tf.Tensor) -> tf.Tensor:
     tf.Tensor
         output tensor cast to `GLOBAL_ENER_FLOAT_PRECISION`
     """
-    return tf.cast(xx, GLOBAL_ENER_FLOAT_PRECISION)
+    return _get("tf").cast(xx, GLOBAL_ENER_FLOAT_PRECISION)
+
+
+def _get_shared_lib_dir() -> Path:
+    return Path(import_module("deepmd.lib").__path__[0])
+
+
+def _get_config_file() -> Path:
+    return _get("SHARED_LIB_DIR") / "run_config.ini"
+
+
+def _get_model_version() -> str:
+    return _get("GLOBAL_CONFIG")["model_version"]
+
+
+def _get_tf_version() -> str:
+    return _get("GLOBAL_CONFIG")["tf_version"]
+
+
+def _get_tf_cxx11_abi_flag() -> int:
+    return int(_get("GLOBAL_CONFIG")["tf_cxx11_abi_flag"])
+
+
+def _get_global_tf_float_precision() -> "tf.DType":
+    tf = _get("tf")
+    return tf.float32 if global_float_prec == "float" else tf.float64
+
+
+def _get_op_module() -> "ModuleType":
+    return get_module("deepmd_op")
+
+
+def _get_op_grads_module() -> "ModuleType":
+    return get_module("op_grads")
+
+
+# the attributes loaded on first access, see `__getattr__`
+_LAZY_ATTRS = {
+    "tf": _import_tf,
+    "tfv2": _import_tfv2,
+    "tf_py_version": _get_tf_py_version,
+    "SHARED_LIB_DIR": _get_shared_lib_dir,
+    "CONFIG_FILE": _get_config_file,
+    "GLOBAL_CONFIG": _get_package_constants,
+    "MODEL_VERSION": _get_model_version,
+    "TF_VERSION": _get_tf_version,
+    "TF_CXX11_ABI_FLAG": _get_tf_cxx11_abi_flag,
+    "GLOBAL_TF_FLOAT_PRECISION": _get_global_tf_float_precision,
+    "default_tf_session_config": get_tf_session_config,
+    "op_module": _get_op_module,
+    "op_grads_module": _get_op_grads_module,
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Load TensorFlow, the op libraries and the package constants on first access."""
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = _LAZY_ATTRS[name]()
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
+
+def _get(name: str) -> Any:
+    """Get an attribute of this module, loading it if needed."""
+    if name in globals():
+        return globals()[name]
+    return __getattr__(name)
@@ -37,6 +37,12 @@ from .ewald_recp import (
 from .model_devi import (
     calc_model_devi,
 )
+from .neighbor_list import (
+    VerletDeepPot,
+)
+from .server import (
+    DeepPotServer,
+)
 
 __all__ = [
     "DeepPotential",
@@ -45,10 +51,12 @@ __all__ = [
     "DeepGlobalPolar",
     "DeepPolar",
     "DeepPot",
+    "DeepPotServer",
     "DeepDOS",
     "DeepWFC",
     "DipoleChargeModifier",
     "EwaldRecp",
+    "VerletDeepPot",
     "calc_model_devi",
 ]
 
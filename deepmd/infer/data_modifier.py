@@ -1,8 +1,16 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
+import hashlib
+import json
+import logging
 import os
+from pathlib import (
+    Path,
+)
 from typing import (
     List,
+    Optional,
     Tuple,
+    Union,
 )
 
 import numpy as np
@@ -23,6 +31,9 @@ from deepmd.infer.deep_dipole import (
 from deepmd.infer.ewald_recp import (
     EwaldRecp,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 from deepmd.utils.data import (
     DeepmdData,
 )
@@ -30,6 +41,8 @@ from deepmd.utils.sess import (
     run_sess,
 )
 
+log = logging.getLogger(__name__)
+
 
 class DipoleChargeModifier(DeepDipole):
     """Parameters
@@ -44,6 +57,15 @@ class DipoleChargeModifier(DeepDipole):
             Grid spacing of the reciprocal part of Ewald sum. Unit: A
     ewald_beta
             Splitting parameter of the Ewald sum. Unit: A^{-1}
+    auto_batch_size
+            If True, automatic batch size will be used. If int, it will be used
+            as the initial batch size.
+    fused
+            If True, the dipole model, the reciprocal part of the Ewald sum and
+            the force and virial correction are evaluated in one session run
+    cache_dir
+            If given, the modifications of the training data are stored in this
+            directory and reused when the same frames are loaded again
     """
 
     def __init__(
@@ -53,18 +75,28 @@ class DipoleChargeModifier(DeepDipole):
         sys_charge_map: List[float],
         ewald_h: float = 1,
         ewald_beta: float = 1,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
+        fused: bool = False,
+        cache_dir: Optional[str] = None,
     ) -> None:
         """Constructor."""
         # the dipole model is loaded with prefix 'dipole_charge'
         self.modifier_prefix = "dipole_charge"
         # init dipole model
         DeepDipole.__init__(
-            self, model_name, load_prefix=self.modifier_prefix, default_tf_graph=True
+            self,
+            model_name,
+            load_prefix=self.modifier_prefix,
+            default_tf_graph=True,
+            auto_batch_size=auto_batch_size,
         )
         self.model_name = model_name
         self.model_charge_map = model_charge_map
         self.sys_charge_map = sys_charge_map
         self.sel_type = list(self.get_sel_type())
+        self.fused = fused
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self._model_hash = None
         # init ewald recp
         self.ewald_h = ewald_h
         self.ewald_beta = ewald_beta
@@ -86,7 +118,12 @@ class DipoleChargeModifier(DeepDipole):
         self.ndescrpt_r = self.nnei_r * 1
         assert self.ndescrpt == self.ndescrpt_a + self.ndescrpt_r
         self.force = None
+        self.fused_outputs = None
         self.ntypes = len(self.sel_a)
+        # charge of real atoms and WFCCs, indexed by atom types
+        self.sys_charge = np.array(self.sys_charge_map, dtype=float)
+        self.wfcc_charge = np.zeros(self.ntypes)
+        self.wfcc_charge[self.sel_type] = self.model_charge_map
 
     def build_fv_graph(self) -> tf.Tensor:
         """Build the computational graph for the force and virial inference."""
@@ -114,14 +151,38 @@ class DipoleChargeModifier(DeepDipole):
 
     def _build_fv_graph_inner(self):
         self.t_ef = tf.placeholder(GLOBAL_TF_FLOAT_PRECISION, [None], name="t_ef")
-        nf = 10
-        nfxnas = 64 * nf
-        nfxna = 192 * nf
-        nf = -1
-        nfxnas = -1
-        nfxna = -1
         self.t_box_reshape = tf.reshape(self.t_box, [-1, 9])
         t_nframes = tf.shape(self.t_box_reshape)[0]
+        # nframes x (natoms_sel x 3)
+        t_ef_reshape = tf.reshape(self.t_ef, [t_nframes, -1])
+        force, virial, atom_virial = self._build_fv_correction(t_ef_reshape)
+        force = tf.identity(force, name="o_dm_force")
+        virial = tf.identity(virial, name="o_dm_virial")
+        atom_virial = tf.identity(atom_virial, name="o_dm_av")
+        return force, virial, atom_virial
+
+    def _build_fv_correction(
+        self, ext_f: tf.Tensor
+    ) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor]:
+        """Build the force and virial correction from the external force on WFCCs.
+
+        Parameters
+        ----------
+        ext_f
+            The external force on WFCCs, nframes x (natoms_sel x 3)
+
+        Returns
+        -------
+        force
+            The force correction, nframes x (natoms x 3)
+        virial
+            The virial correction, nframes x 9
+        atom_virial
+            The atomic virial correction, nframes x (natoms x 9)
+        """
+        nf = -1
+        nfxna = -1
+        t_nframes = tf.shape(tf.reshape(self.t_box, [-1, 9]))[0]
 
         # (nframes x natoms) x ndescrpt
         self.descrpt = self.graph.get_tensor_by_name(
@@ -136,32 +197,26 @@ class DipoleChargeModifier(DeepDipole):
         self.rij = self.graph.get_tensor_by_name(
             os.path.join(self.modifier_prefix, "o_rij:0")
         )
-        # self.descrpt_reshape = tf.reshape(self.descrpt, [nf, 192 * self.ndescrpt])
-        # self.descrpt_deriv = tf.reshape(self.descrpt_deriv, [nf, 192 * self.ndescrpt * 3])
 
-        # nframes x (natoms_sel x 3)
-        self.t_ef_reshape = tf.reshape(self.t_ef, [t_nframes, -1])
         # nframes x (natoms x 3)
-        self.t_ef_reshape = self._enrich(self.t_ef_reshape, dof=3)
+        t_ef_reshape = self._enrich(ext_f, dof=3)
         # (nframes x natoms) x 3
-        self.t_ef_reshape = tf.reshape(self.t_ef_reshape, [nfxna, 3])
+        t_ef_reshape = tf.reshape(t_ef_reshape, [nfxna, 3])
         # nframes x (natoms_sel x 3)
-        self.t_tensor_reshape = tf.reshape(self.t_tensor, [t_nframes, -1])
+        t_tensor_reshape = tf.reshape(self.t_tensor, [t_nframes, -1])
         # nframes x (natoms x 3)
-        self.t_tensor_reshape = self._enrich(self.t_tensor_reshape, dof=3)
+        t_tensor_reshape = self._enrich(t_tensor_reshape, dof=3)
         # (nframes x natoms) x 3
-        self.t_tensor_reshape = tf.reshape(self.t_tensor_reshape, [nfxna, 3])
+        t_tensor_reshape = tf.reshape(t_tensor_reshape, [nfxna, 3])
         # (nframes x natoms) x ndescrpt
-        [self.t_ef_d] = tf.gradients(
-            self.t_tensor_reshape, self.descrpt, self.t_ef_reshape
-        )
+        [t_ef_d] = tf.gradients(t_tensor_reshape, self.descrpt, t_ef_reshape)
         # nframes x (natoms x ndescrpt)
-        self.t_ef_d = tf.reshape(self.t_ef_d, [nf, self.t_natoms[0] * self.ndescrpt])
+        t_ef_d = tf.reshape(t_ef_d, [nf, self.t_natoms[0] * self.ndescrpt])
         # t_ef_d is force (with -1), prod_forc takes deriv, so we need the opposite
-        self.t_ef_d_oppo = -self.t_ef_d
+        t_ef_d_oppo = -t_ef_d
 
         force = op_module.prod_force_se_a(
-            self.t_ef_d_oppo,
+            t_ef_d_oppo,
             self.descrpt_deriv,
             self.nlist,
             self.t_natoms,
@@ -169,7 +224,7 @@ class DipoleChargeModifier(DeepDipole):
             n_r_sel=self.nnei_r,
         )
         virial, atom_virial = op_module.prod_virial_se_a(
-            self.t_ef_d_oppo,
+            t_ef_d_oppo,
             self.descrpt_deriv,
             self.rij,
             self.nlist,
@@ -177,11 +232,69 @@ class DipoleChargeModifier(DeepDipole):
             n_a_sel=self.nnei_a,
             n_r_sel=self.nnei_r,
         )
-        force = tf.identity(force, name="o_dm_force")
-        virial = tf.identity(virial, name="o_dm_virial")
-        atom_virial = tf.identity(atom_virial, name="o_dm_av")
         return force, virial, atom_virial
 
+    def build_fused_graph(self) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor]:
+        """Build the graph evaluating the whole modification in one session run.
+
+        The WFCCs are placed by the dipole model, the reciprocal part of the
+        Ewald sum is computed from the real atoms and the WFCCs, and the
+        external force on the WFCCs is passed back to the real atoms through
+        the derivative of the dipole model. The inputs are sorted by atom types.
+
+        Returns
+        -------
+        energy
+            The energy modification, nframes
+        force
+            The force modification in the sorted order, nframes x (natoms x 3)
+        virial
+            The virial modification, nframes x 9
+        """
+        with self.graph.as_default(), tf.name_scope("dm_fused"):
+            # indexes of the selected atoms in the sorted atoms
+            self.t_sel_idx = tf.placeholder(tf.int32, [None], name="t_sel_idx")
+            # charges of the real atoms and the WFCCs
+            self.t_all_charge = tf.placeholder(
+                GLOBAL_TF_FLOAT_PRECISION, [None], name="t_all_charge"
+            )
+            box = tf.reshape(self.t_box, [-1, 9])
+            nframes = tf.shape(box)[0]
+            natoms = self.t_natoms[0]
+            nsel = tf.shape(self.t_sel_idx)[0]
+            coord = tf.reshape(self.t_coord, [nframes, natoms, 3])
+            dipole = tf.reshape(self.t_tensor, [nframes, nsel, 3])
+            wfcc_coord = tf.gather(coord, self.t_sel_idx, axis=1) + dipole
+            all_coord = tf.concat([coord, wfcc_coord], axis=1)
+            all_charge = tf.tile(tf.reshape(self.t_all_charge, [1, -1]), [nframes, 1])
+            energy, all_force, all_virial = op_module.ewald_recp(
+                tf.reshape(all_coord, [-1]),
+                tf.reshape(all_charge, [-1]),
+                tf.reshape(natoms + nsel, [1]),
+                tf.reshape(box, [-1]),
+                ewald_h=self.ewald_h,
+                ewald_beta=self.ewald_beta,
+            )
+            all_force = tf.reshape(all_force, [nframes, natoms + nsel, 3])
+            # the external force on the WFCCs is treated as a constant
+            ext_f = tf.stop_gradient(all_force[:, natoms:, :])
+            corr_f, corr_v, _ = self._build_fv_correction(
+                tf.reshape(ext_f, [nframes, nsel * 3])
+            )
+            force = (
+                tf.reshape(all_force[:, :natoms, :], [nframes, natoms * 3])
+                + tf.reshape(corr_f, [nframes, natoms * 3])
+                + self._enrich(tf.reshape(ext_f, [nframes, nsel * 3]), dof=3)
+            )
+            # virial of the force on the WFCCs displaced by the dipoles
+            fd_corr_v = -tf.matmul(tf.transpose(ext_f, [0, 2, 1]), dipole)
+            virial = (
+                tf.reshape(all_virial, [nframes, 9])
+                + tf.reshape(corr_v, [nframes, 9])
+                + tf.reshape(fd_corr_v, [nframes, 9])
+            )
+        return energy, force, virial
+
     def _enrich(self, dipole, dof=3):
         coll = []
         sel_start_idx = 0
@@ -254,65 +367,45 @@ class DipoleChargeModifier(DeepDipole):
         sel_idx_map = select_idx_map(atype, self.sel_type)
         nsel = len(sel_idx_map)
         # setup charge
-        charge = np.zeros([natoms])
-        for ii in range(natoms):
-            charge[ii] = self.sys_charge_map[atype[ii]]
+        charge = self.sys_charge[atype]
+
+        if self.force is None:
+            self.force, self.virial, self.av = self.build_fv_graph()
+        if eval_fv and self.fused:
+            if self.fused_outputs is None:
+                self.fused_outputs = self.build_fused_graph()
+            all_charge = np.concatenate([charge, self.wfcc_charge[atype[sel_idx_map]]])
+            tot_e, tot_f, tot_v = self._eval_func(
+                self._eval_fused, nframes, natoms + nsel
+            )(coord, box, atype, sel_idx_map, all_charge)
+            tot_f = self.reverse_map(np.reshape(tot_f, [nframes, -1, 3]), imap)
+            return tot_e, tot_f.reshape([nframes, natoms, 3]), tot_v
+
         charge = np.tile(charge, [nframes, 1])
 
         # add wfcc
         all_coord, all_charge, dipole = self._extend_system(coord, box, atype, charge)
 
         # print('compute er')
-        batch_size = 5
-        tot_e = []
-        all_f = []
-        all_v = []
-        for ii in range(0, nframes, batch_size):
-            e, f, v = self.er.eval(
-                all_coord[ii : ii + batch_size],
-                all_charge[ii : ii + batch_size],
-                box[ii : ii + batch_size],
-            )
-            tot_e.append(e)
-            all_f.append(f)
-            all_v.append(v)
-        tot_e = np.concatenate(tot_e, axis=0)
-        all_f = np.concatenate(all_f, axis=0)
-        all_v = np.concatenate(all_v, axis=0)
+        tot_e, all_f, all_v = self._eval_func(self.er.eval, nframes, natoms + nsel)(
+            all_coord, all_charge, box
+        )
         # print('finish  er')
         # reshape
         tot_e.reshape([nframes, 1])
 
         tot_f = None
         tot_v = None
-        if self.force is None:
-            self.force, self.virial, self.av = self.build_fv_graph()
         if eval_fv:
             # compute f
             ext_f = all_f[:, natoms * 3 :]
-            corr_f = []
-            corr_v = []
-            corr_av = []
-            for ii in range(0, nframes, batch_size):
-                f, v, av = self._eval_fv(
-                    coord[ii : ii + batch_size],
-                    box[ii : ii + batch_size],
-                    atype,
-                    ext_f[ii : ii + batch_size],
-                )
-                corr_f.append(f)
-                corr_v.append(v)
-                corr_av.append(av)
-            corr_f = np.concatenate(corr_f, axis=0)
-            corr_v = np.concatenate(corr_v, axis=0)
-            corr_av = np.concatenate(corr_av, axis=0)
+            corr_f, corr_v, corr_av = self._eval_func(self._eval_fv, nframes, natoms)(
+                coord, box, atype, ext_f
+            )
             tot_f = all_f[:, : natoms * 3] + corr_f
-            for ii in range(nsel):
-                orig_idx = sel_idx_map[ii]
-                tot_f[:, orig_idx * 3 : orig_idx * 3 + 3] += ext_f[
-                    :, ii * 3 : ii * 3 + 3
-                ]
-            tot_f = self.reverse_map(np.reshape(tot_f, [nframes, -1, 3]), imap)
+            tot_f = np.reshape(tot_f, [nframes, -1, 3])
+            tot_f[:, sel_idx_map, :] += np.reshape(ext_f, [nframes, nsel, 3])
+            tot_f = self.reverse_map(tot_f, imap)
             # reshape
             tot_f = tot_f.reshape([nframes, natoms, 3])
             # compute v
@@ -330,6 +423,21 @@ class DipoleChargeModifier(DeepDipole):
 
         return tot_e, tot_f, tot_v
 
+    def _eval_fused(self, coords, cells, atom_types, sel_idx_map, all_charge):
+        # the inputs have been sorted by atom types
+        cells = np.reshape(cells, [-1, 9])
+        nframes = cells.shape[0]
+        natoms_vec = self.make_natoms_vec(atom_types)
+        feed_dict_test = {}
+        feed_dict_test[self.t_natoms] = natoms_vec
+        feed_dict_test[self.t_type] = np.tile(atom_types, [nframes, 1]).reshape([-1])
+        feed_dict_test[self.t_coord] = np.reshape(coords, [-1])
+        feed_dict_test[self.t_box] = cells.reshape([-1])
+        feed_dict_test[self.t_mesh] = make_default_mesh(True, False).reshape([-1])
+        feed_dict_test[self.t_sel_idx] = sel_idx_map
+        feed_dict_test[self.t_all_charge] = all_charge
+        return tuple(run_sess(self.sess, self.fused_outputs, feed_dict=feed_dict_test))
+
     def _eval_fv(self, coords, cells, atom_types, ext_f):
         # reshape the inputs
         cells = np.reshape(cells, [-1, 9])
@@ -375,23 +483,14 @@ class DipoleChargeModifier(DeepDipole):
         ref_coord = coord3[:, sel_idx_map, :]
         ref_coord = np.reshape(ref_coord, [nframes, nsel * 3])
 
-        batch_size = 8
-        all_dipole = []
-        for ii in range(0, nframes, batch_size):
-            dipole = DeepDipole.eval(
-                self, coord[ii : ii + batch_size], box[ii : ii + batch_size], atype
-            )
-            all_dipole.append(dipole)
-        dipole = np.concatenate(all_dipole, axis=0)
+        # frames are batched by DeepDipole.eval
+        dipole = DeepDipole.eval(self, coord, box, atype)
         assert dipole.shape[0] == nframes
         dipole = np.reshape(dipole, [nframes, nsel * 3])
 
         wfcc_coord = ref_coord + dipole
         # wfcc_coord = dipole
-        wfcc_charge = np.zeros([nsel])
-        for ii in range(nsel):
-            orig_idx = self.sel_type.index(atype[sel_idx_map[ii]])
-            wfcc_charge[ii] = self.model_charge_map[orig_idx]
+        wfcc_charge = self.wfcc_charge[atype[sel_idx_map]]
         wfcc_charge = np.tile(wfcc_charge, [nframes, 1])
 
         wfcc_coord = np.reshape(wfcc_coord, [nframes, nsel * 3])
@@ -438,7 +537,7 @@ class DipoleChargeModifier(DeepDipole):
         atype = atype[0]
         nframes = coord.shape[0]
 
-        tot_e, tot_f, tot_v = self.eval(coord, box, atype)
+        tot_e, tot_f, tot_v = self.eval_cached(coord, box, atype)
 
         # print(tot_f[:,0])
 
@@ -448,3 +547,79 @@ class DipoleChargeModifier(DeepDipole):
             data["force"] -= tot_f.reshape(data["force"].shape)
         if "find_virial" in data and data["find_virial"] == 1.0:
             data["virial"] -= tot_v.reshape(data["virial"].shape)
+
+    def _get_cache_key(
+        self, coord: np.ndarray, box: np.ndarray, atype: np.ndarray
+    ) -> str:
+        """Hash the modifier model, the Ewald parameters and the frames."""
+        if self._model_hash is None:
+            hm = hashlib.sha256()
+            with open(self.model_name, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    hm.update(chunk)
+            self._model_hash = hm.hexdigest()
+        hh = hashlib.sha256()
+        hh.update(self._model_hash.encode())
+        hh.update(
+            json.dumps(
+                [
+                    [float(ii) for ii in self.model_charge_map],
+                    [float(ii) for ii in self.sys_charge_map],
+                    float(self.ewald_h),
+                    float(self.ewald_beta),
+                ]
+            ).encode()
+        )
+        for arr in (coord, box, atype):
+            arr = np.ascontiguousarray(arr)
+            hh.update(f"{arr.dtype.str}{arr.shape}".encode())
+            hh.update(arr.tobytes())
+        return hh.hexdigest()
+
+    def eval_cached(
+        self, coord: np.ndarray, box: np.ndarray, atype: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Evaluate the modification, reading from and writing to the cache directory.
+
+        The cache is keyed by the hash of the modifier model, the charge maps,
+        the Ewald parameters and the frames. If `cache_dir` is not set, it is
+        the same as :meth:`eval`.
+
+        Parameters
+        ----------
+        coord
+            The coordinates of atoms
+        box
+            The simulation region. PBC is assumed
+        atype
+            The atom types
+
+        Returns
+        -------
+        tot_e
+            The energy modification
+        tot_f
+            The force modification
+        tot_v
+            The virial modification
+        """
+        if self.cache_dir is None:
+            return self.eval(coord, box, atype)
+        cache_file = self.cache_dir / (self._get_cache_key(coord, box, atype) + ".npz")
+        if cache_file.is_file():
+            try:
+                with np.load(cache_file) as cached:
+                    return cached["energy"], cached["force"], cached["virial"]
+            except (OSError, ValueError, KeyError):
+                log.warning(
+                    "failed to read the cached modification %s, recompute it",
+                    cache_file,
+                )
+        tot_e, tot_f, tot_v = self.eval(coord, box, atype)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so that a partial file is never read
+        tmp_file = cache_file.with_name(f"{cache_file.stem}.{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            np.savez(f, energy=tot_e, force=tot_f, virial=tot_v)
+        os.replace(tmp_file, cache_file)
+        return tot_e, tot_f, tot_v
@@ -2,11 +2,15 @@
 from typing import (
     TYPE_CHECKING,
     Optional,
+    Union,
 )
 
 from deepmd.infer.deep_tensor import (
     DeepTensor,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 
 if TYPE_CHECKING:
     from pathlib import (
@@ -25,6 +29,9 @@ class DeepDipole(DeepTensor):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
     input_map : dict, optional
         The input map for tf.import_graph_def. Only work with default tf graph
 
@@ -40,6 +47,7 @@ class DeepDipole(DeepTensor):
         model_file: "Path",
         load_prefix: str = "load",
         default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
         input_map: Optional[dict] = None,
     ) -> None:
         # use this in favor of dict update to move attribute from class to
@@ -57,6 +65,7 @@ class DeepDipole(DeepTensor):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
             input_map=input_map,
         )
 
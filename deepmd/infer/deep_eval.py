@@ -1,9 +1,13 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
+from collections import (
+    Counter,
+)
 from functools import (
     lru_cache,
 )
 from typing import (
     TYPE_CHECKING,
+    Dict,
     List,
     Optional,
     Union,
@@ -13,12 +17,14 @@ import numpy as np
 
 from deepmd.env import (
     MODEL_VERSION,
-    default_tf_session_config,
     tf,
 )
 from deepmd.utils.batch_size import (
     AutoBatchSize,
 )
+from deepmd.utils.execution_context import (
+    get_execution_context,
+)
 from deepmd.utils.sess import (
     run_sess,
 )
@@ -120,8 +126,20 @@ class DeepEval:
     @lru_cache(maxsize=None)
     def sess(self) -> tf.Session:
         """Get TF session."""
-        # start a tf session associated to the graph
-        return tf.Session(graph=self.graph, config=default_tf_session_config)
+        # start a tf session associated to the graph, on the thread pools
+        # shared by all models in this process
+        return get_execution_context().new_session(self.graph)
+
+    def set_max_concurrency(self, max_concurrency: Optional[int]):
+        """Set the maximal number of concurrent evaluations of this model.
+
+        Parameters
+        ----------
+        max_concurrency : int, optional
+            the maximal number of session runs of this model in progress at the
+            same time, e.g. from different threads. None means no limit
+        """
+        self.sess.set_max_concurrency(max_concurrency)
 
     def _graph_compatable(self) -> bool:
         """Check the model compatability.
@@ -330,6 +348,42 @@ class DeepEval:
             natoms_vec[ii + 2] = np.count_nonzero(atom_types == ii)
         return natoms_vec
 
+    @staticmethod
+    def _get_dependent_ops(fetches: List[tf.Tensor]) -> set:
+        """Get the ops that TF runs to compute the fetched tensors."""
+        ops = set()
+        stack = [tt.op for tt in fetches]
+        while stack:
+            op = stack.pop()
+            if op in ops:
+                continue
+            ops.add(op)
+            stack.extend(tt.op for tt in op.inputs)
+            stack.extend(op.control_inputs)
+        return ops
+
+    def _count_skipped_ops(
+        self, full_fetches: List[tf.Tensor], fetches: List[tf.Tensor]
+    ) -> Dict[str, int]:
+        """Count the ops skipped when only a subset of the outputs is fetched.
+
+        Parameters
+        ----------
+        full_fetches : list of tf.Tensor
+            the tensors fetched by the full evaluation
+        fetches : list of tf.Tensor
+            the tensors actually fetched
+
+        Returns
+        -------
+        dict[str, int]
+            the number of skipped ops of each op type
+        """
+        skipped = self._get_dependent_ops(full_fetches) - self._get_dependent_ops(
+            fetches
+        )
+        return dict(Counter(op.type for op in skipped))
+
     def eval_typeebd(self) -> np.ndarray:
         """Evaluate output of type embedding network by using this model.
 
@@ -3,6 +3,7 @@ from typing import (
     TYPE_CHECKING,
     List,
     Optional,
+    Union,
 )
 
 import numpy as np
@@ -10,6 +11,9 @@ import numpy as np
 from deepmd.infer.deep_tensor import (
     DeepTensor,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 
 if TYPE_CHECKING:
     from pathlib import (
@@ -28,6 +32,9 @@ class DeepPolar(DeepTensor):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
     input_map : dict, optional
         The input map for tf.import_graph_def. Only work with default tf graph
 
@@ -43,6 +50,7 @@ class DeepPolar(DeepTensor):
         model_file: "Path",
         load_prefix: str = "load",
         default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
         input_map: Optional[dict] = None,
     ) -> None:
         # use this in favor of dict update to move attribute from class to
@@ -60,6 +68,7 @@ class DeepPolar(DeepTensor):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
             input_map=input_map,
         )
 
@@ -83,10 +92,17 @@ class DeepGlobalPolar(DeepTensor):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
     """
 
     def __init__(
-        self, model_file: str, load_prefix: str = "load", default_tf_graph: bool = False
+        self,
+        model_file: str,
+        load_prefix: str = "load",
+        default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
     ) -> None:
         self.tensors.update(
             {
@@ -101,6 +117,7 @@ class DeepGlobalPolar(DeepTensor):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
         )
 
     def eval(
@@ -3,6 +3,9 @@ import logging
 from typing import (
     TYPE_CHECKING,
     Callable,
+    ClassVar,
+    Collection,
+    Dict,
     List,
     Optional,
     Tuple,
@@ -71,6 +74,16 @@ class DeepPot(DeepEval):
     Do not chanage the order!
     """
 
+    # outputs that can be selected in `eval`, mapped to the attribute names
+    # of the fetched tensors
+    output_tensors: ClassVar[Dict[str, str]] = {
+        "energy": "t_energy",
+        "force": "t_force",
+        "virial": "t_virial",
+        "atom_energy": "t_ae",
+        "atom_virial": "t_av",
+    }
+
     def __init__(
         self,
         model_file: "Path",
@@ -324,7 +337,8 @@ class DeepPot(DeepEval):
         aparam: Optional[np.ndarray] = None,
         efield: Optional[np.ndarray] = None,
         mixed_type: bool = False,
-    ) -> Tuple[np.ndarray, ...]:
+        outputs: Optional[Collection[str]] = None,
+    ) -> Union[Tuple[np.ndarray, ...], Dict[str, np.ndarray]]:
         """Evaluate the energy, force and virial by using this DP.
 
         Parameters
@@ -359,6 +373,11 @@ class DeepPot(DeepEval):
             Whether to perform the mixed_type mode.
             If True, the input data has the mixed_type format (see doc/model/train_se_atten.md),
             in which frames in a system may have different natoms_vec(s), with the same nloc.
+        outputs
+            The outputs to be evaluated, selected from "energy", "force", "virial",
+            "atom_energy" and "atom_virial". If given, `atomic` is ignored, only
+            the tensors needed by the selected outputs are computed (e.g. the
+            derivatives are skipped for "energy"), and a dict is returned.
 
         Returns
         -------
@@ -372,7 +391,14 @@ class DeepPot(DeepEval):
             The atomic energy. Only returned when atomic == True
         atom_virial
             The atomic virial. Only returned when atomic == True
+        dict[str, np.ndarray]
+            Only returned when `outputs` is given, instead of the above.
+            The selected outputs.
         """
+        if outputs is None:
+            output_names = self._get_output_names(atomic=atomic)
+        else:
+            output_names = self._get_output_names(outputs=outputs)
         # reshape coords before getting shape
         natoms, numb_test = self._get_natoms_and_nframes(
             coords, atom_types, mixed_type=mixed_type
@@ -383,23 +409,121 @@ class DeepPot(DeepEval):
             atom_types,
             fparam=fparam,
             aparam=aparam,
-            atomic=atomic,
             efield=efield,
             mixed_type=mixed_type,
+            output_names=output_names,
         )
+        if not isinstance(output, tuple):
+            output = (output,)
+        output = dict(zip(output_names, output))
 
         if self.modifier_type is not None:
-            if atomic:
+            if "atom_energy" in output or "atom_virial" in output:
                 raise RuntimeError("modifier does not support atomic modification")
             me, mf, mv = self.dm.eval(coords, cells, atom_types)
-            output = list(output)  # tuple to list
-            e, f, v = output[:3]
-            output[0] += me.reshape(e.shape)
-            output[1] += mf.reshape(f.shape)
-            output[2] += mv.reshape(v.shape)
-            output = tuple(output)
+            for kk, mm in (("energy", me), ("force", mf), ("virial", mv)):
+                if kk in output:
+                    output[kk] += mm.reshape(output[kk].shape)
+        if outputs is None:
+            return tuple(output.values())
         return output
 
+    def eval_energy(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: List[int],
+        fparam: Optional[np.ndarray] = None,
+        aparam: Optional[np.ndarray] = None,
+        efield: Optional[np.ndarray] = None,
+        mixed_type: bool = False,
+    ) -> np.ndarray:
+        """Evaluate only the energy by using this DP.
+
+        The force and virial, which need the backward pass of the model, are
+        not computed. This is faster than :meth:`eval` when only the energies
+        are required, for example to screen candidate structures.
+
+        Parameters
+        ----------
+        coords
+            The coordinates of atoms.
+            The array should be of size nframes x natoms x 3
+        cells
+            The cell of the region.
+            If None then non-PBC is assumed, otherwise using PBC.
+            The array should be of size nframes x 9
+        atom_types
+            The atom types
+            The list should contain natoms ints
+        fparam
+            The frame parameter. See :meth:`eval`
+        aparam
+            The atomic parameter. See :meth:`eval`
+        efield
+            The external field on atoms.
+            The array should be of size nframes x natoms x 3
+        mixed_type
+            Whether to perform the mixed_type mode.
+
+        Returns
+        -------
+        energy
+            The system energy, in the shape of nframes x 1
+        """
+        return self.eval(
+            coords,
+            cells,
+            atom_types,
+            fparam=fparam,
+            aparam=aparam,
+            efield=efield,
+            mixed_type=mixed_type,
+            outputs=("energy",),
+        )["energy"]
+
+    def _get_output_names(
+        self, atomic: bool = False, outputs: Optional[Collection[str]] = None
+    ) -> Tuple[str, ...]:
+        """Get the names of the outputs to evaluate, in the canonical order."""
+        if outputs is None:
+            if atomic:
+                return tuple(self.output_tensors)
+            return ("energy", "force", "virial")
+        unknown = set(outputs) - set(self.output_tensors)
+        if unknown:
+            raise ValueError(
+                f"unknown outputs {sorted(unknown)}, should be selected from "
+                f"{list(self.output_tensors)}"
+            )
+        if not outputs:
+            raise ValueError("at least one output should be selected")
+        return tuple(kk for kk in self.output_tensors if kk in outputs)
+
+    def get_skipped_ops(self, outputs: Collection[str]) -> Dict[str, int]:
+        """Get the ops that are skipped when only the given outputs are evaluated.
+
+        Parameters
+        ----------
+        outputs
+            The selected outputs, see :meth:`eval`
+
+        Returns
+        -------
+        dict[str, int]
+            The number of ops of each op type that the evaluation of energy,
+            force and virial would run but the selected outputs do not need.
+        """
+        fetches = [
+            getattr(self, self.output_tensors[kk])
+            for kk in self._get_output_names(outputs=outputs)
+        ]
+        full_fetches = [
+            getattr(self, self.output_tensors[kk])
+            for kk in self._get_output_names(atomic=False)
+        ]
+        return self._count_skipped_ops(full_fetches, fetches)
+
     def _prepare_feed_dict(
         self,
         coords,
@@ -518,6 +642,7 @@ class DeepPot(DeepEval):
         atomic=False,
         efield=None,
         mixed_type=False,
+        output_names=None,
     ):
         natoms, nframes = self._get_natoms_and_nframes(
             coords, atom_types, mixed_type=mixed_type
@@ -525,18 +650,12 @@ class DeepPot(DeepEval):
         feed_dict_test, imap, natoms_vec = self._prepare_feed_dict(
             coords, cells, atom_types, fparam, aparam, efield, mixed_type=mixed_type
         )
+        if output_names is None:
+            output_names = self._get_output_names(atomic=atomic)
 
-        t_out = [self.t_energy, self.t_force, self.t_virial]
-        if atomic:
-            t_out += [self.t_ae, self.t_av]
-
+        t_out = [getattr(self, self.output_tensors[kk]) for kk in output_names]
         v_out = run_sess(self.sess, t_out, feed_dict=feed_dict_test)
-        energy = v_out[0]
-        force = v_out[1]
-        virial = v_out[2]
-        if atomic:
-            ae = v_out[3]
-            av = v_out[4]
+        v_out = dict(zip(output_names, v_out))
 
         if self.has_spin:
             ntypes_real = self.ntypes - self.ntypes_spin
@@ -550,20 +669,24 @@ class DeepPot(DeepEval):
             natoms_real = natoms
 
         # reverse map of the outputs
-        force = self.reverse_map(np.reshape(force, [nframes, -1, 3]), imap)
-        if atomic:
-            ae = self.reverse_map(np.reshape(ae, [nframes, -1, 1]), imap[:natoms_real])
-            av = self.reverse_map(np.reshape(av, [nframes, -1, 9]), imap)
-
-        energy = np.reshape(energy, [nframes, 1])
-        force = np.reshape(force, [nframes, natoms, 3])
-        virial = np.reshape(virial, [nframes, 9])
-        if atomic:
-            ae = np.reshape(ae, [nframes, natoms_real, 1])
-            av = np.reshape(av, [nframes, natoms, 9])
-            return energy, force, virial, ae, av
-        else:
-            return energy, force, virial
+        if "energy" in v_out:
+            v_out["energy"] = np.reshape(v_out["energy"], [nframes, 1])
+        if "force" in v_out:
+            force = self.reverse_map(np.reshape(v_out["force"], [nframes, -1, 3]), imap)
+            v_out["force"] = np.reshape(force, [nframes, natoms, 3])
+        if "virial" in v_out:
+            v_out["virial"] = np.reshape(v_out["virial"], [nframes, 9])
+        if "atom_energy" in v_out:
+            ae = self.reverse_map(
+                np.reshape(v_out["atom_energy"], [nframes, -1, 1]), imap[:natoms_real]
+            )
+            v_out["atom_energy"] = np.reshape(ae, [nframes, natoms_real, 1])
+        if "atom_virial" in v_out:
+            av = self.reverse_map(
+                np.reshape(v_out["atom_virial"], [nframes, -1, 9]), imap
+            )
+            v_out["atom_virial"] = np.reshape(av, [nframes, natoms, 9])
+        return tuple(v_out[kk] for kk in output_names)
 
     def eval_descriptor(
         self,
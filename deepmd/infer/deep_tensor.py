@@ -1,11 +1,14 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 from typing import (
     TYPE_CHECKING,
+    Callable,
     ClassVar,
+    Collection,
     Dict,
     List,
     Optional,
     Tuple,
+    Union,
 )
 
 import numpy as np
@@ -16,6 +19,9 @@ from deepmd.common import (
 from deepmd.infer.deep_eval import (
     DeepEval,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 from deepmd.utils.sess import (
     run_sess,
 )
@@ -37,6 +43,9 @@ class DeepTensor(DeepEval):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
     input_map : dict, optional
         The input map for tf.import_graph_def. Only work with default tf graph
     """
@@ -56,12 +65,22 @@ class DeepTensor(DeepEval):
         "t_box": "t_box:0",
         "t_mesh": "t_mesh:0",
     }
+    # outputs that can be selected in `eval_full`, mapped to the attribute
+    # names of the fetched tensors
+    full_output_tensors: ClassVar[Dict[str, str]] = {
+        "global_tensor": "t_global_tensor",
+        "force": "t_force",
+        "virial": "t_virial",
+        "atom_tensor": "t_tensor",
+        "atom_virial": "t_atom_virial",
+    }
 
     def __init__(
         self,
         model_file: "Path",
         load_prefix: str = "load",
         default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
         input_map: Optional[dict] = None,
     ) -> None:
         """Constructor."""
@@ -70,6 +89,7 @@ class DeepTensor(DeepEval):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
             input_map=input_map,
         )
         # check model type
@@ -141,6 +161,68 @@ class DeepTensor(DeepEval):
         """Get the number (dimension) of atomic parameters of this DP."""
         return self.daparam
 
+    def _eval_func(self, inner_func: Callable, numb_test: int, natoms: int) -> Callable:
+        """Wrapper method with auto batch size.
+
+        Parameters
+        ----------
+        inner_func : Callable
+            the method to be wrapped
+        numb_test : int
+            number of tests
+        natoms : int
+            number of atoms
+
+        Returns
+        -------
+        Callable
+            the wrapper
+        """
+        if self.auto_batch_size is not None:
+
+            def eval_func(*args, **kwargs):
+                return self.auto_batch_size.execute_all(
+                    inner_func, numb_test, natoms, *args, **kwargs
+                )
+
+        else:
+            eval_func = inner_func
+        return eval_func
+
+    def _standardize_input(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: List[int],
+        mixed_type: bool = False,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray, int, int]:
+        """Reshape the inputs so that the first axis of frame-wise arrays is frame.
+
+        Returns
+        -------
+        coords
+            nframes x (natoms x 3)
+        cells
+            nframes x 9, or None
+        atom_types
+            nframes x natoms if mixed_type, otherwise natoms
+        natoms
+            number of atoms
+        nframes
+            number of frames
+        """
+        if mixed_type:
+            natoms = atom_types[0].size
+            atom_types = np.array(atom_types, dtype=int).reshape([-1, natoms])
+        else:
+            atom_types = np.array(atom_types, dtype=int).reshape([-1])
+            natoms = atom_types.size
+        coords = np.reshape(np.array(coords), [-1, natoms * 3])
+        nframes = coords.shape[0]
+        if cells is not None:
+            cells = np.array(cells).reshape([nframes, 9])
+        return coords, cells, atom_types, natoms, nframes
+
     def eval(
         self,
         coords: np.ndarray,
@@ -187,21 +269,29 @@ class DeepTensor(DeepEval):
             If atomic == False then of size nframes x output_dim
             else of size nframes x natoms x output_dim
         """
-        # standarize the shape of inputs
-        if mixed_type:
-            natoms = atom_types[0].size
-            atom_types = np.array(atom_types, dtype=int).reshape([-1, natoms])
-        else:
-            atom_types = np.array(atom_types, dtype=int).reshape([-1])
-            natoms = atom_types.size
-        coords = np.reshape(np.array(coords), [-1, natoms * 3])
+        coords, cells, atom_types, natoms, nframes = self._standardize_input(
+            coords, cells, atom_types, mixed_type=mixed_type
+        )
+        return self._eval_func(self._eval_inner, nframes, natoms)(
+            coords, cells, atom_types, atomic=atomic, mixed_type=mixed_type
+        )
+
+    def _eval_inner(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: np.ndarray,
+        atomic: bool = True,
+        mixed_type: bool = False,
+    ) -> np.ndarray:
+        # the inputs of a batch have been standardized by the caller
+        natoms = atom_types.shape[-1]
         nframes = coords.shape[0]
         if cells is None:
             pbc = False
             cells = np.tile(np.eye(3), [nframes, 1]).reshape([nframes, 9])
         else:
             pbc = True
-            cells = np.array(cells).reshape([nframes, 9])
 
         # sort inputs
         coords, atom_types, imap, sel_at, sel_imap = self.sort_input(
@@ -235,7 +325,7 @@ class DeepTensor(DeepEval):
                 self._support_gfv or "global" in self.model_type
             ), f"do not support global tensor evaluation with old {self.model_type} model"
             t_out = [self.t_global_tensor if self._support_gfv else self.t_tensor]
-        v_out = self.sess.run(t_out, feed_dict=feed_dict_test)
+        v_out = run_sess(self.sess, t_out, feed_dict=feed_dict_test)
         tensor = v_out[0]
 
         # reverse map of the outputs
@@ -260,7 +350,8 @@ class DeepTensor(DeepEval):
         aparam: Optional[np.array] = None,
         efield: Optional[np.array] = None,
         mixed_type: bool = False,
-    ) -> Tuple[np.ndarray, ...]:
+        outputs: Optional[Collection[str]] = None,
+    ) -> Union[Tuple[np.ndarray, ...], Dict[str, np.ndarray]]:
         """Evaluate the model with interface similar to the energy model.
         Will return global tensor, component-wise force and virial
         and optionally atomic tensor and atomic virial.
@@ -289,6 +380,11 @@ class DeepTensor(DeepEval):
             Whether to perform the mixed_type mode.
             If True, the input data has the mixed_type format (see doc/model/train_se_atten.md),
             in which frames in a system may have different natoms_vec(s), with the same nloc.
+        outputs
+            The outputs to be evaluated, selected from "global_tensor", "force",
+            "virial", "atom_tensor" and "atom_virial". If given, `atomic` is
+            ignored, only the tensors needed by the selected outputs are computed,
+            and a dict is returned.
 
         Returns
         -------
@@ -307,24 +403,91 @@ class DeepTensor(DeepEval):
         atom_virial
             The atomic virial. Only returned when atomic == True
             shape: [nframes x nout x natoms x 9]
+        dict[str, np.ndarray]
+            Only returned when `outputs` is given, instead of the above.
+            The selected outputs.
         """
         assert self._support_gfv, "do not support eval_full with old tensor model"
 
-        # standarize the shape of inputs
-        if mixed_type:
-            natoms = atom_types[0].size
-            atom_types = np.array(atom_types, dtype=int).reshape([-1, natoms])
+        if outputs is None:
+            output_names = self._get_full_output_names(atomic=atomic)
         else:
-            atom_types = np.array(atom_types, dtype=int).reshape([-1])
-            natoms = atom_types.size
-        coords = np.reshape(np.array(coords), [-1, natoms * 3])
+            output_names = self._get_full_output_names(outputs=outputs)
+        coords, cells, atom_types, natoms, nframes = self._standardize_input(
+            coords, cells, atom_types, mixed_type=mixed_type
+        )
+        output = self._eval_func(self._eval_full_inner, nframes, natoms)(
+            coords,
+            cells,
+            atom_types,
+            mixed_type=mixed_type,
+            output_names=output_names,
+        )
+        if not isinstance(output, tuple):
+            output = (output,)
+        if outputs is None:
+            return output
+        return dict(zip(output_names, output))
+
+    def _get_full_output_names(
+        self, atomic: bool = False, outputs: Optional[Collection[str]] = None
+    ) -> Tuple[str, ...]:
+        """Get the names of the outputs of `eval_full`, in the canonical order."""
+        if outputs is None:
+            if atomic:
+                return tuple(self.full_output_tensors)
+            return ("global_tensor", "force", "virial")
+        unknown = set(outputs) - set(self.full_output_tensors)
+        if unknown:
+            raise ValueError(
+                f"unknown outputs {sorted(unknown)}, should be selected from "
+                f"{list(self.full_output_tensors)}"
+            )
+        if not outputs:
+            raise ValueError("at least one output should be selected")
+        return tuple(kk for kk in self.full_output_tensors if kk in outputs)
+
+    def get_skipped_ops(self, outputs: Collection[str]) -> Dict[str, int]:
+        """Get the ops that are skipped when only the given outputs are evaluated.
+
+        Parameters
+        ----------
+        outputs
+            The selected outputs, see :meth:`eval_full`
+
+        Returns
+        -------
+        dict[str, int]
+            The number of ops of each op type that the evaluation of global
+            tensor, force and virial would run but the selected outputs do not need.
+        """
+        assert self._support_gfv, "do not support eval_full with old tensor model"
+        fetches = [
+            getattr(self, self.full_output_tensors[kk])
+            for kk in self._get_full_output_names(outputs=outputs)
+        ]
+        full_fetches = [
+            getattr(self, self.full_output_tensors[kk])
+            for kk in self._get_full_output_names(atomic=False)
+        ]
+        return self._count_skipped_ops(full_fetches, fetches)
+
+    def _eval_full_inner(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: np.ndarray,
+        mixed_type: bool = False,
+        output_names: Tuple[str, ...] = ("global_tensor", "force", "virial"),
+    ) -> Tuple[np.ndarray, ...]:
+        # the inputs of a batch have been standardized by the caller
+        natoms = atom_types.shape[-1]
         nframes = coords.shape[0]
         if cells is None:
             pbc = False
             cells = np.tile(np.eye(3), [nframes, 1]).reshape([nframes, 9])
         else:
             pbc = True
-            cells = np.array(cells).reshape([nframes, 9])
         nout = self.output_dim
 
         # sort inputs
@@ -349,33 +512,30 @@ class DeepTensor(DeepEval):
         feed_dict_test[self.t_box] = np.reshape(cells, [-1])
         feed_dict_test[self.t_mesh] = make_default_mesh(pbc, mixed_type)
 
-        t_out = [self.t_global_tensor, self.t_force, self.t_virial]
-        if atomic:
-            t_out += [self.t_tensor, self.t_atom_virial]
-
-        v_out = self.sess.run(t_out, feed_dict=feed_dict_test)
-        gt = v_out[0]  # global tensor
-        force = v_out[1]
-        virial = v_out[2]
-        if atomic:
-            at = v_out[3]  # atom tensor
-            av = v_out[4]  # atom virial
+        t_out = [getattr(self, self.full_output_tensors[kk]) for kk in output_names]
+        v_out = run_sess(self.sess, t_out, feed_dict=feed_dict_test)
+        v_out = dict(zip(output_names, v_out))
 
         # please note here the shape are wrong!
-        force = self.reverse_map(np.reshape(force, [nframes * nout, natoms, 3]), imap)
-        if atomic:
+        # reverse map of the outputs and make sure the shapes are correct here
+        if "global_tensor" in v_out:
+            v_out["global_tensor"] = np.reshape(v_out["global_tensor"], [nframes, nout])
+        if "force" in v_out:
+            force = self.reverse_map(
+                np.reshape(v_out["force"], [nframes * nout, natoms, 3]), imap
+            )
+            v_out["force"] = np.reshape(force, [nframes, nout, natoms, 3])
+        if "virial" in v_out:
+            v_out["virial"] = np.reshape(v_out["virial"], [nframes, nout, 9])
+        if "atom_tensor" in v_out:
             at = self.reverse_map(
-                np.reshape(at, [nframes, len(sel_at), nout]), sel_imap
+                np.reshape(v_out["atom_tensor"], [nframes, len(sel_at), nout]),
+                sel_imap,
             )
-            av = self.reverse_map(np.reshape(av, [nframes * nout, natoms, 9]), imap)
-
-        # make sure the shapes are correct here
-        gt = np.reshape(gt, [nframes, nout])
-        force = np.reshape(force, [nframes, nout, natoms, 3])
-        virial = np.reshape(virial, [nframes, nout, 9])
-        if atomic:
-            at = np.reshape(at, [nframes, len(sel_at), self.output_dim])
-            av = np.reshape(av, [nframes, nout, natoms, 9])
-            return gt, force, virial, at, av
-        else:
-            return gt, force, virial
+            v_out["atom_tensor"] = np.reshape(at, [nframes, len(sel_at), nout])
+        if "atom_virial" in v_out:
+            av = self.reverse_map(
+                np.reshape(v_out["atom_virial"], [nframes * nout, natoms, 9]), imap
+            )
+            v_out["atom_virial"] = np.reshape(av, [nframes, nout, natoms, 9])
+        return tuple(v_out[kk] for kk in output_names)
@@ -7,10 +7,12 @@ import numpy as np
 
 from deepmd.env import (
     GLOBAL_TF_FLOAT_PRECISION,
-    default_tf_session_config,
     op_module,
     tf,
 )
+from deepmd.utils.execution_context import (
+    get_execution_context,
+)
 from deepmd.utils.sess import (
     run_sess,
 )
@@ -50,7 +52,7 @@ class EwaldRecp:
                 ewald_h=self.hh,
                 ewald_beta=self.beta,
             )
-        self.sess = tf.Session(graph=graph, config=default_tf_session_config)
+        self.sess = get_execution_context().new_session(graph)
 
     def eval(
         self, coord: np.ndarray, charge: np.ndarray, box: np.ndarray
@@ -0,0 +1,392 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Reuse neighbor lists with a skin distance in repeated evaluations."""
+
+import logging
+from typing import (
+    TYPE_CHECKING,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+from scipy.spatial import (
+    cKDTree,
+)
+
+from deepmd.utils.sess import (
+    run_sess,
+)
+
+if TYPE_CHECKING:
+    from deepmd.infer.deep_pot import (
+        DeepPot,
+    )
+
+__all__ = ["NeighborListCache", "VerletDeepPot"]
+
+log = logging.getLogger(__name__)
+
+
+class NeighborListCache:
+    """Verlet neighbor list with a skin distance.
+
+    The neighbor list contains all the pairs within `rcut + skin`, so it is
+    valid for the cutoff radius `rcut` until an atom moves by more than
+    `skin / 2`. Periodic images within `rcut + skin` of the simulation region
+    are kept as ghost atoms. Each atom in the extended system, including the
+    local atoms themselves, is stored as the index of its local atom and an
+    integer shift in the unit of cell vectors, so the coordinates of the
+    extended system can be updated from the local coordinates without
+    rebuilding the list.
+
+    Parameters
+    ----------
+    rcut : float
+        the cutoff radius
+    skin : float
+        the skin distance
+    """
+
+    def __init__(self, rcut: float, skin: float):
+        if skin < 0.0:
+            raise ValueError("skin should not be negative")
+        self.rcut = rcut
+        self.skin = skin
+        self.nbuild = 0
+        self.nupdate = 0
+        self.mapping = None
+        self.shift = None
+        self.mesh = None
+        self._ref_coord = None
+        self._ref_box = None
+        self._ref_atype = None
+
+    @property
+    def nloc(self) -> int:
+        """The number of local atoms."""
+        return self._ref_coord.shape[0]
+
+    @property
+    def nall(self) -> int:
+        """The number of local and ghost atoms."""
+        return self.mapping.size
+
+    def need_rebuild(
+        self, coord: np.ndarray, box: Optional[np.ndarray], atype: np.ndarray
+    ) -> bool:
+        """Check whether the neighbor list should be rebuilt.
+
+        The list is rebuilt if the atom types or the cell are changed, or the
+        maximal displacement since the last build exceeds half of the skin.
+
+        Parameters
+        ----------
+        coord : np.ndarray
+            the coordinates of local atoms, in the shape of natoms x 3
+        box : np.ndarray, optional
+            the cell, in the shape of 9. None for non-PBC systems
+        atype : np.ndarray
+            the atom types, in the shape of natoms
+
+        Returns
+        -------
+        bool
+            whether the neighbor list should be rebuilt
+        """
+        if self.mapping is None or not np.array_equal(atype, self._ref_atype):
+            return True
+        if (box is None) != (self._ref_box is None) or (
+            box is not None and not np.array_equal(box, self._ref_box)
+        ):
+            return True
+        max_disp2 = np.max(np.sum(np.square(coord - self._ref_coord), axis=1))
+        return max_disp2 > (0.5 * self.skin) ** 2
+
+    def build(self, coord: np.ndarray, box: Optional[np.ndarray], atype: np.ndarray):
+        """Build the ghost atoms and the neighbor list.
+
+        Parameters
+        ----------
+        coord : np.ndarray
+            the coordinates of local atoms, in the shape of natoms x 3
+        box : np.ndarray, optional
+            the cell, in the shape of 9. None for non-PBC systems
+        atype : np.ndarray
+            the atom types, in the shape of natoms
+        """
+        nloc = coord.shape[0]
+        rc = self.rcut + self.skin
+        if box is None:
+            mapping = np.arange(nloc)
+            shift = np.zeros((nloc, 3), dtype=int)
+        else:
+            cell = np.reshape(box, [3, 3])
+            frac = np.matmul(coord, np.linalg.inv(cell))
+            # shift local atoms into the cell
+            loc_shift = -np.floor(frac).astype(int)
+            frac += loc_shift
+            # distances between the opposite faces of the cell
+            volume = np.abs(np.linalg.det(cell))
+            height = volume / np.linalg.norm(
+                np.cross(cell[[1, 2, 0]], cell[[2, 0, 1]]), axis=1
+            )
+            frac_rc = rc / height
+            ncopy = np.ceil(frac_rc).astype(int)
+            images = np.stack(
+                np.meshgrid(*[np.arange(-nn, nn + 1) for nn in ncopy], indexing="ij"),
+                axis=-1,
+            ).reshape(-1, 3)
+            images = images[np.any(images != 0, axis=1)]
+            # keep the images within rc of the cell
+            img_frac = frac[None, :, :] + images[:, None, :]
+            keep = np.all((img_frac >= -frac_rc) & (img_frac < 1.0 + frac_rc), axis=-1)
+            img_idx, atom_idx = np.nonzero(keep)
+            mapping = np.concatenate([np.arange(nloc), atom_idx])
+            shift = np.concatenate(
+                [loc_shift, loc_shift[atom_idx] + images[img_idx]], axis=0
+            )
+        self.mapping = mapping
+        self.shift = shift
+        ext_coord = self.extend_coord(coord, box)
+
+        tree = cKDTree(ext_coord)
+        neighbors = tree.query_ball_point(ext_coord[:nloc], rc)
+        numneigh = np.array([len(nn) for nn in neighbors], dtype=np.int32)
+        jlist = np.fromiter(
+            (jj for nn in neighbors for jj in nn),
+            dtype=np.int32,
+            count=int(np.sum(numneigh)),
+        )
+        # remove the atoms themselves
+        not_self = jlist != np.repeat(np.arange(nloc, dtype=np.int32), numneigh)
+        jlist = jlist[not_self]
+        numneigh -= 1
+        # the layout of the mesh tensor read by the ProdEnvMat ops:
+        # 16 reserved ints, ilist, numneigh and the concatenated jlist
+        self.mesh = np.concatenate(
+            [
+                np.zeros(16, dtype=np.int32),
+                np.arange(nloc, dtype=np.int32),
+                numneigh,
+                jlist,
+            ]
+        )
+        self._ref_coord = np.array(coord, copy=True)
+        self._ref_box = None if box is None else np.array(box, copy=True)
+        self._ref_atype = np.array(atype, copy=True)
+        self.nbuild += 1
+        log.debug(
+            "build neighbor list: nloc %d, nall %d, max number of neighbors %d",
+            nloc,
+            self.nall,
+            np.max(numneigh, initial=0),
+        )
+
+    def update(
+        self, coord: np.ndarray, box: Optional[np.ndarray], atype: np.ndarray
+    ) -> bool:
+        """Rebuild the neighbor list if needed.
+
+        Parameters
+        ----------
+        coord : np.ndarray
+            the coordinates of local atoms, in the shape of natoms x 3
+        box : np.ndarray, optional
+            the cell, in the shape of 9. None for non-PBC systems
+        atype : np.ndarray
+            the atom types, in the shape of natoms
+
+        Returns
+        -------
+        bool
+            whether the neighbor list is rebuilt
+        """
+        self.nupdate += 1
+        if self.need_rebuild(coord, box, atype):
+            self.build(coord, box, atype)
+            return True
+        return False
+
+    def extend_coord(self, coord: np.ndarray, box: Optional[np.ndarray]) -> np.ndarray:
+        """Get the coordinates of the local and ghost atoms.
+
+        Parameters
+        ----------
+        coord : np.ndarray
+            the coordinates of local atoms, in the shape of natoms x 3
+        box : np.ndarray, optional
+            the cell, in the shape of 9. None for non-PBC systems
+
+        Returns
+        -------
+        np.ndarray
+            the coordinates of the extended system, in the shape of nall x 3
+        """
+        ext_coord = coord[self.mapping]
+        if box is not None:
+            ext_coord = ext_coord + np.matmul(self.shift, np.reshape(box, [3, 3]))
+        return ext_coord
+
+
+class VerletDeepPot:
+    """Evaluate a :class:`DeepPot` repeatedly with a Verlet neighbor list.
+
+    It is designed for drivers that evaluate one frame after another, e.g.
+    molecular dynamics or geometry optimization. The neighbor list within
+    `rcut + skin` is built in Python and passed to the model through the mesh
+    input, in the same way as the C++ interface. The list is only rebuilt when
+    an atom moves by more than `skin / 2`, or the cell or the atom types are
+    changed.
+
+    Only models whose descriptors build the environment matrix by the
+    ProdEnvMat ops (e.g. se_e2_a, se_e2_r, se_e3 and se_atten) are supported.
+
+    Parameters
+    ----------
+    dp : DeepPot
+        the model to evaluate
+    skin : float, default: 2.0
+        the skin distance
+
+    Examples
+    --------
+    >>> from deepmd.infer import DeepPot
+    >>> from deepmd.infer.neighbor_list import VerletDeepPot
+    >>> dp = VerletDeepPot(DeepPot("graph.pb"), skin=2.0)
+    >>> for coord in trajectory:
+    ...     e, f, v = dp.eval(coord, cell, atype)
+    """
+
+    def __init__(self, dp: "DeepPot", skin: float = 2.0):
+        if dp.has_spin or dp.has_efield:
+            raise NotImplementedError(
+                "spin and external field models are not supported by VerletDeepPot"
+            )
+        self.dp = dp
+        self.nlist = NeighborListCache(dp.get_rcut(), skin)
+
+    @property
+    def nbuild(self) -> int:
+        """The number of times that the neighbor list is built."""
+        return self.nlist.nbuild
+
+    @property
+    def neval(self) -> int:
+        """The number of evaluated frames."""
+        return self.nlist.nupdate
+
+    def eval(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: np.ndarray,
+        atomic: bool = False,
+        fparam: Optional[np.ndarray] = None,
+        aparam: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, ...]:
+        """Evaluate the energy, force and virial of one frame.
+
+        Parameters
+        ----------
+        coords
+            The coordinates of atoms.
+            The array should be of size natoms x 3 (or 1 x natoms x 3)
+        cells
+            The cell of the region.
+            If None then non-PBC is assumed, otherwise using PBC.
+            The array should be of size 9 (or 1 x 9)
+        atom_types
+            The atom types
+            The list should contain natoms ints
+        atomic
+            Calculate the atomic energy and virial
+        fparam
+            The frame parameter, of size dim_fparam
+        aparam
+            The atomic parameter, of size natoms x dim_aparam or dim_aparam
+
+        Returns
+        -------
+        energy
+            The system energy, in the shape of 1 x 1
+        force
+            The force on each atom, in the shape of 1 x natoms x 3
+        virial
+            The virial, in the shape of 1 x 9
+        atom_energy
+            The atomic energy. Only returned when atomic == True
+        atom_virial
+            The atomic virial. Only returned when atomic == True
+        """
+        dp = self.dp
+        atom_types = np.array(atom_types, dtype=int).reshape([-1])
+        natoms = atom_types.size
+        coords = np.reshape(np.array(coords), [-1, natoms, 3])
+        if coords.shape[0] != 1:
+            raise ValueError("VerletDeepPot evaluates one frame at a time")
+        if cells is not None:
+            cells = np.reshape(np.array(cells), [9])
+
+        coords_sorted, atype_sorted, imap = dp.sort_input(coords, atom_types)
+        coord = np.reshape(coords_sorted, [natoms, 3])
+        self.nlist.update(coord, cells, atype_sorted)
+        ext_coord = self.nlist.extend_coord(coord, cells)
+        mapping = self.nlist.mapping
+        nall = mapping.size
+
+        natoms_vec = dp.make_natoms_vec(atype_sorted)
+        natoms_vec[1] = nall
+        feed_dict = {
+            dp.t_natoms: natoms_vec,
+            dp.t_type: atype_sorted[mapping],
+            dp.t_coord: np.reshape(ext_coord, [-1]),
+            dp.t_mesh: self.nlist.mesh,
+        }
+        # the cell is not used when the neighbor list is given
+        box = np.eye(3).reshape([9]) if cells is None else cells
+        if len(dp.t_box.shape) == 1:
+            feed_dict[dp.t_box] = box
+        else:
+            feed_dict[dp.t_box] = np.reshape(box, [1, 9])
+        if dp.has_fparam:
+            assert fparam is not None
+            feed_dict[dp.t_fparam] = np.reshape(fparam, [-1])
+        if dp.has_aparam:
+            assert aparam is not None
+            fdim = dp.get_dim_aparam()
+            aparam = np.array(aparam)
+            if aparam.size == fdim:
+                aparam = np.tile(aparam.reshape([-1]), [natoms, 1])
+            aparam = np.reshape(aparam, [natoms, fdim])[imap]
+            feed_dict[dp.t_aparam] = np.reshape(aparam, [-1])
+
+        output_names = dp._get_output_names(atomic=atomic)
+        t_out = [getattr(dp, dp.output_tensors[kk]) for kk in output_names]
+        v_out = dict(zip(output_names, run_sess(dp.sess, t_out, feed_dict=feed_dict)))
+
+        output = {
+            "energy": np.reshape(v_out["energy"], [1, 1]),
+            "force": self._fold(v_out["force"], 3, imap),
+            "virial": np.reshape(v_out["virial"], [1, 9]),
+        }
+        if atomic:
+            output["atom_energy"] = dp.reverse_map(
+                np.reshape(v_out["atom_energy"], [1, natoms, 1]), imap
+            )
+            output["atom_virial"] = self._fold(v_out["atom_virial"], 9, imap)
+        if dp.modifier_type is not None:
+            if atomic:
+                raise RuntimeError("modifier does not support atomic modification")
+            me, mf, mv = dp.dm.eval(coords, cells, atom_types)
+            output["energy"] += me.reshape([1, 1])
+            output["force"] += mf.reshape([1, natoms, 3])
+            output["virial"] += mv.reshape([1, 9])
+        return tuple(output[kk] for kk in output_names)
+
+    def _fold(self, ext_vec: np.ndarray, ndim: int, imap: np.ndarray) -> np.ndarray:
+        """Add the quantities of ghost atoms to their local atoms and reverse sorting."""
+        ext_vec = np.reshape(ext_vec, [-1, ndim])
+        nloc = imap.size
+        vec = np.zeros((nloc, ndim), dtype=ext_vec.dtype)
+        np.add.at(vec, self.nlist.mapping, ext_vec)
+        return self.dp.reverse_map(vec[None, :, :], imap)
@@ -0,0 +1,354 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Serve concurrent evaluation requests of a DeepPot by dynamic batching."""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import (
+    Future,
+)
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+
+from deepmd.utils.histogram import (
+    PhaseHistogram,
+)
+
+if TYPE_CHECKING:
+    from deepmd.infer.deep_pot import (
+        DeepPot,
+    )
+
+__all__ = ["DeepPotServer"]
+
+log = logging.getLogger(__name__)
+
+
+class _Request:
+    """An evaluation request waiting in the queue."""
+
+    __slots__ = (
+        "key",
+        "coords",
+        "cells",
+        "fparam",
+        "aparam",
+        "nframes",
+        "future",
+        "tic",
+    )
+
+    def __init__(self, key, coords, cells, fparam, aparam, nframes):
+        self.key = key
+        self.coords = coords
+        self.cells = cells
+        self.fparam = fparam
+        self.aparam = aparam
+        self.nframes = nframes
+        self.future = Future()
+        self.tic = time.perf_counter()
+
+
+class DeepPotServer:
+    """Evaluate concurrent requests to a :class:`DeepPot` in dynamic batches.
+
+    Requests can be submitted from any number of threads or coroutines. They
+    are queued and evaluated by a single worker thread, so the model is never
+    run concurrently. Requests with the same atom types and the same kind of
+    inputs are merged into one evaluation, until `max_batch_size` frames are
+    collected or the first request of the batch has waited for `max_latency`
+    seconds.
+
+    Parameters
+    ----------
+    dp : DeepPot
+        the model to serve
+    max_batch_size : int, default: 64
+        the maximal number of frames merged into one evaluation
+    max_latency : float, default: 0.005
+        the maximal time in seconds that a request waits for other requests
+        to be batched with
+
+    Examples
+    --------
+    >>> from deepmd.infer import DeepPot
+    >>> from deepmd.infer.server import DeepPotServer
+    >>> with DeepPotServer(DeepPot("graph.pb")) as server:
+    ...     future = server.submit(coord, cell, atype)
+    ...     e, f, v = future.result()
+    """
+
+    def __init__(
+        self, dp: "DeepPot", max_batch_size: int = 64, max_latency: float = 0.005
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size should be a positive integer")
+        self.dp = dp
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._thread = None
+        # whether stop() has put the sentinel to the queue
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._npending = 0
+        self.nrequests = 0
+        self.nbatches = 0
+        self.nframes = 0
+        self.latency = PhaseHistogram()
+        self.run_time = PhaseHistogram()
+
+    def start(self):
+        """Start the worker thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Evaluate the queued requests and stop the worker thread.
+
+        The requests submitted after the stop has begun are rejected.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            if not self._stopping:
+                self._stopping = True
+                self._queue.put(None)
+        thread.join()
+        # requests queued after the sentinel are never evaluated
+        error = RuntimeError("The server is stopped")
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                with self._lock:
+                    self._npending -= 1
+                request.future.set_exception(error)
+        with self._lock:
+            if self._thread is thread:
+                self._thread = None
+                self._stopping = False
+
+    def __enter__(self) -> "DeepPotServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def submit(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: List[int],
+        atomic: bool = False,
+        fparam: Optional[np.ndarray] = None,
+        aparam: Optional[np.ndarray] = None,
+    ) -> Future:
+        """Submit a request to evaluate the energy, force and virial.
+
+        The arguments are the same as :meth:`deepmd.infer.DeepPot.eval`.
+
+        Parameters
+        ----------
+        coords
+            The coordinates of atoms.
+            The array should be of size nframes x natoms x 3
+        cells
+            The cell of the region.
+            If None then non-PBC is assumed, otherwise using PBC.
+            The array should be of size nframes x 9
+        atom_types
+            The atom types
+            The list should contain natoms ints
+        atomic
+            Calculate the atomic energy and virial
+        fparam
+            The frame parameter, of size nframes x dim_fparam or dim_fparam
+        aparam
+            The atomic parameter, of size nframes x natoms x dim_aparam,
+            natoms x dim_aparam or dim_aparam
+
+        Returns
+        -------
+        Future
+            the future of the result, which is the same as the returns of
+            :meth:`deepmd.infer.DeepPot.eval`
+        """
+        atom_types = np.array(atom_types, dtype=int).reshape([-1])
+        natoms = atom_types.size
+        coords = np.reshape(np.array(coords), [-1, natoms * 3])
+        nframes = coords.shape[0]
+        if cells is not None:
+            cells = np.reshape(np.array(cells), [nframes, 9])
+        if fparam is not None:
+            fdim = self.dp.get_dim_fparam()
+            fparam = np.broadcast_to(
+                np.reshape(np.array(fparam), [-1, fdim]), [nframes, fdim]
+            )
+        if aparam is not None:
+            fdim = self.dp.get_dim_aparam()
+            aparam = np.array(aparam)
+            aparam = np.broadcast_to(
+                np.reshape(aparam, [-1, 1 if aparam.size == fdim else natoms, fdim]),
+                [nframes, natoms, fdim],
+            )
+        key = (
+            atom_types.tobytes(),
+            cells is None,
+            bool(atomic),
+            fparam is None,
+            aparam is None,
+        )
+        request = _Request(key, coords, cells, fparam, aparam, nframes)
+        with self._lock:
+            if self._thread is None or self._stopping:
+                raise RuntimeError("The server is not running")
+            self._npending += 1
+            self.nrequests += 1
+            self._queue.put(request)
+        return request.future
+
+    def eval(self, *args, **kwargs) -> Tuple[np.ndarray, ...]:
+        """Submit a request and wait for the result.
+
+        The arguments and the returns are the same as
+        :meth:`deepmd.infer.DeepPot.eval`.
+        """
+        return self.submit(*args, **kwargs).result()
+
+    async def eval_async(self, *args, **kwargs) -> Tuple[np.ndarray, ...]:
+        """Submit a request and await the result in asyncio.
+
+        The arguments and the returns are the same as
+        :meth:`deepmd.infer.DeepPot.eval`.
+        """
+        return await asyncio.wrap_future(self.submit(*args, **kwargs))
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of requests not evaluated yet."""
+        return self._npending
+
+    def metrics(self) -> Dict[str, object]:
+        """Get the metrics of the server.
+
+        Returns
+        -------
+        dict
+            the number of requests waiting to be evaluated, the total numbers
+            of requests, batches and frames, the average number of frames in a
+            batch, and the summaries of the request latency (from submission
+            to result) and the run time of batches, in seconds
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "requests": self.nrequests,
+            "batches": self.nbatches,
+            "frames": self.nframes,
+            "mean_batch_size": self.nframes / self.nbatches if self.nbatches else 0.0,
+            "latency": self.latency.summary(),
+            "run_time": self.run_time.summary(),
+        }
+
+    def _worker(self):
+        # requests grouped by the batch key, in the order of arrival
+        pending: Dict[tuple, List[_Request]] = {}
+        stopping = False
+        while not stopping or pending:
+            timeout = None
+            if pending:
+                first = min(rr[0].tic for rr in pending.values())
+                timeout = max(first + self.max_latency - time.perf_counter(), 0.0)
+            if not stopping:
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    pass
+                else:
+                    if request is None:
+                        stopping = True
+                    else:
+                        pending.setdefault(request.key, []).append(request)
+            now = time.perf_counter()
+            for key in list(pending):
+                requests = pending[key]
+                nframes = sum(rr.nframes for rr in requests)
+                if (
+                    stopping
+                    or nframes >= self.max_batch_size
+                    or now - requests[0].tic >= self.max_latency
+                ):
+                    del pending[key]
+                    self._run_batch(requests)
+
+    def _run_batch(self, requests: List[_Request]):
+        """Evaluate the requests in batches of at most max_batch_size frames."""
+        batch, nframes = [], 0
+        for request in requests:
+            if batch and nframes + request.nframes > self.max_batch_size:
+                self._run(batch)
+                batch, nframes = [], 0
+            batch.append(request)
+            nframes += request.nframes
+        if batch:
+            self._run(batch)
+
+    def _run(self, requests: List[_Request]):
+        first = requests[0]
+        _, nopbc, atomic, no_fparam, no_aparam = first.key
+        atom_types = np.frombuffer(first.key[0], dtype=int)
+        nframes = [rr.nframes for rr in requests]
+        tic = time.perf_counter()
+        results, error = None, None
+        try:
+            ret = self.dp.eval(
+                np.concatenate([rr.coords for rr in requests]),
+                None if nopbc else np.concatenate([rr.cells for rr in requests]),
+                atom_types,
+                atomic=atomic,
+                fparam=(
+                    None
+                    if no_fparam
+                    else np.concatenate([rr.fparam for rr in requests])
+                ),
+                aparam=(
+                    None
+                    if no_aparam
+                    else np.concatenate([rr.aparam for rr in requests])
+                ),
+            )
+            splitted = [np.split(rr, np.cumsum(nframes)[:-1]) for rr in ret]
+            results = [tuple(ss[ii] for ss in splitted) for ii in range(len(requests))]
+        except Exception as e:
+            log.exception("Failed to evaluate a batch of %d requests", len(requests))
+            error = e
+        # update the metrics before the results are visible to the callers
+        toc = time.perf_counter()
+        self.run_time.add(toc - tic)
+        for request in requests:
+            self.latency.add(toc - request.tic)
+        self.nbatches += 1
+        self.nframes += sum(nframes)
+        with self._lock:
+            self._npending -= len(requests)
+        for ii, request in enumerate(requests):
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(results[ii])
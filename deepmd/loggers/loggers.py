@@ -3,6 +3,7 @@
 
 import logging
 import os
+import time
 from typing import (
     TYPE_CHECKING,
     Optional,
@@ -23,6 +24,11 @@ logging.getLogger(__name__)
 
 __all__ = ["set_log_handles"]
 
+# the MPI log stream writes the buffer when it exceeds the size in bytes, or
+# when the time in seconds has passed since the last write
+MPI_LOG_BUFFER_SIZE = 64 * 1024
+MPI_LOG_FLUSH_INTERVAL = 5.0
+
 # logger formater
 FFORMATTER = logging.Formatter(
     "[%(asctime)s] %(app_name)s %(levelname)-7s %(name)-45s %(message)s"
@@ -77,6 +83,11 @@ class _MPIMasterFilter(logging.Filter):
 class _MPIFileStream:
     """Wrap MPI.File` so it has the same API as python file streams.
 
+    Messages are buffered, and the buffer is written to the shared file
+    pointer at once when it exceeds `buffer_size`, when `flush_interval` has
+    passed since the last write, or when the stream is flushed or closed.
+    The messages of a rank are kept together and in order.
+
     Parameters
     ----------
     filename : Path
@@ -85,14 +96,27 @@ class _MPIFileStream:
         MPI communicator object
     mode : str, optional
         file write mode, by default _MPI_APPEND_MODE
+    buffer_size : int, optional
+        the size of the buffer in bytes
+    flush_interval : float, optional
+        the longest time in seconds the messages stay in the buffer, checked
+        when a message is written
     """
 
     def __init__(
-        self, filename: "Path", MPI: "MPI", mode: str = "_MPI_APPEND_MODE"
+        self,
+        filename: "Path",
+        MPI: "MPI",
+        mode: str = "_MPI_APPEND_MODE",
+        buffer_size: int = MPI_LOG_BUFFER_SIZE,
+        flush_interval: float = MPI_LOG_FLUSH_INTERVAL,
     ) -> None:
         self.stream = MPI.File.Open(MPI.COMM_WORLD, filename, mode)
-        self.stream.Set_atomicity(True)
         self.name = "MPIfilestream"
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = bytearray()
+        self.last_flush = time.monotonic()
 
     def write(self, msg: str):
         """Write to MPI shared file stream.
@@ -102,12 +126,23 @@ class _MPIFileStream:
         msg : str
             message to write
         """
-        b = bytearray()
-        b.extend(map(ord, msg))
-        self.stream.Write_shared(b)
+        self.buffer.extend(msg.encode("utf-8"))
+        if (
+            len(self.buffer) >= self.buffer_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered messages to MPI shared file stream."""
+        if self.buffer:
+            self.stream.Write_shared(self.buffer)
+            self.buffer = bytearray()
+        self.last_flush = time.monotonic()
 
     def close(self):
         """Synchronize and close MPI file stream."""
+        self.flush()
         self.stream.Sync()
         self.stream.Close()
 
@@ -132,10 +167,31 @@ class _MPIHandler(logging.FileHandler):
         mode: str = "_MPI_APPEND_MODE",
     ) -> None:
         self.MPI = MPI
-        super().__init__(filename, mode=mode, encoding=None, delay=False)
+        self.mpi_mode = mode
+        # the MPI mode is an int, which `logging.FileHandler` does not accept
+        super().__init__(filename, mode="ab", encoding=None, delay=True)
+        self.stream = self._open()
 
     def _open(self):
-        return _MPIFileStream(self.baseFilename, self.MPI, self.mode)
+        return _MPIFileStream(self.baseFilename, self.MPI, self.mpi_mode)
+
+    def emit(self, record: logging.LogRecord):
+        """Write the record to the buffer of the stream.
+
+        Unlike `logging.FileHandler`, the stream is not flushed for each record,
+        but for warnings and errors.
+        """
+        if self.stream is None:
+            # reopening the file after it is closed is a collective call
+            return
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
 
     def setStream(self, stream):
         """Stream canot be reasigned in MPI mode."""
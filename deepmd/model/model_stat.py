@@ -5,6 +5,11 @@ from collections import (
 
 import numpy as np
 
+from deepmd.utils.distributed_stat import (
+    gather_sys_stats,
+    get_stat_systems,
+)
+
 
 def _make_all_stat_ref(data, nbatches):
     all_stat = defaultdict(list)
@@ -38,9 +43,14 @@ def make_stat_input(data, nbatches, merge_sys=True):
             all_stat[key][sys_idx][batch_idx][frame_idx]
         else merge_sys == True can be accessed by
             all_stat[key][batch_idx][frame_idx]
+
+    Notes
+    -----
+    In :func:`deepmd.utils.distributed_stat.distributed_stat`, each rank only
+    gets batches from its systems, and the data of all the systems are gathered.
     """
-    all_stat = defaultdict(list)
-    for ii in range(data.get_nsystems()):
+    sys_stats = []
+    for ii in get_stat_systems(data):
         sys_stat = defaultdict(list)
         for jj in range(nbatches):
             stat_data = data.get_batch(sys_idx=ii)
@@ -48,6 +58,10 @@ def make_stat_input(data, nbatches, merge_sys=True):
                 if dd == "natoms_vec":
                     stat_data[dd] = stat_data[dd].astype(np.int32)
                 sys_stat[dd].append(stat_data[dd])
+        sys_stats.append((ii, dict(sys_stat)))
+    sys_stats = gather_sys_stats(sys_stats, data)
+    all_stat = defaultdict(list)
+    for _, sys_stat in sys_stats:
         for dd in sys_stat:
             if merge_sys:
                 for bb in sys_stat[dd]:
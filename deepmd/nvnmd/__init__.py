@@ -1,10 +1,23 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
-from . import (
-    data,
-    descriptor,
-    entrypoints,
-    fit,
-    utils,
+from typing import (
+    TYPE_CHECKING,
+)
+
+from deepmd.utils.lazy import (
+    lazy_import,
+)
+
+if TYPE_CHECKING:
+    from . import (
+        data,
+        descriptor,
+        entrypoints,
+        fit,
+        utils,
+    )
+
+__getattr__, __dir__ = lazy_import(
+    __name__, submodules=["data", "descriptor", "entrypoints", "fit", "utils"]
 )
 
 __all__ = [
@@ -1,27 +1,52 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
-from .argcheck import (
-    nvnmd_args,
+from typing import (
+    TYPE_CHECKING,
 )
-from .config import (
-    nvnmd_cfg,
-)
-from .encode import (
-    Encode,
-)
-from .fio import (
-    FioBin,
-    FioDic,
-    FioTxt,
-)
-from .network import (
-    one_layer,
-)
-from .op import (
-    map_nvnmd,
+
+from deepmd.utils.lazy import (
+    lazy_import,
 )
-from .weight import (
-    get_filter_weight,
-    get_fitnet_weight,
+
+if TYPE_CHECKING:
+    from .argcheck import (
+        nvnmd_args,
+    )
+    from .config import (
+        nvnmd_cfg,
+    )
+    from .encode import (
+        Encode,
+    )
+    from .fio import (
+        FioBin,
+        FioDic,
+        FioTxt,
+    )
+    from .network import (
+        one_layer,
+    )
+    from .op import (
+        map_nvnmd,
+    )
+    from .weight import (
+        get_filter_weight,
+        get_fitnet_weight,
+    )
+
+__getattr__, __dir__ = lazy_import(
+    __name__,
+    attrs={
+        "nvnmd_args": ".argcheck",
+        "nvnmd_cfg": ".config",
+        "Encode": ".encode",
+        "FioBin": ".fio",
+        "FioDic": ".fio",
+        "FioTxt": ".fio",
+        "one_layer": ".network",
+        "map_nvnmd": ".op",
+        "get_filter_weight": ".weight",
+        "get_fitnet_weight": ".weight",
+    },
 )
 
 __all__ = [
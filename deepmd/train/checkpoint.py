@@ -0,0 +1,396 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Checkpoint writing with retention policy and optional background writes."""
+
+import glob
+import logging
+import os
+import platform
+import queue
+import shutil
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+import google.protobuf.message
+import numpy as np
+
+from deepmd.env import (
+    get_tf_session_config,
+    tf,
+)
+from deepmd.utils.errors import (
+    GraphTooLargeError,
+)
+from deepmd.utils.sess import (
+    run_sess,
+)
+
+__all__ = [
+    "DATA_STATE_SUFFIX",
+    "CheckpointWriter",
+    "load_data_state",
+    "save_data_state",
+    "select_checkpoints_to_keep",
+]
+
+log = logging.getLogger(__name__)
+
+# suffix of the file of the data state next to a checkpoint
+DATA_STATE_SUFFIX = ".data_state.npz"
+
+
+def _flatten_state(state: Any, prefix: str, flat: Dict[str, np.ndarray]):
+    """Flatten nested dicts, lists and tuples into arrays keyed by their paths."""
+    if isinstance(state, dict):
+        for kk, vv in state.items():
+            _flatten_state(vv, f"{prefix}{kk}/", flat)
+    elif isinstance(state, (list, tuple)):
+        for ii, vv in enumerate(state):
+            _flatten_state(vv, f"{prefix}{ii}/", flat)
+    elif state is not None:
+        flat[prefix[:-1]] = np.asarray(state)
+
+
+def _unflatten_state(flat: Dict[str, np.ndarray]) -> Any:
+    """Restore the nested state flattened by `_flatten_state`."""
+    root = {}
+    for key, value in flat.items():
+        *path, name = key.split("/")
+        node = root
+        for kk in path:
+            node = node.setdefault(kk, {})
+        node[name] = value.item() if value.ndim == 0 else value
+    return _restore_lists(root)
+
+
+def _restore_lists(node: Any) -> Any:
+    if not isinstance(node, dict):
+        return node
+    node = {kk: _restore_lists(vv) for kk, vv in node.items()}
+    if node and all(kk.isdigit() for kk in node):
+        return [node[str(ii)] for ii in range(len(node))]
+    return node
+
+
+def save_data_state(path: str, state: Dict[str, Any]):
+    """Save the state of the training data, e.g. the positions of iterators.
+
+    Parameters
+    ----------
+    path : str
+        the path of the file
+    state : dict
+        nested dicts and lists of numbers, strings and arrays. None is
+        skipped, and tuples are restored as lists
+    """
+    flat = {}
+    _flatten_state(state, "", flat)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **flat)
+
+
+def load_data_state(path: str) -> Dict[str, Any]:
+    """Load the state of the training data saved by :func:`save_data_state`.
+
+    Parameters
+    ----------
+    path : str
+        the path of the file
+
+    Returns
+    -------
+    dict
+        the state
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return _unflatten_state({kk: data[kk] for kk in data.files})
+
+
+def select_checkpoints_to_keep(
+    steps: List[int], max_ckpt_keep: int, keep_ckpt_freq: int = 0
+) -> List[int]:
+    """Select the checkpoints that should be kept on the disk.
+
+    Parameters
+    ----------
+    steps : List[int]
+        steps of the existing checkpoints, from the oldest to the newest
+    max_ckpt_keep : int
+        the number of the most recent checkpoints to keep. If not positive,
+        all checkpoints are kept
+    keep_ckpt_freq : int, default: 0
+        checkpoints whose step is a multiple of `keep_ckpt_freq` are kept in
+        addition to the most recent ones. 0 disables this rule
+
+    Returns
+    -------
+    List[int]
+        steps of the checkpoints to keep, in the input order
+    """
+    if max_ckpt_keep <= 0:
+        return list(steps)
+    recent = set(steps[-max_ckpt_keep:])
+    return [
+        ss
+        for ss in steps
+        if ss in recent or (keep_ckpt_freq > 0 and ss % keep_ckpt_freq == 0)
+    ]
+
+
+class CheckpointWriter:
+    """Write checkpoints of the training session and manage their retention.
+
+    In the synchronous mode, checkpoints are written by `tf.train.Saver` in the
+    caller's thread. In the asynchronous mode, variables are snapshotted to the
+    host memory and the checkpoint files are written by a background thread,
+    so that the training loop is only blocked by the snapshot. Files are first
+    written to a temporary prefix and then renamed, so that an interrupted
+    write never leaves a partial checkpoint behind.
+
+    Parameters
+    ----------
+    saver : tf.train.Saver
+        the saver of the training graph, used to write synchronous checkpoints
+        and the meta graph
+    save_ckpt : str
+        the path prefix of checkpoint files
+    max_ckpt_keep : int, default: 5
+        the number of the most recent checkpoints to keep
+    keep_ckpt_freq : int, default: 0
+        additionally keep checkpoints whose step is a multiple of it
+    async_write : bool, default: False
+        write checkpoints in a background thread
+    max_pending : int, default: 1
+        the maximum number of snapshots waiting to be written. The training
+        loop blocks if this number is reached
+    """
+
+    def __init__(
+        self,
+        saver: tf.train.Saver,
+        save_ckpt: str,
+        max_ckpt_keep: int = 5,
+        keep_ckpt_freq: int = 0,
+        async_write: bool = False,
+        max_pending: int = 1,
+    ):
+        self.saver = saver
+        self.save_ckpt = save_ckpt
+        self.max_ckpt_keep = max_ckpt_keep
+        self.keep_ckpt_freq = keep_ckpt_freq
+        self.async_write = async_write
+        self.max_pending = max_pending
+        self.ckpt_path = os.path.join(os.getcwd(), self.save_ckpt)
+        self.save_dir = os.path.dirname(self.ckpt_path)
+        # steps of checkpoints written by this writer
+        self.steps = []
+        self._meta_graph = None
+        self._meta_graph_version = None
+        self._queue = None
+        self._thread = None
+        self._error = None
+        self._var_list = None
+
+    def save(
+        self,
+        sess: tf.Session,
+        cur_batch: int,
+        data_state: Optional[Dict[str, Any]] = None,
+    ):
+        """Save a checkpoint of the session.
+
+        Parameters
+        ----------
+        sess : tf.Session
+            the training session
+        cur_batch : int
+            the current training step
+        data_state : dict, optional
+            the state of the training data, saved by :func:`save_data_state`
+            next to the checkpoint
+        """
+        self._check_error()
+        if not self.async_write:
+            tic = time.time()
+            try:
+                ckpt_prefix = self.saver.save(
+                    sess,
+                    self.ckpt_path,
+                    global_step=cur_batch,
+                    write_state=False,
+                )
+            except google.protobuf.message.DecodeError as e:
+                raise GraphTooLargeError(
+                    "The graph size exceeds 2 GB, the hard limitation of protobuf."
+                    " Then a DecodeError was raised by protobuf. You should "
+                    "reduce the size of your model."
+                ) from e
+            if data_state is not None:
+                tmp_path = f"{ckpt_prefix}.tmp{DATA_STATE_SUFFIX}"
+                save_data_state(tmp_path, data_state)
+                os.replace(tmp_path, ckpt_prefix + DATA_STATE_SUFFIX)
+            self._finalize(cur_batch, ckpt_prefix)
+            log.info("saved checkpoint %s in %.2f s", self.save_ckpt, time.time() - tic)
+            return
+        tic = time.time()
+        if self._var_list is None:
+            self._var_list = tf.global_variables()
+        values = run_sess(sess, self._var_list)
+        meta_graph = self._get_meta_graph(sess.graph)
+        snapshot_time = time.time() - tic
+        if self._thread is None:
+            self._start()
+        # blocks if too many writes are outstanding
+        self._queue.put((cur_batch, values, meta_graph, data_state, snapshot_time))
+        wait_time = time.time() - tic - snapshot_time
+        log.debug(
+            "snapshot checkpoint at step %d in %.2f s, waited %.2f s for pending writes",
+            cur_batch,
+            snapshot_time,
+            wait_time,
+        )
+
+    def close(self):
+        """Wait for all pending checkpoints to be written."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._shadow_sess.close()
+        self._check_error()
+
+    def _check_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise RuntimeError("Failed to write the checkpoint") from error
+
+    def _get_meta_graph(self, graph: tf.Graph) -> bytes:
+        """Serialize the meta graph; only redone when the graph changes."""
+        if self._meta_graph is None or self._meta_graph_version != graph.version:
+            try:
+                self._meta_graph = self.saver.export_meta_graph(
+                    clear_devices=False
+                ).SerializeToString()
+            except google.protobuf.message.DecodeError as e:
+                raise GraphTooLargeError(
+                    "The graph size exceeds 2 GB, the hard limitation of protobuf."
+                    " Then a DecodeError was raised by protobuf. You should "
+                    "reduce the size of your model."
+                ) from e
+            self._meta_graph_version = graph.version
+        return self._meta_graph
+
+    def _start(self):
+        """Build the host-side copy of the variables and start the writer thread."""
+        with tf.Graph().as_default() as graph, tf.device("/cpu:0"):
+            self._placeholders = []
+            shadow_vars = {}
+            for vv in self._var_list:
+                pp = tf.placeholder(vv.dtype.base_dtype, vv.shape)
+                shadow_vars[vv.op.name] = tf.Variable(
+                    pp, trainable=False, collections=[]
+                )
+                self._placeholders.append(pp)
+            self._assign_op = tf.group(*[vv.initializer for vv in shadow_vars.values()])
+            self._shadow_saver = tf.train.Saver(var_list=shadow_vars, max_to_keep=None)
+        config = get_tf_session_config()
+        config.device_count["GPU"] = 0
+        self._shadow_sess = tf.Session(graph=graph, config=config)
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            cur_batch, values, meta_graph, data_state, snapshot_time = item
+            tic = time.time()
+            try:
+                self._write(cur_batch, values, meta_graph, data_state)
+            except Exception as e:
+                log.exception("Failed to write the checkpoint at step %d" % cur_batch)
+                self._error = e
+            else:
+                log.info(
+                    "saved checkpoint %s (snapshot %.2f s, write %.2f s)",
+                    self.save_ckpt,
+                    snapshot_time,
+                    time.time() - tic,
+                )
+
+    def _write(
+        self,
+        cur_batch: int,
+        values: List[np.ndarray],
+        meta_graph: bytes,
+        data_state: Optional[Dict[str, Any]],
+    ):
+        ckpt_prefix = f"{self.ckpt_path}-{cur_batch}"
+        tmp_prefix = f"{ckpt_prefix}.tmp"
+        run_sess(
+            self._shadow_sess,
+            self._assign_op,
+            feed_dict=dict(zip(self._placeholders, values)),
+        )
+        self._shadow_saver.save(
+            self._shadow_sess,
+            tmp_prefix,
+            write_meta_graph=False,
+            write_state=False,
+        )
+        with open(f"{tmp_prefix}.meta", "wb") as f:
+            f.write(meta_graph)
+        if data_state is not None:
+            save_data_state(tmp_prefix + DATA_STATE_SUFFIX, data_state)
+        # the index file is renamed last, as its existence marks a complete checkpoint
+        tmp_files = sorted(
+            glob.glob(tmp_prefix + ".*"), key=lambda ff: ff.endswith(".index")
+        )
+        for tmp_ff in tmp_files:
+            os.replace(tmp_ff, ckpt_prefix + tmp_ff[len(tmp_prefix) :])
+        self._finalize(cur_batch, ckpt_prefix)
+
+    def _finalize(self, cur_batch: int, ckpt_prefix: str):
+        """Apply the retention policy, update the checkpoint state and symlinks."""
+        if cur_batch in self.steps:
+            self.steps.remove(cur_batch)
+        self.steps.append(cur_batch)
+        kept = select_checkpoints_to_keep(
+            self.steps, self.max_ckpt_keep, self.keep_ckpt_freq
+        )
+        for ss in self.steps:
+            if ss not in kept:
+                for ff in glob.glob(f"{self.ckpt_path}-{ss}.*"):
+                    try:
+                        os.remove(ff)
+                    except OSError:
+                        pass
+        self.steps = kept
+        tf.train.update_checkpoint_state(
+            self.save_dir,
+            os.path.basename(ckpt_prefix),
+            [os.path.basename(f"{self.ckpt_path}-{ss}") for ss in self.steps],
+        )
+        # make symlinks from prefix with step to that without step to break nothing
+        # get all checkpoint files
+        original_files = glob.glob(ckpt_prefix + ".*")
+        for ori_ff in original_files:
+            new_ff = self.save_ckpt + ori_ff[len(ckpt_prefix) :]
+            try:
+                # remove old one
+                os.remove(new_ff)
+            except OSError:
+                pass
+            if platform.system() != "Windows":
+                # by default one does not have access to create symlink on Windows
+                os.symlink(os.path.relpath(ori_ff, os.path.dirname(new_ff)), new_ff)
+            else:
+                shutil.copyfile(ori_ff, new_ff)
@@ -0,0 +1,173 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Per-step profiler which breaks training steps into phases."""
+
+import contextlib
+import json
+import re
+import time
+from typing import (
+    Optional,
+)
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.utils.histogram import (
+    PhaseHistogram,
+)
+
+__all__ = ["StepProfiler"]
+
+# the timeline label of a node looks like "name = OpType(input, ...)"
+_OP_TYPE_PATTERN = re.compile(r"=\s*([\w>]+)\(")
+
+
+class StepProfiler:
+    """Record the time spent in each phase of training steps.
+
+    Phases are timed by the :meth:`phase` context manager. Summaries of all
+    phases are written to a JSON file by :meth:`write`. If `op_stats_freq` is
+    positive, the :class:`tf.RunOptions` returned by :meth:`run_options` enable
+    full tracing every `op_stats_freq` steps, and the collected `tf.RunMetadata`
+    is aggregated per op type.
+
+    Parameters
+    ----------
+    enabled : bool
+        whether the profiler is enabled. If not, all methods do nothing
+    output_file : str
+        the JSON file to write the summaries
+    op_stats_freq : int, default: 0
+        the frequency of capturing `tf.RunMetadata`. 0 disables it
+    graph : tf.Graph, optional
+        the graph used to look up op types from node names
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        output_file: str,
+        op_stats_freq: int = 0,
+        graph: Optional[tf.Graph] = None,
+    ):
+        self.enabled = enabled
+        self.output_file = output_file
+        self.op_stats_freq = op_stats_freq if enabled else 0
+        self.graph = graph
+        self.histograms = {}
+        self.op_stats = {}
+        self.numb_traced_steps = 0
+        self._run_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as the phase `name`."""
+        if not self.enabled:
+            yield
+            return
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - tic)
+
+    def add(self, name: str, duration: float):
+        """Add the duration of a phase, in seconds."""
+        if not self.enabled:
+            return
+        if name not in self.histograms:
+            self.histograms[name] = PhaseHistogram()
+        self.histograms[name].add(duration)
+
+    def run_options(self, cur_batch: int):
+        """Get the run options and metadata for the current step.
+
+        Parameters
+        ----------
+        cur_batch : int
+            the current training step
+
+        Returns
+        -------
+        tf.RunOptions or None
+            the run options enabling full tracing, or None if the step is not traced
+        tf.RunMetadata or None
+            the run metadata to be filled, or None if the step is not traced
+        """
+        if self.op_stats_freq > 0 and cur_batch % self.op_stats_freq == 0:
+            return self._run_options, tf.RunMetadata()
+        return None, None
+
+    def add_run_metadata(self, run_metadata: tf.RunMetadata):
+        """Aggregate the time of ops in the run metadata by op types."""
+        if not self.enabled or run_metadata is None:
+            return
+        self.numb_traced_steps += 1
+        for dev_stats in run_metadata.step_stats.dev_stats:
+            for node_stats in dev_stats.node_stats:
+                op_type = self._get_op_type(node_stats)
+                stats = self.op_stats.setdefault(op_type, {"count": 0, "total": 0.0})
+                stats["count"] += 1
+                stats["total"] += node_stats.op_end_rel_micros * 1e-6
+
+    def _get_op_type(self, node_stats) -> str:
+        node_name = node_stats.node_name.split(":")[0]
+        if self.graph is not None:
+            try:
+                return self.graph.get_operation_by_name(node_name).type
+            except KeyError:
+                pass
+        match = _OP_TYPE_PATTERN.search(node_stats.timeline_label)
+        if match is not None:
+            return match.group(1)
+        return node_name
+
+    def summary(self) -> dict:
+        """Summaries of the phases and op types.
+
+        Returns
+        -------
+        dict
+            the summaries. Times are in seconds
+        """
+        op_types = {
+            kk: {
+                "count": vv["count"],
+                "total": vv["total"],
+                "per_step": vv["total"] / self.numb_traced_steps,
+            }
+            for kk, vv in sorted(
+                self.op_stats.items(), key=lambda item: -item[1]["total"]
+            )
+        }
+        return {
+            "phases": {kk: vv.summary() for kk, vv in self.histograms.items()},
+            "op_types": {
+                "traced_steps": self.numb_traced_steps,
+                "ops": op_types,
+            },
+        }
+
+    def write(self, cur_batch: int, summary_writer=None):
+        """Write the summaries to the JSON file and optionally to TensorBoard.
+
+        Parameters
+        ----------
+        cur_batch : int
+            the current training step
+        summary_writer : tf.summary.FileWriter, optional
+            the TensorBoard writer
+        """
+        if not self.enabled:
+            return
+        summary = self.summary()
+        summary["step"] = int(cur_batch)
+        with open(self.output_file, "w") as f:
+            json.dump(summary, f, indent=2)
+        if summary_writer is not None:
+            values = [
+                tf.Summary.Value(tag=f"phase/{kk}/{pp}", simple_value=vv[pp])
+                for kk, vv in summary["phases"].items()
+                for pp in ("mean", "p50", "p95", "p99")
+            ]
+            summary_writer.add_summary(tf.Summary(value=values), cur_batch)
@@ -1,17 +1,18 @@
 #!/usr/bin/env python3
 # SPDX-License-Identifier: LGPL-3.0-or-later
-import glob
 import logging
 import os
 import platform
+import queue
 import shutil
+import threading
 import time
 from typing import (
     Dict,
     List,
+    Optional,
 )
 
-import google.protobuf.message
 import numpy as np
 from packaging.version import (
     Version,
@@ -44,12 +45,23 @@ from deepmd.model import (
 from deepmd.model.model import (
     Model,
 )
+from deepmd.train.checkpoint import (
+    DATA_STATE_SUFFIX,
+    CheckpointWriter,
+    load_data_state,
+)
+from deepmd.train.step_profiler import (
+    StepProfiler,
+)
 from deepmd.utils import random as dp_random
 from deepmd.utils.data_system import (
     DeepmdDataSystem,
 )
+from deepmd.utils.distributed_stat import (
+    allgather,
+    distributed_stat,
+)
 from deepmd.utils.errors import (
-    GraphTooLargeError,
     GraphWithoutTensorError,
 )
 from deepmd.utils.graph import (
@@ -159,11 +171,21 @@ class DPTrainer:
         self.disp_freq = tr_data.get("disp_freq", 1000)
         self.save_freq = tr_data.get("save_freq", 1000)
         self.save_ckpt = tr_data.get("save_ckpt", "model.ckpt")
+        self.max_ckpt_keep = tr_data.get("max_ckpt_keep", 5)
+        self.keep_ckpt_freq = tr_data.get("keep_ckpt_freq", 0)
+        self.save_async = tr_data.get("save_async", False)
         self.display_in_training = tr_data.get("disp_training", True)
+        self.valid_merge_batches = tr_data.get("valid_merge_batches", False)
+        self.valid_async = self.run_opt.is_chief and tr_data.get("valid_async", False)
         self.timing_in_training = tr_data.get("time_training", True)
         self.profiling = self.run_opt.is_chief and tr_data.get("profiling", False)
         self.profiling_file = tr_data.get("profiling_file", "timeline.json")
         self.enable_profiler = tr_data.get("enable_profiler", False)
+        self.step_profiling = tr_data.get("step_profiling", False)
+        self.step_profiling_file = tr_data.get(
+            "step_profiling_file", "step_profile.json"
+        )
+        self.op_profiling_freq = tr_data.get("op_profiling_freq", 0)
         self.tensorboard = self.run_opt.is_chief and tr_data.get("tensorboard", False)
         self.tensorboard_log_dir = tr_data.get("tensorboard_log_dir", "log")
         self.tensorboard_freq = tr_data.get("tensorboard_freq", 1)
@@ -277,7 +299,9 @@ class DPTrainer:
                 # self.saver.restore (in self._init_session) will restore avg and std variables, so data_stat is useless
                 # init_from_frz_model will restore data_stat variables in `init_variables` method
                 log.info("data stating... (this step may take long time)")
-                self.model.data_stat(data)
+                # each rank computes the statistics of a part of the data
+                with distributed_stat(self.run_opt._HVD):
+                    self.model.data_stat(data)
 
             # config the init_frz_model command
             if self.run_opt.init_mode == "init_from_frz_model":
@@ -489,11 +513,33 @@ class DPTrainer:
         if device == "gpu":
             config.gpu_options.visible_device_list = idx
         self.sess = tf.Session(config=config)
+        if self.valid_async and self.display_in_training and not self.is_compress:
+            # validation runs in its own session on a snapshot of the variables
+            self.valid_sess = tf.Session(config=config)
+            valid_var_list = tf.global_variables()
+            self._valid_var_list = valid_var_list
+            self._valid_var_values = [vv.initial_value for vv in valid_var_list]
+            self._valid_load_op = tf.group(*[vv.initializer for vv in valid_var_list])
+            self._valid_queue = queue.Queue(maxsize=1)
+            self._valid_error = None
+            self._valid_thread = threading.Thread(
+                target=self._valid_worker, daemon=True
+            )
+            self._valid_thread.start()
+        else:
+            self.valid_sess = None
 
         # Initializes or restore global variables
         init_op = tf.global_variables_initializer()
         if self.run_opt.is_chief:
             self.saver = tf.train.Saver(save_relative_paths=True)
+            self.ckpt_writer = CheckpointWriter(
+                self.saver,
+                self.save_ckpt,
+                max_ckpt_keep=self.max_ckpt_keep,
+                keep_ckpt_freq=self.keep_ckpt_freq,
+                async_write=self.save_async,
+            )
             if self.run_opt.init_mode == "init_from_scratch":
                 log.info("initialize model from scratch")
                 run_sess(self.sess, init_op)
@@ -526,6 +572,7 @@ class DPTrainer:
         else:
             run_sess(self.sess, init_op)
             self.saver = None
+            self.ckpt_writer = None
 
         # Ensure variable consistency among tasks when training starts
         if self.run_opt.is_distrib:
@@ -609,6 +656,12 @@ class DPTrainer:
         if self.enable_profiler:
             # https://www.tensorflow.org/guide/profiler
             tfv2.profiler.experimental.start(self.tensorboard_log_dir)
+        self.step_profiler = StepProfiler(
+            self.step_profiling,
+            self.step_profiling_file,
+            op_stats_freq=self.op_profiling_freq,
+            graph=self.sess.graph,
+        )
 
         train_time = 0
         total_train_time = 0.0
@@ -629,6 +682,17 @@ class DPTrainer:
             for fitting_key in self.fitting:
                 datasetloader[fitting_key] = DatasetLoader(train_data[fitting_key])
                 data_op[fitting_key] = datasetloader[fitting_key].build()
+        # the loaders have got a batch, so the data state is restored after them
+        if self.run_opt.init_mode == "restart":
+            self._restore_data_state(train_data, valid_data)
+        self._train_data_state = None
+        self._valid_data_state = None
+        # the number of atoms of the steps between displays
+        log_natoms = any(
+            data.natoms_budget is not None
+            for data in (train_data.values() if self.multi_task_mode else [train_data])
+        )
+        step_natoms = []
 
         while cur_batch < stop_batch:
             # first round validation:
@@ -704,18 +768,31 @@ class DPTrainer:
                         )
                 is_first_step = False
 
+            if log_natoms:
+                natoms = _get_batch_natoms(train_batch)
+                step_natoms.append(natoms)
+                log.debug("batch %7d atoms %d", cur_batch + 1, natoms)
+            if self._is_save_step(cur_batch + 1, stop_batch):
+                # the batch of the next step is got in this step, so the data
+                # state of the checkpoint is taken before it
+                self._set_data_state_hook(datasetloader, train_data)
             if self.timing_in_training:
                 tic = time.time()
-            train_feed_dict = self.get_feed_dict(train_batch, is_training=True)
+            with self.step_profiler.phase("feed"):
+                train_feed_dict = self.get_feed_dict(train_batch, is_training=True)
+            run_options, run_metadata = self.step_profiler.run_options(cur_batch)
+            if run_options is None:
+                run_options, run_metadata = prf_options, prf_run_metadata
             # use tensorboard to visualize the training of deepmd-kit
             # it will takes some extra execution time to generate the tensorboard data
+            run_tic = time.perf_counter()
             if self.tensorboard and (cur_batch % self.tensorboard_freq == 0):
                 summary, _, next_train_batch_list = run_sess(
                     self.sess,
                     [summary_merged_op, batch_train_op, next_train_batch_op],
                     feed_dict=train_feed_dict,
-                    options=prf_options,
-                    run_metadata=prf_run_metadata,
+                    options=run_options,
+                    run_metadata=run_metadata,
                 )
                 tb_train_writer.add_summary(summary, cur_batch)
             else:
@@ -723,51 +800,81 @@ class DPTrainer:
                     self.sess,
                     [batch_train_op, next_train_batch_op],
                     feed_dict=train_feed_dict,
-                    options=prf_options,
-                    run_metadata=prf_run_metadata,
+                    options=run_options,
+                    run_metadata=run_metadata,
+                )
+            # the next batch is loaded by the py_func within the session run,
+            # concurrently with the training step, so the data phase overlaps
+            # the run phase
+            run_time = time.perf_counter() - run_tic
+            data_time = sum(
+                loader.pop_batch_time()
+                for loader in (
+                    datasetloader.values() if self.multi_task_mode else [datasetloader]
                 )
+            )
+            self.step_profiler.add("data", data_time)
+            self.step_profiler.add("run", run_time)
+            if run_metadata is not None and run_metadata is not prf_run_metadata:
+                self.step_profiler.add_run_metadata(run_metadata)
             if self.timing_in_training:
                 toc = time.time()
             if self.timing_in_training:
                 train_time += toc - tic
+            self._set_data_state_hook(datasetloader, None)
             cur_batch = run_sess(self.sess, self.global_step)
             self.cur_batch = cur_batch
 
             # on-the-fly validation
             if self.display_in_training and (cur_batch % self.disp_freq == 0):
+                if step_natoms:
+                    log.info(
+                        "batch %7d atoms per step: mean %.1f, min %d, max %d",
+                        cur_batch,
+                        np.mean(step_natoms),
+                        np.min(step_natoms),
+                        np.max(step_natoms),
+                    )
+                    step_natoms = []
                 if self.timing_in_training:
                     tic = time.time()
-                if self.run_opt.is_chief:
-                    if not self.multi_task_mode:
-                        valid_batches = (
-                            [
-                                valid_data.get_batch()
-                                for ii in range(self.valid_numb_batch)
-                            ]
-                            if valid_data is not None
-                            else None
-                        )
-                        self.valid_on_the_fly(fp, [train_batch], valid_batches)
-                    else:
-                        train_batches = {}
-                        valid_batches = {}
-                        for fitting_key_ii in train_data:
-                            train_batches[fitting_key_ii] = [
-                                train_data[fitting_key_ii].get_batch()
-                            ]
-                            valid_batches[fitting_key_ii] = (
+                with self.step_profiler.phase("valid"):
+                    if self._is_save_step(cur_batch, stop_batch):
+                        self._valid_data_state = _get_data_state(valid_data)
+                    if self.run_opt.is_chief:
+                        if not self.multi_task_mode:
+                            valid_batches = (
                                 [
-                                    valid_data[fitting_key_ii].get_batch()
-                                    for ii in range(
-                                        self.valid_numb_batch_dict[fitting_key_ii]
-                                    )
+                                    valid_data.get_batch()
+                                    for ii in range(self.valid_numb_batch)
                                 ]
-                                if fitting_key_ii in valid_data
+                                if valid_data is not None
                                 else None
                             )
-                        self.valid_on_the_fly(
-                            fp, train_batches, valid_batches, fitting_key=fitting_key
-                        )
+                            self.valid_on_the_fly(fp, [train_batch], valid_batches)
+                        else:
+                            train_batches = {}
+                            valid_batches = {}
+                            for fitting_key_ii in train_data:
+                                train_batches[fitting_key_ii] = [
+                                    train_data[fitting_key_ii].get_batch()
+                                ]
+                                valid_batches[fitting_key_ii] = (
+                                    [
+                                        valid_data[fitting_key_ii].get_batch()
+                                        for ii in range(
+                                            self.valid_numb_batch_dict[fitting_key_ii]
+                                        )
+                                    ]
+                                    if fitting_key_ii in valid_data
+                                    else None
+                                )
+                            self.valid_on_the_fly(
+                                fp,
+                                train_batches,
+                                valid_batches,
+                                fitting_key=fitting_key,
+                            )
                 if self.timing_in_training:
                     toc = time.time()
                     test_time = toc - tic
@@ -781,18 +888,26 @@ class DPTrainer:
                         total_train_time += train_time
                     train_time = 0
                     wall_time_tic = toc
-                if (
-                    self.save_freq > 0
-                    and cur_batch % self.save_freq == 0
-                    and self.saver is not None
-                ):
-                    self.save_checkpoint(cur_batch)
-        if (
-            self.save_freq == 0 or cur_batch == 0 or cur_batch % self.save_freq != 0
-        ) and self.saver is not None:
-            self.save_checkpoint(cur_batch)
+                if self.save_freq > 0 and cur_batch % self.save_freq == 0:
+                    with self.step_profiler.phase("checkpoint"):
+                        data_state = self._gather_data_state(train_data, valid_data)
+                        if self.saver is not None:
+                            self.save_checkpoint(cur_batch, data_state)
+                if self.run_opt.is_chief:
+                    self.step_profiler.write(cur_batch, tb_train_writer)
+        if self.save_freq == 0 or cur_batch == 0 or cur_batch % self.save_freq != 0:
+            data_state = self._gather_data_state(train_data, valid_data)
+            if self.saver is not None:
+                self.save_checkpoint(cur_batch, data_state)
+        if self.valid_sess is not None:
+            # wait for the pending validation to be written
+            self._stop_valid_worker()
+        if self.ckpt_writer is not None:
+            # wait for the pending checkpoints to be written
+            self.ckpt_writer.close()
         if self.run_opt.is_chief:
             fp.close()
+            self.step_profiler.write(cur_batch, tb_train_writer)
         if self.timing_in_training and stop_batch // self.disp_freq > 0:
             if stop_batch >= 2 * self.disp_freq:
                 log.info(
@@ -807,6 +922,14 @@ class DPTrainer:
                     total_train_time / (stop_batch // self.disp_freq * self.disp_freq),
                 )
 
+        for data in train_data.values() if self.multi_task_mode else [train_data]:
+            padding_ratio = data.get_padding_ratio()
+            if padding_ratio is not None:
+                log.info(
+                    "padded atoms: %.1f%% of the atoms in the mixed batches",
+                    100.0 * padding_ratio,
+                )
+
         if self.profiling and self.run_opt.is_chief:
             fetched_timeline = timeline.Timeline(prf_run_metadata.step_stats)
             chrome_trace = fetched_timeline.generate_chrome_trace_format()
@@ -815,35 +938,172 @@ class DPTrainer:
         if self.enable_profiler and self.run_opt.is_chief:
             tfv2.profiler.experimental.stop()
 
-    def save_checkpoint(self, cur_batch: int):
-        try:
-            ckpt_prefix = self.saver.save(
-                self.sess,
-                os.path.join(os.getcwd(), self.save_ckpt),
-                global_step=cur_batch,
-            )
-        except google.protobuf.message.DecodeError as e:
-            raise GraphTooLargeError(
-                "The graph size exceeds 2 GB, the hard limitation of protobuf."
-                " Then a DecodeError was raised by protobuf. You should "
-                "reduce the size of your model."
-            ) from e
-        # make symlinks from prefix with step to that without step to break nothing
-        # get all checkpoint files
-        original_files = glob.glob(ckpt_prefix + ".*")
-        for ori_ff in original_files:
-            new_ff = self.save_ckpt + ori_ff[len(ckpt_prefix) :]
-            try:
-                # remove old one
-                os.remove(new_ff)
-            except OSError:
-                pass
-            if platform.system() != "Windows":
-                # by default one does not have access to create symlink on Windows
-                os.symlink(os.path.relpath(ori_ff, os.path.dirname(new_ff)), new_ff)
+    def benchmark(
+        self, train_data, numb_steps: int, numb_warmup: int = 10, numb_cache: int = 32
+    ) -> Dict[str, float]:
+        """Measure the training throughput with batches cached in the memory.
+
+        A few batches are drawn from the training data before timing and are
+        fed in turn, so that the throughput does not depend on the disk and the
+        data pipeline. No validation is performed and no checkpoint is saved.
+
+        Parameters
+        ----------
+        train_data : DeepmdDataSystem or dict of DeepmdDataSystem
+            the training data
+        numb_steps : int
+            the number of timed training steps
+        numb_warmup : int, default: 10
+            the number of training steps before timing
+        numb_cache : int, default: 32
+            the number of batches cached in the memory for each data system
+
+        Returns
+        -------
+        dict
+            steps per second, atoms per second and peak memory usage in bytes
+        """
+        # do not overwrite the learning curve of a previous training
+        self.disp_file = os.devnull
+        self._init_session()
+        if not self.multi_task_mode:
+            train_data = {None: train_data}
+            train_op = {None: self.train_op}
+            fitting_keys = [None]
+            fitting_prob = None
+        else:
+            train_op = self.train_op
+            fitting_keys = self.fitting_key_list
+            fitting_prob = np.array(self.fitting_prob)
+        cached_feed_dicts = {}
+        cached_natoms = {}
+        ncache = min(numb_cache, numb_steps + numb_warmup)
+        for kk in fitting_keys:
+            batches = [train_data[kk].get_batch() for _ in range(ncache)]
+            cached_feed_dicts[kk] = [
+                self.get_feed_dict(bb, is_training=True) for bb in batches
+            ]
+            cached_natoms[kk] = [
+                int(np.sum(bb["real_natoms_vec"][:, 0]))
+                if "real_natoms_vec" in bb
+                else int(bb["natoms_vec"][0] * bb["type"].shape[0])
+                for bb in batches
+            ]
+
+        natoms = 0
+        tic = None
+        for ii in range(numb_warmup + numb_steps):
+            if ii == numb_warmup:
+                natoms = 0
+                tic = time.perf_counter()
+            if fitting_prob is None:
+                kk = None
             else:
-                shutil.copyfile(ori_ff, new_ff)
-        log.info("saved checkpoint %s" % self.save_ckpt)
+                kk = fitting_keys[
+                    dp_random.choice(np.arange(len(fitting_keys)), p=fitting_prob)
+                ]
+            idx = ii % ncache
+            run_sess(self.sess, train_op[kk], feed_dict=cached_feed_dicts[kk][idx])
+            natoms += cached_natoms[kk][idx]
+        wall_time = time.perf_counter() - tic
+
+        results = {
+            "numb_steps": numb_steps,
+            "wall_time": wall_time,
+            "steps_per_second": numb_steps / wall_time,
+            "atoms_per_second": natoms / wall_time,
+            **_get_peak_memory(self.run_opt.my_device),
+        }
+        log.info(
+            "benchmark: %d steps in %.2f s, %.2f steps/s, %.2e atoms/s",
+            numb_steps,
+            wall_time,
+            results["steps_per_second"],
+            results["atoms_per_second"],
+        )
+        for kk, vv in results.items():
+            if kk.startswith("peak_memory") and vv is not None:
+                log.info("benchmark: %s %.1f MiB", kk, vv / 1024**2)
+        if self.ckpt_writer is not None:
+            self.ckpt_writer.close()
+        if self.valid_sess is not None:
+            self._stop_valid_worker()
+        return results
+
+    def save_checkpoint(self, cur_batch: int, data_state: Optional[dict] = None):
+        self.ckpt_writer.save(self.sess, cur_batch, data_state=data_state)
+
+    def _is_save_step(self, cur_batch: int, stop_batch: int) -> bool:
+        """Whether a checkpoint is saved after the step."""
+        return (
+            self.save_freq > 0 and cur_batch % self.save_freq == 0
+        ) or cur_batch == stop_batch
+
+    def _set_data_state_hook(self, datasetloader, train_data):
+        """Take the data state before the loaders get the next batch.
+
+        If `train_data` is None, the hook is removed.
+        """
+        hook = None
+        if train_data is not None:
+
+            def hook():
+                self._train_data_state = {
+                    "random": dp_random.get_state(),
+                    "train": _get_data_state(train_data),
+                }
+
+        loaders = datasetloader.values() if self.multi_task_mode else [datasetloader]
+        for loader in loaders:
+            loader.before_batch = hook
+
+    def _gather_data_state(self, train_data, valid_data) -> dict:
+        """Gather the data states of all the tasks for the checkpoint.
+
+        The states include the random state, the positions of iterators of the
+        training and validation data and the shuffled order of the loaded
+        sets, but not the data.
+        """
+        state = self._train_data_state
+        if state is None:
+            state = {
+                "random": dp_random.get_state(),
+                "train": _get_data_state(train_data),
+            }
+        state["valid"] = (
+            self._valid_data_state
+            if self._valid_data_state is not None
+            else _get_data_state(valid_data)
+        )
+        self._train_data_state = None
+        self._valid_data_state = None
+        with distributed_stat(self.run_opt._HVD):
+            states = allgather(state, "data_state")
+        return {"ranks": states}
+
+    def _restore_data_state(self, train_data, valid_data):
+        """Restore the data state saved with the checkpoint of restart."""
+        path = self.run_opt.restart + DATA_STATE_SUFFIX
+        if not os.path.isfile(path):
+            log.info("no data state is saved with %s" % self.run_opt.restart)
+            return
+        states = load_data_state(path)["ranks"]
+        if len(states) != self.run_opt.world_size:
+            log.warning(
+                "the data state is saved by %d tasks, but %d tasks are running, "
+                "so the data state is not restored"
+                % (len(states), self.run_opt.world_size)
+            )
+            return
+        state = states[self.run_opt.my_rank]
+        try:
+            _set_data_state(train_data, state["train"])
+            _set_data_state(valid_data, state.get("valid"))
+        except (KeyError, ValueError) as e:
+            log.warning("the data state mismatches the data: %s" % e)
+            return
+        dp_random.set_state(tuple(state["random"]))
+        log.info("restored the data state from %s" % path)
 
     def get_feed_dict(self, batch, is_training):
         feed_dict = {}
@@ -876,10 +1136,8 @@ class DPTrainer:
     def valid_on_the_fly(
         self, fp, train_batches, valid_batches, print_header=False, fitting_key=None
     ):
-        train_results = self.get_evaluation_results(train_batches)
-        valid_results = self.get_evaluation_results(valid_batches)
-
         cur_batch = self.cur_batch
+        current_lr_dict = None
         if not self.multi_task_mode:
             current_lr = run_sess(self.sess, self.learning_rate)
         else:
@@ -893,30 +1151,77 @@ class DPTrainer:
                 current_lr_dict[fitting_key_ii] = run_sess(
                     self.sess, self.learning_rate_dict[fitting_key_ii]
                 )
+        args = (
+            fp,
+            train_batches,
+            valid_batches,
+            cur_batch,
+            current_lr,
+            current_lr_dict,
+            print_header,
+        )
+        if self.valid_sess is not None:
+            self._check_valid_error()
+            # only the snapshot of variables blocks the training
+            values = run_sess(self.sess, self._valid_var_list)
+            self._valid_queue.put((values, args))
+        else:
+            self._eval_and_print(self.sess, *args)
+
+    def _eval_and_print(
+        self,
+        sess,
+        fp,
+        train_batches,
+        valid_batches,
+        cur_batch,
+        current_lr,
+        current_lr_dict,
+        print_header,
+    ):
+        train_results = self.get_evaluation_results(train_batches, sess=sess)
+        valid_results = self.get_evaluation_results(valid_batches, sess=sess)
         if print_header:
             self.print_header(fp, train_results, valid_results, self.multi_task_mode)
-        if not self.multi_task_mode:
-            self.print_on_training(
-                fp,
-                train_results,
-                valid_results,
-                cur_batch,
-                current_lr,
-                self.multi_task_mode,
-            )
-        else:
-            assert (
-                fitting_key is not None
-            ), "Fitting key must be assigned when printing learning rate!"
-            self.print_on_training(
-                fp,
-                train_results,
-                valid_results,
-                cur_batch,
-                current_lr,
-                self.multi_task_mode,
-                current_lr_dict,
-            )
+        self.print_on_training(
+            fp,
+            train_results,
+            valid_results,
+            cur_batch,
+            current_lr,
+            self.multi_task_mode,
+            current_lr_dict,
+        )
+
+    def _valid_worker(self):
+        while True:
+            job = self._valid_queue.get()
+            if job is None:
+                break
+            values, args = job
+            try:
+                run_sess(
+                    self.valid_sess,
+                    self._valid_load_op,
+                    feed_dict=dict(zip(self._valid_var_values, values)),
+                )
+                self._eval_and_print(self.valid_sess, *args)
+            except Exception as e:
+                log.exception("Failed to validate at step %d", args[3])
+                self._valid_error = e
+
+    def _check_valid_error(self):
+        if self._valid_error is not None:
+            error = self._valid_error
+            self._valid_error = None
+            raise RuntimeError("Failed to validate on the fly") from error
+
+    def _stop_valid_worker(self):
+        self._valid_queue.put(None)
+        self._valid_thread.join()
+        self.valid_sess.close()
+        self.valid_sess = None
+        self._check_valid_error()
 
     @staticmethod
     def print_header(fp, train_results, valid_results, multi_task_mode=False):
@@ -988,23 +1293,58 @@ class DPTrainer:
         fp.flush()
 
     @staticmethod
-    def eval_single_list(single_batch_list, loss, sess, get_feed_dict_func, prefix=""):
+    def eval_single_list(
+        single_batch_list,
+        loss,
+        sess,
+        get_feed_dict_func,
+        prefix="",
+        merge_batches=False,
+    ):
+        """Evaluate the loss on a list of batches and average it over atoms.
+
+        Parameters
+        ----------
+        single_batch_list : list of dict
+            the batches to evaluate
+        loss : Loss
+            the loss
+        sess : tf.Session
+            the session
+        get_feed_dict_func : callable
+            the function to convert a batch to the feed dict
+        prefix : str, default: ""
+            the prefix of the keys of the results
+        merge_batches : bool, default: False
+            concatenate the batches of the same system, so that they are
+            evaluated in a single session run
+
+        Returns
+        -------
+        dict or None
+            the averaged results
+        """
         if single_batch_list is None:
             return None
-        numb_batch = len(single_batch_list)
+        if merge_batches:
+            merged_batch_list = merge_batch_list(single_batch_list)
+        else:
+            merged_batch_list = [(batch, 1) for batch in single_batch_list]
         sum_results = {}  # sum of losses on all atoms
         sum_natoms = 0
-        for i in range(numb_batch):
-            batch = single_batch_list[i]
+        for batch, numb_merged in merged_batch_list:
             natoms = batch["natoms_vec"]
             feed_dict = get_feed_dict_func(batch, is_training=False)
             results = loss.eval(sess, feed_dict, natoms)
 
+            # a merged batch has the same weight as the batches it replaces
             for k, v in results.items():
                 if k == "natoms":
-                    sum_natoms += v
+                    sum_natoms += v * numb_merged
                 else:
-                    sum_results[k] = sum_results.get(k, 0.0) + v * results["natoms"]
+                    sum_results[k] = (
+                        sum_results.get(k, 0.0) + v * results["natoms"] * numb_merged
+                    )
         single_results = {
             prefix + k: v / sum_natoms
             for k, v in sum_results.items()
@@ -1012,10 +1352,16 @@ class DPTrainer:
         }
         return single_results
 
-    def get_evaluation_results(self, batch_list):
+    def get_evaluation_results(self, batch_list, sess=None):
+        if sess is None:
+            sess = self.sess
         if not self.multi_task_mode:
             avg_results = self.eval_single_list(
-                batch_list, self.loss, self.sess, self.get_feed_dict
+                batch_list,
+                self.loss,
+                sess,
+                self.get_feed_dict,
+                merge_batches=self.valid_merge_batches,
             )
         else:
             avg_results = {}
@@ -1023,9 +1369,10 @@ class DPTrainer:
                 avg_results[fitting_key] = self.eval_single_list(
                     batch_list[fitting_key],
                     self.loss_dict[fitting_key],
-                    self.sess,
+                    sess,
                     self.get_feed_dict,
                     prefix=f"{fitting_key}_",
+                    merge_batches=self.valid_merge_batches,
                 )
         return avg_results
 
@@ -1151,6 +1498,111 @@ class DPTrainer:
         )
 
 
+def _get_peak_memory(device: str) -> Dict[str, Optional[int]]:
+    """Get the peak memory usage of the host and the device, in bytes.
+
+    Parameters
+    ----------
+    device : str
+        the device used for training, e.g. "cpu:0" or "gpu:1"
+
+    Returns
+    -------
+    dict
+        the peak memory usage; None if it is not available
+    """
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        peak_host = None
+    else:
+        # in KiB on Linux, but in bytes on macOS
+        peak_host = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if platform.system() != "Darwin":
+            peak_host *= 1024
+    peak_device = None
+    device_type, device_idx = device.split(":", 1)
+    if device_type == "gpu":
+        try:
+            peak_device = tfv2.config.experimental.get_memory_info(f"GPU:{device_idx}")[
+                "peak"
+            ]
+        except (ValueError, AttributeError):
+            pass
+    return {"peak_memory_host": peak_host, "peak_memory_device": peak_device}
+
+
+def _get_batch_natoms(batch: dict) -> int:
+    """Get the number of real atoms in a batch."""
+    if "real_natoms_vec" in batch:
+        return int(np.sum(batch["real_natoms_vec"][:, 0]))
+    return int(batch["natoms_vec"][0]) * batch["coord"].shape[0]
+
+
+def _get_data_state(data):
+    """Get the state of a data system or a dict of data systems."""
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        return {kk: vv.get_state() for kk, vv in data.items()}
+    return data.get_state()
+
+
+def _set_data_state(data, state):
+    """Restore the state of a data system or a dict of data systems."""
+    if data is None or state is None:
+        return
+    if isinstance(data, dict):
+        for kk, vv in data.items():
+            vv.set_state(state[kk])
+    else:
+        data.set_state(state)
+
+
+def merge_batch_list(batch_list: List[dict]) -> List[tuple]:
+    """Concatenate the batches sharing the same system along the frame axis.
+
+    Batches are considered to be from the same system if they have the same
+    keys, `natoms_vec`, `default_mesh`, `find_*` flags and shapes of
+    per-frame data.
+
+    Parameters
+    ----------
+    batch_list : list of dict
+        the batches returned by `DeepmdDataSystem.get_batch`
+
+    Returns
+    -------
+    list of tuple
+        the merged batches and the number of batches merged into each of them
+    """
+    groups = {}
+    for batch in batch_list:
+        frame_keys = [
+            kk
+            for kk in sorted(batch.keys())
+            if kk not in ("natoms_vec", "default_mesh") and not kk.startswith("find_")
+        ]
+        layout = (
+            tuple(np.ravel(batch["natoms_vec"])),
+            tuple(np.ravel(batch["default_mesh"])),
+            tuple(
+                (kk, float(batch[kk])) for kk in sorted(batch) if kk.startswith("find_")
+            ),
+            tuple((kk, np.shape(batch[kk])[1:]) for kk in frame_keys),
+        )
+        groups.setdefault(layout, (frame_keys, []))[1].append(batch)
+    merged_list = []
+    for frame_keys, batches in groups.values():
+        merged = dict(batches[0])
+        if len(batches) > 1:
+            for kk in frame_keys:
+                merged[kk] = np.concatenate([bb[kk] for bb in batches], axis=0)
+        merged_list.append((merged, len(batches)))
+    return merged_list
+
+
 class DatasetLoader:
     """Generate an OP that loads the training data from the given DeepmdDataSystem.
 
@@ -1173,6 +1625,10 @@ class DatasetLoader:
 
     def __init__(self, train_data: DeepmdDataSystem):
         self.train_data = train_data
+        # called before getting the next batch
+        self.before_batch = None
+        # the time spent in getting the batches since the last pop_batch_time
+        self.batch_time = 0.0
         # get the keys of the data
         batch_data = self.train_data.get_batch()
         self.data_keys = batch_data.keys()
@@ -1189,13 +1645,23 @@ class DatasetLoader:
         train_data = self.train_data
 
         def get_train_batch() -> List[np.ndarray]:
+            if self.before_batch is not None:
+                self.before_batch()
+            tic = time.perf_counter()
             batch_data = train_data.get_batch()
+            self.batch_time += time.perf_counter() - tic
             # convert dict to list of arryas
             batch_data = tuple([batch_data[kk] for kk in self.data_keys])
             return batch_data
 
         return tf.py_func(get_train_batch, [], self.data_types, name="train_data")
 
+    def pop_batch_time(self) -> float:
+        """Get and reset the time spent in getting the batches, in seconds."""
+        batch_time = self.batch_time
+        self.batch_time = 0.0
+        return batch_time
+
     def get_data_dict(self, batch_list: List[np.ndarray]) -> Dict[str, np.ndarray]:
         """Generate a dict of the loaded data.
 
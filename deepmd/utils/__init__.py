@@ -1,20 +1,42 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
-#
-from .data import (
-    DeepmdData,
+from typing import (
+    TYPE_CHECKING,
 )
-from .data_system import (
-    DeepmdDataSystem,
-)
-from .learning_rate import (
-    LearningRateExp,
-)
-from .pair_tab import (
-    PairTab,
+
+from .lazy import (
+    lazy_import,
 )
-from .plugin import (
-    Plugin,
-    PluginVariant,
+
+if TYPE_CHECKING:
+    from .data import (
+        DeepmdData,
+    )
+    from .data_system import (
+        DeepmdDataSystem,
+    )
+    from .learning_rate import (
+        LearningRateExp,
+    )
+    from .pair_tab import (
+        PairTab,
+    )
+    from .plugin import (
+        Plugin,
+        PluginVariant,
+    )
+
+# classes are imported on first access, as most of them depend on TensorFlow
+__getattr__, __dir__ = lazy_import(
+    __name__,
+    submodules=["network"],
+    attrs={
+        "DeepmdData": ".data",
+        "DeepmdDataSystem": ".data_system",
+        "LearningRateExp": ".learning_rate",
+        "PairTab": ".pair_tab",
+        "Plugin": ".plugin",
+        "PluginVariant": ".plugin",
+    },
 )
 
 __all__ = [
@@ -781,6 +781,8 @@ def modifier_dipole_charge():
     doc_sys_charge_map = f"The charge of real atoms. The list length should be the same as the {make_link('type_map', 'model/type_map')}"
     doc_ewald_h = "The grid spacing of the FFT grid. Unit is A"
     doc_ewald_beta = f"The splitting parameter of Ewald sum. Unit is A^{-1}"
+    doc_fused = "Evaluate the dipole model, the reciprocal part of the Ewald sum and the force and virial correction in one session run when modifying the training data."
+    doc_cache_dir = "The directory to cache the modifications of the training data. The modifications are keyed by the hash of the DW model, the charge maps, the Ewald parameters and the frames, and are reused when the same set is loaded again, e.g. when the sets are rotated or the training is restarted. If not set, the modifications are recomputed each time."
 
     return [
         Argument("model_name", str, optional=False, doc=doc_model_name),
@@ -790,6 +792,8 @@ def modifier_dipole_charge():
         Argument("sys_charge_map", List[float], optional=False, doc=doc_sys_charge_map),
         Argument("ewald_beta", float, optional=True, default=0.4, doc=doc_ewald_beta),
         Argument("ewald_h", float, optional=True, default=1.0, doc=doc_ewald_h),
+        Argument("fused", bool, optional=True, default=False, doc=doc_fused),
+        Argument("cache_dir", str, optional=True, default=None, doc=doc_cache_dir),
     ]
 
 
@@ -1490,6 +1494,7 @@ def training_data_args():  # ! added by Ziyao: new specification style for data
 - string "auto": automatically determines the batch size so that the batch_size times the number of atoms in the system is no less than 32.\n\n\
 - string "auto:N": automatically determines the batch size so that the batch_size times the number of atoms in the system is no less than N.\n\n\
 - string "mixed:N": the batch data will be sampled from all systems and merged into a mixed system with the batch size N. Only support the se_atten descriptor.\n\n\
+- string "budget:N": every batch has about N atoms. The batch size of a system is N divided by the number of atoms in the system, rounded to the nearest integer. If a set of the system has fewer frames than the batch size, the batch is filled by the systems having the same number of atoms of each type.\n\n\
 If MPI is used, the value should be considered as the batch size per task.'
     doc_auto_prob_style = 'Determine the probability of systems automatically. The method is assigned by this key and can be\n\n\
 - "prob_uniform"  : the probability all the systems are equal, namely 1.0/self.get_nsystems()\n\n\
@@ -1500,6 +1505,32 @@ If MPI is used, the value should be considered as the batch size per task.'
         "Should be of the same length as `systems`, "
         "specifying the probability of each system."
     )
+    doc_shard = (
+        "In parallel training, partition the sets of the systems across the tasks, so that each task only loads its shard. "
+        "The shards have balanced probabilities, and each task samples from its shard with the probabilities of the systems normalized in the shard. "
+        "The type_map of the model should be set. "
+        "The validation data are only loaded by the chief task."
+    )
+    doc_sampler = (
+        "How the systems are sampled to get the batches.\n\n"
+        "- `random`: the system of each batch is drawn with replacement by the probabilities of the systems.\n\n"
+        "- `epoch`: the batches of an epoch are drawn without replacement. "
+        "An epoch has as many batches as the training data, which are shared by the systems in proportion to their probabilities and shuffled at the beginning of the epoch. "
+        "With mixed batches (`batch_size` is `mixed:N`), the frames are drawn in this way. "
+        "The position in the epoch is saved with the checkpoints and resumed by `dp train --restart`."
+    )
+
+    doc_bucket_natoms = (
+        "Only for mixed batches (`batch_size` is `mixed:N`). "
+        "Group the systems into buckets by the number of atoms, and draw the frames of each batch from one bucket, "
+        "so that fewer atoms are padded to the largest system of the batch. "
+        "An int gives the number of buckets, split at the quantiles of the number of atoms weighted by the probabilities of the systems. "
+        "A list of int gives the largest number of atoms of each bucket, and the systems with more atoms form the last bucket. "
+        "The batch size of a bucket is N times the average number of atoms of the systems divided by the largest number of atoms in the bucket, "
+        "so the batches have about the same number of atoms including the padding, "
+        "and the frames of each system are still drawn in proportion to its probability. "
+        "The ratio of the padded atoms is printed at the end of the training."
+    )
 
     args = [
         Argument(
@@ -1531,6 +1562,15 @@ If MPI is used, the value should be considered as the batch size per task.'
             doc=doc_sys_probs,
             alias=["sys_weights"],
         ),
+        Argument("shard", bool, optional=True, default=False, doc=doc_shard),
+        Argument("sampler", str, optional=True, default="random", doc=doc_sampler),
+        Argument(
+            "bucket_natoms",
+            [int, List[int], None],
+            optional=True,
+            default=None,
+            doc=doc_bucket_natoms,
+        ),
     ]
 
     doc_training_data = "Configurations of training data."
@@ -1660,11 +1700,43 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
     doc_disp_freq = "The frequency of printing learning curve."
     doc_save_freq = "The frequency of saving check point."
     doc_save_ckpt = "The path prefix of saving check point files."
+    doc_max_ckpt_keep = (
+        "The maximum number of the most recent check points to keep. "
+        "Older check points are removed after a new one is saved. "
+        "If it is not positive, all check points are kept."
+    )
+    doc_keep_ckpt_freq = (
+        "Check points whose training step is a multiple of this frequency are always kept, "
+        "in addition to the most recent ones. 0 means no check point is additionally kept."
+    )
+    doc_save_async = (
+        "Write check points in a background thread. The training is only paused to copy the variables "
+        "to the host memory, and the files are written while training continues."
+    )
     doc_disp_training = "Displaying verbose information during training."
+    doc_valid_merge_batches = (
+        "Concatenate the validation batches from the same system, so that they are evaluated in a single run. "
+        "The errors are then computed over all frames of the concatenated batches."
+    )
+    doc_valid_async = (
+        "Run the on-the-fly validation in a background thread with its own session, "
+        "on a snapshot of the variables, so that it does not block the training."
+    )
     doc_time_training = "Timing durining training."
     doc_profiling = "Profiling during training."
     doc_profiling_file = "Output file for profiling."
     doc_enable_profiler = "Enable TensorFlow Profiler (available in TensorFlow 2.3) to analyze performance. The log will be saved to `tensorboard_log_dir`."
+    doc_step_profiling = (
+        "Record the time spent in each phase of the training steps (data, feed, run, valid and checkpoint). "
+        "The mean, p50, p95 and p99 of each phase are written to `step_profiling_file` every `disp_freq` steps, "
+        "and to TensorBoard if `tensorboard` is enabled."
+    )
+    doc_step_profiling_file = "Output JSON file for the step profiling."
+    doc_op_profiling_freq = (
+        "The frequency of tracing a training step when `step_profiling` is enabled. "
+        "The time of traced ops is aggregated by op types and written to `step_profiling_file`. "
+        "0 means no step is traced."
+    )
     doc_tensorboard = "Enable tensorboard"
     doc_tensorboard_log_dir = "The log directory of tensorboard outputs"
     doc_tensorboard_freq = "The frequency of writing tensorboard events."
@@ -1680,6 +1752,15 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
         "Weights will be normalized and minus ones will be ignored. "
         "If not set, each fitting net will be equally selected when training."
     )
+    doc_data_prec = (
+        "The precision of the training and validation data stored in memory.\n\n"
+        "- `auto`: float32 if `mixed_precision` is set or the `precision` of all the networks in the model is float32 or lower, otherwise `default`.\n\n"
+        "- `default`: the precision of the interface, i.e. float64 unless `DP_INTERFACE_PREC` is `low`.\n\n"
+        "- `float32`, `float64`: the given precision.\n\n"
+        "The energies and the other per-frame sums of atomic labels are always stored in float64. "
+        "Storing coordinates and forces in float32 halves the memory of the data, "
+        "with a resolution of about 1e-5 Angstrom for coordinates up to 100 Angstrom."
+    )
 
     arg_training_data = training_data_args()
     arg_validation_data = validation_data_args()
@@ -1701,9 +1782,24 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
         Argument(
             "save_ckpt", str, optional=True, default="model.ckpt", doc=doc_save_ckpt
         ),
+        Argument("max_ckpt_keep", int, optional=True, default=5, doc=doc_max_ckpt_keep),
+        Argument(
+            "keep_ckpt_freq", int, optional=True, default=0, doc=doc_keep_ckpt_freq
+        ),
+        Argument("save_async", bool, optional=True, default=False, doc=doc_save_async),
         Argument(
             "disp_training", bool, optional=True, default=True, doc=doc_disp_training
         ),
+        Argument(
+            "valid_merge_batches",
+            bool,
+            optional=True,
+            default=False,
+            doc=doc_valid_merge_batches,
+        ),
+        Argument(
+            "valid_async", bool, optional=True, default=False, doc=doc_valid_async
+        ),
         Argument(
             "time_training", bool, optional=True, default=True, doc=doc_time_training
         ),
@@ -1722,6 +1818,23 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
             default=False,
             doc=doc_enable_profiler,
         ),
+        Argument(
+            "step_profiling", bool, optional=True, default=False, doc=doc_step_profiling
+        ),
+        Argument(
+            "step_profiling_file",
+            str,
+            optional=True,
+            default="step_profile.json",
+            doc=doc_step_profiling_file,
+        ),
+        Argument(
+            "op_profiling_freq",
+            int,
+            optional=True,
+            default=0,
+            doc=doc_op_profiling_freq,
+        ),
         Argument(
             "tensorboard", bool, optional=True, default=False, doc=doc_tensorboard
         ),
@@ -1737,6 +1850,7 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
         ),
         Argument("data_dict", dict, optional=True, doc=doc_data_dict),
         Argument("fitting_weight", dict, optional=True, doc=doc_fitting_weight),
+        Argument("data_prec", str, optional=True, default="auto", doc=doc_data_prec),
     ]
 
     doc_training = "The training options."
@@ -162,6 +162,13 @@ class AutoBatchSize:
             Variable length argument list.
         **kwargs
             If 2D np.ndarray, assume the first axis is batch; otherwise do nothing.
+
+        Returns
+        -------
+        tuple of np.ndarray or np.ndarray
+            The results of all batches, concatenated along the first axis.
+            The outputs are allocated after the first batch is executed and
+            each batch is written into them in place.
         """
 
         def execute_with_batch_size(
@@ -189,18 +196,29 @@ class AutoBatchSize:
             )
 
         index = 0
-        results = []
+        results = None
         while index < total_size:
             n_batch, result = self.execute(execute_with_batch_size, index, natoms)
+            if not n_batch:
+                continue
             if not isinstance(result, tuple):
                 result = (result,)
+            if results is None:
+                # preallocate the outputs once the shapes are known, so that
+                # the batches are not held twice in memory for concatenation
+                results = tuple(
+                    np.empty(
+                        (total_size * (rr.shape[0] // n_batch), *rr.shape[1:]),
+                        dtype=rr.dtype,
+                    )
+                    for rr in result
+                )
+            for rr, oo in zip(result, results):
+                nrows = rr.shape[0] // n_batch
+                oo[index * nrows : (index + n_batch) * nrows] = rr
             index += n_batch
-            if n_batch:
-                for rr in result:
-                    rr.reshape((n_batch, -1))
-                results.append(result)
 
-        r = tuple([np.concatenate(r, axis=0) for r in zip(*results)])
+        r = () if results is None else results
         if len(r) == 1:
             # avoid returning tuple if callable doesn't return tuple
             r = r[0]
@@ -3,6 +3,8 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 import logging
 from typing import (
+    Any,
+    Dict,
     List,
     Optional,
 )
@@ -45,6 +47,14 @@ class DeepmdData:
     sort_atoms : bool
             Sort atoms by atom types. Required to enable when the data is directly feeded to
             descriptors except mixed types.
+    sets
+            The names of the sets to be loaded, e.g. a shard of the sets in parallel training.
+            If None, all the sets matching `set_prefix` are loaded.
+    data_prec : np.dtype, optional
+            The precision of the data items stored in memory, except those loaded in high
+            precision and those with their own dtype. If None, `GLOBAL_NP_FLOAT_PRECISION`.
+            Set float32 to halve the memory of coordinates and forces when the model runs
+            in float32.
     """
 
     def __init__(
@@ -57,10 +67,18 @@ class DeepmdData:
         modifier=None,
         trn_all_set: bool = False,
         sort_atoms: bool = True,
+        sets: Optional[List[str]] = None,
+        data_prec: Optional[np.dtype] = None,
     ):
         """Constructor."""
         root = DPPath(sys_path)
-        self.dirs = root.glob(set_prefix + ".*")
+        if data_prec is None:
+            data_prec = GLOBAL_NP_FLOAT_PRECISION
+        self.data_prec = data_prec
+        if sets is not None:
+            self.dirs = [root / ss for ss in sets]
+        else:
+            self.dirs = root.glob(set_prefix + ".*")
         if not len(self.dirs):
             raise FileNotFoundError(f"No {set_prefix}.* is found in {sys_path}")
         self.dirs.sort()
@@ -126,6 +144,8 @@ class DeepmdData:
         # set counters
         self.set_count = 0
         self.iterator = 0
+        # the frames of the loaded set in the shuffled batch set
+        self.batch_idx = None
         self.shuffle_test = shuffle_test
         # set modifier
         self.modifier = modifier
@@ -158,7 +178,7 @@ class DeepmdData:
             The data file `sys_path/set.*/key.npy` must exist.
             If must is False and the data file does not exist, the `data_dict[find_key]` is set to 0.0
         high_prec
-            Load the data and store in float64, otherwise in float32
+            Load the data and store in `GLOBAL_ENER_FLOAT_PRECISION`, otherwise in `data_prec`
         type_sel
             Select certain type of atoms
         repeat
@@ -213,6 +233,23 @@ class DeepmdData:
         """Get the `data_dict`."""
         return self.data_dict
 
+    def load_set(self, set_name: DPPath) -> dict:
+        """Load all the frames of a set in the order of the file.
+
+        The frames are neither shuffled nor modified by the data modifier.
+
+        Parameters
+        ----------
+        set_name : DPPath
+            the path to the set, e.g. one of `dirs`
+
+        Returns
+        -------
+        dict
+            the loaded data items of the set
+        """
+        return self._load_set(set_name)
+
     def check_batch_size(self, batch_size):
         """Check if the system can get a batch of data with `batch_size` frames."""
         for ii in self.train_dirs:
@@ -221,7 +258,7 @@ class DeepmdData:
                     (ii / "coord.npy").load_numpy().astype(GLOBAL_ENER_FLOAT_PRECISION)
                 )
             else:
-                tmpe = (ii / "coord.npy").load_numpy().astype(GLOBAL_NP_FLOAT_PRECISION)
+                tmpe = (ii / "coord.npy").load_numpy().astype(self.data_prec)
             if tmpe.ndim == 1:
                 tmpe = tmpe.reshape([1, -1])
             if tmpe.shape[0] < batch_size:
@@ -237,11 +274,7 @@ class DeepmdData:
                 .astype(GLOBAL_ENER_FLOAT_PRECISION)
             )
         else:
-            tmpe = (
-                (self.test_dir / "coord.npy")
-                .load_numpy()
-                .astype(GLOBAL_NP_FLOAT_PRECISION)
-            )
+            tmpe = (self.test_dir / "coord.npy").load_numpy().astype(self.data_prec)
         if tmpe.ndim == 1:
             tmpe = tmpe.reshape([1, -1])
         if tmpe.shape[0] < test_size:
@@ -294,8 +327,6 @@ class DeepmdData:
             # print('ntest', self.test_set['type'].shape[0], ntests, ntests_)
             idx = np.arange(ntests_)
         ret = self._get_subdata(self.test_set, idx=idx)
-        if self.modifier is not None:
-            self.modifier.modify_data(ret, self)
         return ret
 
     def get_ntypes(self) -> int:
@@ -332,6 +363,24 @@ class DeepmdData:
             ret += self.get_numb_batch(batch_size, ii)
         return ret
 
+    def get_epoch_numb_batch(self, batch_size: int) -> int:
+        """Get the number of batches to pass each frame in the data system once,
+        counting the copies of frames given by `numb_copy`.
+
+        Only the headers of the coordinate files are read, unless the numbers
+        of copies are given.
+        """
+        ret = 0
+        for set_name in self.train_dirs:
+            path = set_name / "numb_copy.npy"
+            if path.is_file():
+                ncopies = int(np.sum(path.load_numpy()))
+            else:
+                shape = (set_name / "coord.npy").get_numpy_shape()
+                ncopies = 1 if len(shape) == 1 else shape[0]
+            ret += max(ncopies // batch_size, 1)
+        return ret
+
     def get_natoms(self):
         """Get number of atoms."""
         return len(self.atom_type)
@@ -410,14 +459,57 @@ class DeepmdData:
             self.batch_set = self._load_set(set_name)
             if self.modifier is not None:
                 self.modifier.modify_data(self.batch_set, self)
-        self.batch_set, _ = self._shuffle_data(self.batch_set)
+            self.batch_idx = None
+        self.batch_set, idx = self._shuffle_data(self.batch_set)
+        self.batch_idx = idx if self.batch_idx is None else self.batch_idx[idx]
         self.reset_get_batch()
 
     def reset_get_batch(self):
         self.iterator = 0
 
+    def get_state(self) -> Dict[str, Any]:
+        """Get the position of :meth:`get_batch`.
+
+        The data are not included. The loaded set is given by the index of the
+        frames in the shuffled set.
+
+        Returns
+        -------
+        dict
+            the state of the training set
+        """
+        state = {"set_count": self.set_count, "iterator": self.iterator}
+        if hasattr(self, "batch_set"):
+            state["batch_idx"] = self.batch_idx
+        return state
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restore the position of :meth:`get_batch`, reloading the set in use.
+
+        Parameters
+        ----------
+        state : dict
+            the state returned by :meth:`get_state`
+        """
+        self.set_count = int(state["set_count"])
+        if "batch_idx" in state:
+            set_name = self.train_dirs[(self.set_count - 1) % self.get_numb_set()]
+            data = self._load_set(set_name)
+            if self.modifier is not None:
+                self.modifier.modify_data(data, self)
+            self.batch_idx = np.asarray(state["batch_idx"])
+            self.batch_set = self._take_frames(data, self.batch_idx)
+        elif hasattr(self, "batch_set"):
+            del self.batch_set
+            self.batch_idx = None
+        self.iterator = int(state["iterator"])
+
     def _load_test_set(self, set_name: DPPath, shuffle_test):
         self.test_set = self._load_set(set_name)
+        if self.modifier is not None:
+            # modify the whole set once, so that the test data are not
+            # modified again each time they are got
+            self.modifier.modify_data(self.test_set, self)
         if shuffle_test:
             self.test_set, _ = self._shuffle_data(self.test_set)
 
@@ -428,6 +520,11 @@ class DeepmdData:
         # the training times of each frame
         idx = np.repeat(idx, np.reshape(data["numb_copy"], (nframes,)))
         dp_random.shuffle(idx)
+        return self._take_frames(data, idx), idx
+
+    def _take_frames(self, data, idx):
+        ret = {}
+        nframes = data["coord"].shape[0]
         for kk in data:
             if (
                 type(data[kk]) == np.ndarray
@@ -438,7 +535,7 @@ class DeepmdData:
                 ret[kk] = data[kk][idx]
             else:
                 ret[kk] = data[kk]
-        return ret, idx
+        return ret
 
     def _load_set(self, set_name: DPPath):
         # get nframes
@@ -448,7 +545,7 @@ class DeepmdData:
         if self.data_dict["coord"]["high_prec"]:
             coord = path.load_numpy().astype(GLOBAL_ENER_FLOAT_PRECISION)
         else:
-            coord = path.load_numpy().astype(GLOBAL_NP_FLOAT_PRECISION)
+            coord = path.load_numpy().astype(self.data_prec)
         if coord.ndim == 1:
             coord = coord.reshape([1, -1])
         nframes = coord.shape[0]
@@ -553,7 +650,7 @@ class DeepmdData:
         elif high_prec:
             dtype = GLOBAL_ENER_FLOAT_PRECISION
         else:
-            dtype = GLOBAL_NP_FLOAT_PRECISION
+            dtype = self.data_prec
         path = set_name / (key + ".npy")
         if path.is_file():
             data = path.load_numpy().astype(dtype)
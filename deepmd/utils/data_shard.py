@@ -0,0 +1,218 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Partition data systems across the ranks of parallel training."""
+
+import heapq
+import logging
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from deepmd.utils.data_system import (
+    get_sys_probs,
+)
+from deepmd.utils.path import (
+    DPPath,
+)
+
+__all__ = ["get_sys_set_nframes", "partition_systems", "shard_systems"]
+
+log = logging.getLogger(__name__)
+
+
+def get_sys_set_nframes(sys_path: str, set_prefix: str = "set") -> Dict[str, int]:
+    """Get the number of frames in each set of a system.
+
+    Only the headers of the coordinate files are read.
+
+    Parameters
+    ----------
+    sys_path : str
+        path to the system
+    set_prefix : str, default: "set"
+        prefix of the sets
+
+    Returns
+    -------
+    Dict[str, int]
+        the number of frames in each set, sorted by the name of sets
+    """
+    root = DPPath(sys_path)
+    nframes = {}
+    for set_path in sorted(root.glob(set_prefix + ".*")):
+        shape = (set_path / "coord.npy").get_numpy_shape()
+        name = str(set_path).rstrip("/").split("/")[-1]
+        nframes[name] = 1 if len(shape) == 1 else shape[0]
+    return nframes
+
+
+def partition_systems(
+    masses: List[List[float]], size: int
+) -> Optional[List[List[Tuple[int, List[int]]]]]:
+    """Partition the sets of systems into shards with balanced masses.
+
+    A system whose mass is larger than the average mass of shards is split
+    into chunks of consecutive sets. The systems and chunks are then assigned
+    to the lightest shard in the descending order of their masses. Sets with
+    zero mass are never sampled and are not assigned.
+
+    Parameters
+    ----------
+    masses : list of list of float
+        the mass, e.g. the sampling probability, of each set in each system
+    size : int
+        the number of shards
+
+    Returns
+    -------
+    list of list of tuple, optional
+        for each shard, a list of the index of a system and the indexes of
+        its sets in the shard, or None if there are fewer non-empty chunks than
+        shards
+    """
+    target = sum(sum(mm) for mm in masses) / size
+    # (negative mass, system index, set indexes)
+    chunks = []
+    for ii, sys_masses in enumerate(masses):
+        chunk, chunk_mass = [], 0.0
+        for jj, mm in enumerate(sys_masses):
+            if mm <= 0.0:
+                continue
+            if chunk and chunk_mass + mm > target:
+                chunks.append((-chunk_mass, ii, chunk))
+                chunk, chunk_mass = [], 0.0
+            chunk.append(jj)
+            chunk_mass += mm
+        if chunk:
+            chunks.append((-chunk_mass, ii, chunk))
+    if len(chunks) < size:
+        return None
+    # in the descending order of masses
+    chunks.sort()
+    # (mass, shard index)
+    loads = [(0.0, rr) for rr in range(size)]
+    shards = [[] for _ in range(size)]
+    for neg_mass, ii, sets in chunks:
+        load, rr = heapq.heappop(loads)
+        shards[rr].append((ii, sets))
+        heapq.heappush(loads, (load - neg_mass, rr))
+    return [sorted(ss) for ss in shards]
+
+
+def _get_batch_size(
+    batch_size: Union[int, str, List[int]], ii: int, natoms: int
+) -> int:
+    """Get the batch size of a system like :class:`DeepmdDataSystem`."""
+    if isinstance(batch_size, int):
+        return batch_size
+    if isinstance(batch_size, str):
+        words = batch_size.split(":")
+        rule = int(words[1]) if len(words) == 2 else 32
+        if words[0] == "auto":
+            return -(-rule // natoms)
+        if words[0] == "budget":
+            return max(int(rule / natoms + 0.5), 1)
+        if words[0] == "mixed":
+            return rule
+        raise RuntimeError("unknown batch_size rule " + words[0])
+    return batch_size[ii]
+
+
+def shard_systems(
+    systems: List[str],
+    batch_size: Union[int, str, List[int]],
+    rank: int,
+    size: int,
+    set_prefix: str = "set",
+    sys_probs: Optional[List[float]] = None,
+    auto_prob_style: str = "prob_sys_size",
+) -> Optional[Dict[str, Any]]:
+    """Get the shard of data systems loaded by a rank in parallel training.
+
+    The probabilities of systems are computed from the numbers of batches of
+    all the systems, as :class:`DeepmdDataSystem` does, and are shared by the
+    sets of each system in proportion to their numbers of batches. The sets
+    are partitioned by :func:`partition_systems` so that the shards have
+    nearly equal probabilities, which are the numbers of frames with the
+    default `prob_sys_size`. Each rank samples from its shard with the
+    probabilities normalized in the shard, so the systems are sampled by all
+    ranks in the global probabilities, provided the shards are balanced.
+
+    Parameters
+    ----------
+    systems : list of str
+        paths to all the systems
+    batch_size : int, str or list of int
+        the batch size, see :class:`DeepmdDataSystem`
+    rank : int
+        the rank of this process
+    size : int
+        the number of ranks
+    set_prefix : str, default: "set"
+        prefix of the sets
+    sys_probs : list of float, optional
+        the probabilities of all the systems, see :class:`DeepmdDataSystem`
+    auto_prob_style : str, default: "prob_sys_size"
+        the style of automatic probabilities, see :class:`DeepmdDataSystem`
+
+    Returns
+    -------
+    dict, optional
+        the `systems`, `sys_sets`, `batch_size` and `sys_probs` arguments of
+        :class:`DeepmdDataSystem` for this rank, or None if the data systems
+        cannot be partitioned into `size` shards
+    """
+    set_names = []
+    set_nbatches = []
+    for ii, sys_path in enumerate(systems):
+        nframes = get_sys_set_nframes(sys_path, set_prefix)
+        if len(nframes) == 0:
+            raise FileNotFoundError(f"No {set_prefix}.* is found in {sys_path}")
+        natoms = (DPPath(sys_path) / "type.raw").load_txt(ndmin=1).size
+        bs = _get_batch_size(batch_size, ii, natoms)
+        set_names.append(list(nframes))
+        # the same as DeepmdData.get_numb_batch
+        set_nbatches.append([max(nn // bs, 1) for nn in nframes.values()])
+    nbatches = [sum(nn) for nn in set_nbatches]
+    probs = get_sys_probs(sys_probs, auto_prob_style, nbatches)
+    masses = [
+        [probs[ii] * nn / nbatches[ii] for nn in set_nbatches[ii]]
+        for ii in range(len(systems))
+    ]
+    shards = partition_systems(masses, size)
+    if shards is None:
+        return None
+    shard_masses = [
+        sum(masses[ii][jj] for ii, sets in ss for jj in sets) for ss in shards
+    ]
+    log.info(
+        "rank %d loads %d of %d systems; the shards hold %.1f%% to %.1f%% of samples"
+        % (
+            rank,
+            len(shards[rank]),
+            len(systems),
+            100.0 * min(shard_masses),
+            100.0 * max(shard_masses),
+        )
+    )
+    shard = shards[rank]
+    shard_probs = (
+        np.array([sum(masses[ii][jj] for jj in sets) for ii, sets in shard])
+        / shard_masses[rank]
+    )
+    return {
+        "systems": [systems[ii] for ii, _ in shard],
+        "sys_sets": [[set_names[ii][jj] for jj in sets] for ii, sets in shard],
+        "batch_size": (
+            [batch_size[ii] for ii, _ in shard]
+            if isinstance(batch_size, list)
+            else batch_size
+        ),
+        "sys_probs": shard_probs,
+    }
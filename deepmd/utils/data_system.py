@@ -6,8 +6,11 @@ from functools import (
     lru_cache,
 )
 from typing import (
+    Any,
+    Dict,
     List,
     Optional,
+    Union,
 )
 
 import numpy as np
@@ -22,6 +25,9 @@ from deepmd.utils import random as dp_random
 from deepmd.utils.data import (
     DeepmdData,
 )
+from deepmd.utils.sampler import (
+    EpochSampler,
+)
 
 log = logging.getLogger(__name__)
 
@@ -47,6 +53,11 @@ class DeepmdDataSystem:
         sys_probs=None,
         auto_prob_style="prob_sys_size",
         sort_atoms: bool = True,
+        sys_sets: Optional[List[Optional[List[str]]]] = None,
+        is_shard: bool = False,
+        sampler: str = "random",
+        bucket_natoms: Optional[Union[int, List[int]]] = None,
+        data_prec: Optional[np.dtype] = None,
     ):
         """Constructor.
 
@@ -89,13 +100,41 @@ class DeepmdDataSystem:
         sort_atoms : bool
             Sort atoms by atom types. Required to enable when the data is directly feeded to
             descriptors except mixed types.
+        sys_sets : list of list of str, optional
+            The names of the sets to be loaded in each system. If None or the element
+            of a system is None, all the sets of the system are loaded.
+        is_shard : bool
+            Whether the systems are the shard of this rank in parallel training,
+            see :func:`deepmd.utils.data_shard.shard_systems`
+        sampler : str
+            How the systems are sampled to get the batches.
+            - "random" : the system of each batch is drawn by `sys_probs` with replacement
+            - "epoch"  : the batches are drawn by `sys_probs` without replacement in each
+                         epoch, see :class:`deepmd.utils.sampler.EpochSampler`
+        bucket_natoms : int or list of int, optional
+            Group the systems into buckets by the number of atoms, and draw each mixed
+            batch from one bucket, so that less padding atoms are added. Only for
+            mixed batches, i.e. `batch_size` is "mixed:N".
+            - int : the number of buckets, split at the quantiles of the number of atoms
+                    weighted by the probabilities of the systems
+            - list of int : the largest number of atoms of each bucket. The systems
+                    with more atoms than the last element form the last bucket
+            The batch size of a bucket is N times the average number of atoms divided by
+            the largest number of atoms in the bucket, so that the batches have about the
+            same number of atoms including the padding.
+        data_prec : np.dtype, optional
+            The precision of the data stored in memory, see :class:`DeepmdData`.
+            The energies and the reduced items are always stored in `GLOBAL_ENER_FLOAT_PRECISION`.
         """
         # init data
         self.rcut = rcut
         self.system_dirs = systems
         self.nsystems = len(self.system_dirs)
+        self.is_shard = is_shard
+        if sys_sets is None:
+            sys_sets = [None] * self.nsystems
         self.data_systems = []
-        for ii in self.system_dirs:
+        for ii, sets in zip(self.system_dirs, sys_sets):
             self.data_systems.append(
                 DeepmdData(
                     ii,
@@ -106,6 +145,8 @@ class DeepmdDataSystem:
                     modifier=modifier,
                     trn_all_set=trn_all_set,
                     sort_atoms=sort_atoms,
+                    sets=sets,
+                    data_prec=data_prec,
                 )
             )
         # check mix_type format
@@ -125,6 +166,7 @@ class DeepmdDataSystem:
         self.batch_size = batch_size
         is_auto_bs = False
         self.mixed_systems = False
+        self.natoms_budget = None
         if isinstance(self.batch_size, int):
             self.batch_size = self.batch_size * np.ones(self.nsystems, dtype=int)
         elif isinstance(self.batch_size, str):
@@ -135,6 +177,15 @@ class DeepmdDataSystem:
                 if len(words) == 2:
                     rule = int(words[1])
                 self.batch_size = self._make_auto_bs(rule)
+            elif "budget" == words[0]:
+                is_auto_bs = True
+                if len(words) == 2:
+                    self.natoms_budget = int(words[1])
+                else:
+                    raise RuntimeError(
+                        "the number of atoms must be specified for budget"
+                    )
+                self.batch_size = self._make_budget_bs(self.natoms_budget)
             elif "mixed" == words[0]:
                 self.mixed_type = True
                 self.mixed_systems = True
@@ -171,6 +222,17 @@ class DeepmdDataSystem:
             )
             type_map_list.append(self.data_systems[ii].get_type_map())
         self.type_map = self._check_type_map_consistency(type_map_list)
+        # the systems whose frames can be concatenated into a batch
+        self.sys_groups = None
+        if self.natoms_budget is not None:
+            group_keys = [
+                (tuple(self.natoms_vec[ii]), self.data_systems[ii].pbc)
+                for ii in range(self.nsystems)
+            ]
+            groups = {}
+            for ii, kk in enumerate(group_keys):
+                groups.setdefault(kk, []).append(ii)
+            self.sys_groups = [np.array(groups[kk]) for kk in group_keys]
 
         # ! altered by Marián Rynik
         # test size
@@ -203,6 +265,37 @@ class DeepmdDataSystem:
         self.sys_probs = None
         self.set_sys_probs(sys_probs, auto_prob_style)
 
+        # sampler of systems
+        self.sampler = None
+        nunits = None
+        if sampler == "epoch":
+            # mixed systems sample a frame each time
+            nunits = [
+                self.data_systems[ii].get_epoch_numb_batch(
+                    1 if self.mixed_systems else self.batch_size[ii]
+                )
+                for ii in range(self.nsystems)
+            ]
+            # the sizes of systems count the copies of frames
+            self.sys_probs = get_sys_probs(sys_probs, auto_prob_style, nunits)
+        elif sampler != "random":
+            raise RuntimeError("unknown sampler " + sampler)
+
+        # buckets of mixed systems
+        self.buckets = None
+        self.bucket_samplers = None
+        if bucket_natoms is not None:
+            if not self.mixed_systems:
+                raise RuntimeError(
+                    "bucket_natoms is only supported by mixed batches (batch_size mixed:N)"
+                )
+            self._make_buckets(bucket_natoms, nunits)
+        elif nunits is not None:
+            self.sampler = EpochSampler(nunits, self.sys_probs)
+        # the number of real and padded atoms of mixed batches
+        self.nreal_atoms = 0
+        self.npadded_atoms = 0
+
         # check batch and test size
         for ii in range(self.nsystems):
             chk_ret = self.data_systems[ii].check_batch_size(self.batch_size[ii])
@@ -346,21 +439,7 @@ class DeepmdDataSystem:
         return self.data_systems[ii].get_data_dict()
 
     def set_sys_probs(self, sys_probs=None, auto_prob_style: str = "prob_sys_size"):
-        if sys_probs is None:
-            if auto_prob_style == "prob_uniform":
-                prob_v = 1.0 / float(self.nsystems)
-                probs = [prob_v for ii in range(self.nsystems)]
-            elif auto_prob_style == "prob_sys_size":
-                probs = self.prob_nbatches
-            elif auto_prob_style[:14] == "prob_sys_size;":
-                probs = prob_sys_size_ext(
-                    auto_prob_style, self.get_nsystems(), self.nbatches
-                )
-            else:
-                raise RuntimeError("Unknown auto prob style: " + auto_prob_style)
-        else:
-            probs = process_sys_probs(sys_probs, self.nbatches)
-        self.sys_probs = probs
+        self.sys_probs = get_sys_probs(sys_probs, auto_prob_style, self.nbatches)
 
     def get_batch(self, sys_idx: Optional[int] = None) -> dict:
         # batch generation style altered by Ziyao Li:
@@ -408,14 +487,58 @@ class DeepmdDataSystem:
             self.pick_idx = sys_idx
         else:
             # prob = self._get_sys_probs(sys_probs, auto_prob_style)
-            self.pick_idx = dp_random.choice(np.arange(self.nsystems), p=self.sys_probs)
+            self.pick_idx = self._pick_sys()
         b_data = self.data_systems[self.pick_idx].get_batch(
             self.batch_size[self.pick_idx]
         )
+        if self.sys_groups is not None and sys_idx is None:
+            b_data = self._fill_batch(b_data, self.pick_idx)
         b_data["natoms_vec"] = self.natoms_vec[self.pick_idx]
         b_data["default_mesh"] = self.default_mesh[self.pick_idx]
         return b_data
 
+    def _fill_batch(self, b_data: dict, sys_idx: int) -> dict:
+        """Fill a batch with the frames of the systems with the same atoms.
+
+        A set may have fewer frames than the batch size of the budget, so the
+        batch is filled by the systems with the same `natoms_vec` and pbc,
+        drawn in proportion to their probabilities. The filling stops if the
+        frames do not have the same labels.
+
+        Parameters
+        ----------
+        b_data : dict
+            the batch of the system
+        sys_idx : int
+            the index of the system
+
+        Returns
+        -------
+        dict
+            the filled batch
+        """
+        batch_size = self.batch_size[sys_idx]
+        nframes = b_data["coord"].shape[0]
+        if nframes >= batch_size:
+            return b_data
+        group = self.sys_groups[sys_idx]
+        group_probs = self.sys_probs[group] / np.sum(self.sys_probs[group])
+        find_keys = [kk for kk in b_data if kk.startswith("find_")]
+        parts = [b_data]
+        while nframes < batch_size:
+            ii = dp_random.choice(group, p=group_probs)
+            part = self.data_systems[ii].get_batch(batch_size - nframes)
+            if any(part[kk] != b_data[kk] for kk in find_keys):
+                break
+            parts.append(part)
+            nframes += part["coord"].shape[0]
+        return {
+            kk: vv
+            if kk.startswith("find_")
+            else np.concatenate([pp[kk] for pp in parts])
+            for kk, vv in b_data.items()
+        }
+
     def get_batch_mixed(self) -> dict:
         """Get a batch of data from the data systems in the mixed way.
 
@@ -424,11 +547,16 @@ class DeepmdDataSystem:
         dict
             The batch data
         """
-        # mixed systems have a global batch size
-        batch_size = self.batch_size[0]
+        if self.buckets is None:
+            # mixed systems have a global batch size
+            bucket = None
+            batch_size = self.batch_size[0]
+        else:
+            bucket = self._pick_bucket()
+            batch_size = self.bucket_batch_size[bucket]
         batch_data = []
         for _ in range(batch_size):
-            self.pick_idx = dp_random.choice(np.arange(self.nsystems), p=self.sys_probs)
+            self.pick_idx = self._pick_sys(bucket)
             bb_data = self.data_systems[self.pick_idx].get_batch(1)
             bb_data["natoms_vec"] = self.natoms_vec[self.pick_idx]
             bb_data["default_mesh"] = self.default_mesh[self.pick_idx]
@@ -436,6 +564,98 @@ class DeepmdDataSystem:
         b_data = self._merge_batch_data(batch_data)
         return b_data
 
+    def _pick_sys(self, bucket: Optional[int] = None) -> int:
+        """Pick the index of the system of the next batch or frame.
+
+        If `bucket` is given, the system is picked from the bucket.
+        """
+        if bucket is not None:
+            if self.bucket_samplers is not None:
+                return int(self.buckets[bucket][next(self.bucket_samplers[bucket])])
+            return dp_random.choice(
+                self.buckets[bucket], p=self.bucket_sys_probs[bucket]
+            )
+        if self.sampler is not None:
+            return next(self.sampler)
+        return dp_random.choice(np.arange(self.nsystems), p=self.sys_probs)
+
+    def _pick_bucket(self) -> int:
+        """Pick the index of the bucket of the next mixed batch."""
+        if self.sampler is not None:
+            return next(self.sampler)
+        return dp_random.choice(np.arange(len(self.buckets)), p=self.bucket_probs)
+
+    def _make_buckets(
+        self, bucket_natoms: Union[int, List[int]], nunits: Optional[List[int]]
+    ):
+        """Group the systems into buckets by the number of atoms.
+
+        Parameters
+        ----------
+        bucket_natoms : int or list of int
+            the number of buckets or the largest number of atoms of each bucket
+        nunits : list of int, optional
+            the number of frames of each system in an epoch if the epoch
+            sampler is used
+        """
+        natoms = np.array(self.natoms)
+        # the systems with the same number of atoms are in the same bucket
+        uniq_natoms, sys_uniq = np.unique(natoms, return_inverse=True)
+        if isinstance(bucket_natoms, int):
+            if bucket_natoms < 1:
+                raise RuntimeError("the number of buckets should be positive")
+            uniq_probs = np.bincount(sys_uniq, weights=self.sys_probs)
+            start = (np.cumsum(uniq_probs) - uniq_probs) / np.sum(uniq_probs)
+            uniq_bucket = np.minimum(
+                (start * bucket_natoms).astype(int), bucket_natoms - 1
+            )
+        else:
+            uniq_bucket = np.searchsorted(np.sort(bucket_natoms), uniq_natoms)
+        # skip the empty buckets
+        _, sys_bucket = np.unique(uniq_bucket[sys_uniq], return_inverse=True)
+        self.buckets = [
+            np.flatnonzero(sys_bucket == bb) for bb in range(np.max(sys_bucket) + 1)
+        ]
+        # the average number of atoms in N frames
+        natoms_budget = self.batch_size[0] * np.dot(self.sys_probs, natoms)
+        self.bucket_batch_size = [
+            max(int(round(natoms_budget / np.max(natoms[bb]))), 1)
+            for bb in self.buckets
+        ]
+        bucket_masses = np.array([np.sum(self.sys_probs[bb]) for bb in self.buckets])
+        self.bucket_sys_probs = [
+            self.sys_probs[bb] / mm for bb, mm in zip(self.buckets, bucket_masses)
+        ]
+        # the frames of systems are drawn in proportion to their probabilities
+        bucket_probs = bucket_masses / np.array(self.bucket_batch_size)
+        self.bucket_probs = bucket_probs / np.sum(bucket_probs)
+        if nunits is not None:
+            nunits = np.array(nunits)
+            self.bucket_samplers = [
+                EpochSampler(nunits[bb], self.sys_probs[bb]) for bb in self.buckets
+            ]
+            # the buckets are scheduled by batches
+            self.sampler = EpochSampler(
+                [
+                    max(np.sum(nunits[bb]) // bs, 1)
+                    for bb, bs in zip(self.buckets, self.bucket_batch_size)
+                ],
+                self.bucket_probs,
+            )
+
+    def get_padding_ratio(self) -> Optional[float]:
+        """Get the ratio of the padded atoms in the mixed batches got so far.
+
+        Returns
+        -------
+        float, optional
+            the ratio of the padded atoms to all the atoms, or None if no
+            mixed batch has been got
+        """
+        if self.npadded_atoms == 0:
+            return None
+        return 1.0 - self.nreal_atoms / self.npadded_atoms
+
     def _merge_batch_data(self, batch_data: List[dict]) -> dict:
         """Merge batch data from different systems.
 
@@ -458,6 +678,8 @@ class DeepmdDataSystem:
         # real_natoms_vec
         real_natoms_vec = np.vstack([bb["natoms_vec"] for bb in batch_data])
         b_data["real_natoms_vec"] = real_natoms_vec
+        self.nreal_atoms += int(np.sum(real_natoms_vec[:, 0]))
+        self.npadded_atoms += len(batch_data) * int(max_natoms)
         # type
         type_vec = np.full((len(batch_data), max_natoms), -1, dtype=int)
         for ii, bb in enumerate(batch_data):
@@ -542,6 +764,74 @@ class DeepmdDataSystem:
         """Get the batch size."""
         return self.batch_size
 
+    def get_state(self) -> Dict[str, Any]:
+        """Get the position of :meth:`get_batch` in the training sets.
+
+        The random state of :mod:`deepmd.utils.random` is not included.
+
+        Returns
+        -------
+        dict
+            the state of the systems and the sampler
+        """
+        state = {
+            "pick_idx": self.pick_idx,
+            "systems": [ds.get_state() for ds in self.data_systems],
+        }
+        if self.sampler is not None:
+            state["sampler"] = self.sampler.get_state()
+        if self.bucket_samplers is not None:
+            state["bucket_samplers"] = [ss.get_state() for ss in self.bucket_samplers]
+        return state
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restore the position of :meth:`get_batch` in the training sets.
+
+        Parameters
+        ----------
+        state : dict
+            the state returned by :meth:`get_state`
+        """
+        if len(state["systems"]) != self.nsystems:
+            raise ValueError(
+                "the state has %d systems, but %d systems are loaded"
+                % (len(state["systems"]), self.nsystems)
+            )
+        self.pick_idx = int(state["pick_idx"])
+        for ds, ss in zip(self.data_systems, state["systems"]):
+            ds.set_state(ss)
+        self.set_sampler_state(state.get("sampler"))
+        if self.bucket_samplers is not None and "bucket_samplers" in state:
+            for ss, sampler_state in zip(
+                self.bucket_samplers, state["bucket_samplers"]
+            ):
+                ss.set_state(sampler_state)
+
+    def get_sampler_state(self) -> Optional[Dict[str, int]]:
+        """Get the position of the epoch sampler.
+
+        Returns
+        -------
+        dict, optional
+            the state of the sampler, or None if the systems are sampled randomly
+        """
+        if self.sampler is None:
+            return None
+        return self.sampler.get_state()
+
+    def set_sampler_state(self, state: Optional[Dict[str, int]]):
+        """Restore the position of the epoch sampler, so that a restarted
+        training resumes from the middle of the epoch.
+
+        Parameters
+        ----------
+        state : dict, optional
+            the state returned by :meth:`get_sampler_state`. Ignored if None
+            or the systems are sampled randomly
+        """
+        if self.sampler is not None and state is not None:
+            self.sampler.set_state(state)
+
     def _format_name_length(self, name, width):
         if len(name) <= width:
             return "{: >{}}".format(name, width)
@@ -574,10 +864,37 @@ class DeepmdDataSystem:
                     "T" if self.data_systems[ii].pbc else "F",
                 )
             )
+        if self.buckets is not None:
+            log.info("found %d bucket(s) of mixed batches:" % len(self.buckets))
+            log.info(
+                "%6s  %13s  %6s  %5s  %7s"
+                % ("bucket", "natoms", "bch_sz", "prob", "max_pad")
+            )
+            natoms = np.array(self.natoms)
+            for ii, bb in enumerate(self.buckets):
+                max_natoms = np.max(natoms[bb])
+                # the padding if all the frames are padded to the largest system
+                max_pad = (
+                    1.0 - np.dot(self.bucket_sys_probs[ii], natoms[bb]) / max_natoms
+                )
+                log.info(
+                    "%6d  %6d-%-6d  %6d  %5.3f  %6.1f%%"
+                    % (
+                        ii,
+                        np.min(natoms[bb]),
+                        max_natoms,
+                        self.bucket_batch_size[ii],
+                        self.bucket_probs[ii],
+                        100.0 * max_pad,
+                    )
+                )
         log.info(
             "--------------------------------------------------------------------------------------"
         )
 
+    def _make_budget_bs(self, rule):
+        return [max(int(rule / ii.get_natoms() + 0.5), 1) for ii in self.data_systems]
+
     def _make_auto_bs(self, rule):
         bs = []
         for ii in self.data_systems:
@@ -611,6 +928,40 @@ class DeepmdDataSystem:
         return ret
 
 
+def get_sys_probs(sys_probs, auto_prob_style: str, nbatch) -> np.ndarray:
+    """Get the probabilities of systems.
+
+    Parameters
+    ----------
+    sys_probs : list of float, optional
+        The probabilitis of systems. See :class:`DeepmdDataSystem`
+    auto_prob_style : str
+        Determine the probability of systems automatically if `sys_probs` is None.
+        See :class:`DeepmdDataSystem`
+    nbatch : list of int
+        The number of batches in each system
+
+    Returns
+    -------
+    np.ndarray
+        The probabilities of systems
+    """
+    nsystems = len(nbatch)
+    if sys_probs is None:
+        if auto_prob_style == "prob_uniform":
+            prob_v = 1.0 / float(nsystems)
+            probs = [prob_v for ii in range(nsystems)]
+        elif auto_prob_style == "prob_sys_size":
+            probs = [float(i) for i in nbatch] / np.sum(nbatch)
+        elif auto_prob_style[:14] == "prob_sys_size;":
+            probs = prob_sys_size_ext(auto_prob_style, nsystems, nbatch)
+        else:
+            raise RuntimeError("Unknown auto prob style: " + auto_prob_style)
+    else:
+        probs = process_sys_probs(sys_probs, nbatch)
+    return np.asarray(probs, dtype=float)
+
+
 def process_sys_probs(sys_probs, nbatch):
     sys_probs = np.array(sys_probs)
     type_filter = sys_probs >= 0
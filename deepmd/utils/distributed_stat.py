@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Split the statistics of data across the ranks of parallel training.
+
+Within :func:`distributed_stat`, each rank samples the data statistics and
+the neighbor statistics from a subset of the data systems, and the results
+are gathered from all the ranks by Horovod, so all the ranks get the same
+statistics. Outside of it, the functions of this module do nothing.
+"""
+
+from contextlib import (
+    contextmanager,
+)
+from operator import (
+    itemgetter,
+)
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import horovod.tensorflow as HVD
+
+    from deepmd.utils.data_system import (
+        DeepmdDataSystem,
+    )
+
+__all__ = [
+    "allgather",
+    "distributed_stat",
+    "gather_stat_dict",
+    "gather_sys_stats",
+    "get_rank",
+    "get_size",
+    "get_stat_systems",
+    "split_batches",
+]
+
+# the horovod module used for the statistics
+_HVD = None
+
+
+@contextmanager
+def distributed_stat(hvd: Optional["HVD"]):
+    """Split the statistics of data across the ranks within the context.
+
+    Parameters
+    ----------
+    hvd : HVD, optional
+        the initialized horovod module. If None or there is only one rank,
+        the statistics are not split
+    """
+    global _HVD
+    old_hvd = _HVD
+    if hvd is not None and hvd.size() > 1:
+        _HVD = hvd
+    try:
+        yield
+    finally:
+        _HVD = old_hvd
+
+
+def get_rank() -> int:
+    """Get the rank of this process in the statistics."""
+    return _HVD.rank() if _HVD is not None else 0
+
+
+def get_size() -> int:
+    """Get the number of ranks in the statistics."""
+    return _HVD.size() if _HVD is not None else 1
+
+
+def allgather(obj: Any, name: str) -> List[Any]:
+    """Gather a picklable object from all the ranks.
+
+    Parameters
+    ----------
+    obj : Any
+        the object of this rank
+    name : str
+        the name of the collective operation, which should be the same
+        on all the ranks
+
+    Returns
+    -------
+    list
+        the objects of all the ranks, in the order of ranks
+    """
+    if _HVD is None:
+        return [obj]
+    from deepmd.env import (
+        default_tf_session_config,
+        tf,
+    )
+
+    # use a separated graph, so no operator is added to the model
+    with tf.Graph().as_default(), tf.device("/cpu:0"):
+        with tf.Session(config=default_tf_session_config) as sess:
+            return _HVD.allgather_object(obj, session=sess, name=name)
+
+
+def get_stat_systems(data: "DeepmdDataSystem") -> List[int]:
+    """Get the indexes of the data systems handled by this rank.
+
+    A shard of the data systems (see :func:`deepmd.utils.data_shard.shard_systems`)
+    is handled by its rank as a whole. Otherwise, the systems are handled by
+    the ranks in turn.
+
+    Parameters
+    ----------
+    data : DeepmdDataSystem
+        the data systems of this rank
+
+    Returns
+    -------
+    list of int
+        the indexes of the systems
+    """
+    nsystems = data.get_nsystems()
+    if get_size() == 1 or data.is_shard:
+        return list(range(nsystems))
+    return list(range(get_rank(), nsystems, get_size()))
+
+
+def gather_sys_stats(
+    sys_stats: List[Tuple[int, Dict[str, list]]], data: "DeepmdDataSystem"
+) -> List[Tuple[int, Dict[str, list]]]:
+    """Gather the statistics of data systems from all the ranks.
+
+    Parameters
+    ----------
+    sys_stats : list of tuple
+        the index and the statistics of each system handled by this rank,
+        see :func:`get_stat_systems`
+    data : DeepmdDataSystem
+        the data systems of this rank
+
+    Returns
+    -------
+    list of tuple
+        the index and the statistics of all the systems, in the order of
+        systems, or in the order of ranks for shards
+    """
+    if _HVD is None:
+        return sys_stats
+    gathered = allgather(sys_stats, "sys_stats")
+    sys_stats = [ss for rank_stats in gathered for ss in rank_stats]
+    if not data.is_shard:
+        sys_stats.sort(key=itemgetter(0))
+    return sys_stats
+
+
+def split_batches(*batches: Optional[list]) -> Tuple[Optional[list], ...]:
+    """Select the batches handled by this rank, in turn.
+
+    Parameters
+    ----------
+    *batches : list, optional
+        the lists of batches of the same length. None is kept
+
+    Returns
+    -------
+    tuple of list
+        the batches handled by this rank
+    """
+    rank, size = get_rank(), get_size()
+    return tuple(bb[rank::size] if bb is not None else None for bb in batches)
+
+
+def gather_stat_dict(stat_dict: Dict[str, list]) -> Dict[str, list]:
+    """Gather the statistics of batches split by :func:`split_batches`.
+
+    Parameters
+    ----------
+    stat_dict : dict of list
+        the lists of the statistics of the batches handled by this rank
+
+    Returns
+    -------
+    dict of list
+        the lists of the statistics of all the batches, in the order of ranks
+    """
+    if _HVD is None:
+        return stat_dict
+    gathered = allgather(
+        {kk: [np.asarray(vv) for vv in stat_dict[kk]] for kk in stat_dict},
+        "stat_dict",
+    )
+    return {
+        kk: [vv for rank_dict in gathered for vv in rank_dict[kk]] for kk in stat_dict
+    }
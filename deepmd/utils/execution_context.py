@@ -0,0 +1,241 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Process-level execution context shared by the inference sessions."""
+
+import logging
+import os
+import threading
+from typing import (
+    Any,
+    Optional,
+)
+
+from deepmd.env import (
+    default_tf_session_config,
+    get_tf_default_nthreads,
+    tf,
+)
+
+__all__ = [
+    "ExecutionContext",
+    "LimitedSession",
+    "get_execution_context",
+    "init_execution_context",
+]
+
+log = logging.getLogger(__name__)
+
+# name of the process-wide inter-op thread pool
+INTER_OP_POOL_NAME = "deepmd_inter_op"
+
+
+def _get_ncores() -> int:
+    """Get the number of CPU cores available to this process."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class LimitedSession:
+    """A session which limits the number of concurrent runs.
+
+    All other attributes are forwarded to the wrapped session.
+
+    Parameters
+    ----------
+    sess : tf.Session
+        the wrapped session
+    max_concurrency : int, optional
+        the maximal number of concurrent :meth:`run` calls. None means no limit
+    """
+
+    def __init__(self, sess: tf.Session, max_concurrency: Optional[int] = None):
+        self._sess = sess
+        self.set_max_concurrency(max_concurrency)
+
+    def set_max_concurrency(self, max_concurrency: Optional[int]):
+        """Set the maximal number of concurrent runs.
+
+        Parameters
+        ----------
+        max_concurrency : int, optional
+            the maximal number of concurrent :meth:`run` calls. None means no limit
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency should be a positive integer")
+        self.max_concurrency = max_concurrency
+        self._semaphore = (
+            None
+            if max_concurrency is None
+            else threading.BoundedSemaphore(max_concurrency)
+        )
+
+    def run(self, *args, **kwargs):
+        """Run the wrapped session, waiting if too many runs are in progress."""
+        semaphore = self._semaphore
+        if semaphore is None:
+            return self._sess.run(*args, **kwargs)
+        with semaphore:
+            return self._sess.run(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._sess, name)
+
+
+class ExecutionContext:
+    """Execution context which owns the thread pools of the inference sessions.
+
+    By default, each session may set up its own thread pools, so loading
+    many models in one process, e.g. the models of a committee for model
+    deviation, oversubscribes the CPU. Sessions created by this context
+    share one inter-op thread pool registered in TensorFlow by a global name,
+    and the process-wide intra-op thread pool, with the thread counts given
+    here. The thread counts are reported when the context is created.
+
+    Parameters
+    ----------
+    intra_op_threads : int, optional
+        the number of intra-op threads. If not given, it is read from
+        `TF_INTRA_OP_PARALLELISM_THREADS`. 0 means all cores
+    inter_op_threads : int, optional
+        the number of inter-op threads. If not given, it is read from
+        `TF_INTER_OP_PARALLELISM_THREADS`. 0 means all cores
+    max_concurrency : int, optional
+        the default maximal number of concurrent runs of each model. None
+        means no limit. It can be changed for each model by
+        :meth:`deepmd.infer.deep_eval.DeepEval.set_max_concurrency`
+    """
+
+    def __init__(
+        self,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        intra, inter = get_tf_default_nthreads()
+        self.intra_op_threads = intra if intra_op_threads is None else intra_op_threads
+        self.inter_op_threads = inter if inter_op_threads is None else inter_op_threads
+        self.max_concurrency = max_concurrency
+        self.nsessions = 0
+        ncores = _get_ncores()
+        log.info(
+            "execution context: %d cores, %d intra-op threads, %d inter-op threads, "
+            "OMP_NUM_THREADS=%s",
+            ncores,
+            self.intra_op_threads or ncores,
+            self.inter_op_threads or ncores,
+            os.environ.get("OMP_NUM_THREADS", "unset"),
+        )
+
+    @property
+    def config(self) -> tf.ConfigProto:
+        """The session config shared by the sessions of this context.
+
+        It is copied from the default session config each time, so that
+        the changes made by :func:`deepmd.env.reset_default_tf_session_config`
+        are respected.
+        """
+        config = tf.ConfigProto()
+        config.CopyFrom(default_tf_session_config)
+        config.intra_op_parallelism_threads = self.intra_op_threads
+        config.inter_op_parallelism_threads = self.inter_op_threads
+        config.use_per_session_threads = False
+        pool = config.session_inter_op_thread_pool.add()
+        pool.num_threads = self.inter_op_threads
+        pool.global_name = INTER_OP_POOL_NAME
+        return config
+
+    def new_session(
+        self, graph: tf.Graph, max_concurrency: Optional[int] = None
+    ) -> LimitedSession:
+        """Create a session on the shared thread pools.
+
+        Parameters
+        ----------
+        graph : tf.Graph
+            the graph of the session
+        max_concurrency : int, optional
+            the maximal number of concurrent runs of the session. If not given,
+            the default of this context is used
+
+        Returns
+        -------
+        LimitedSession
+            the new session
+        """
+        if max_concurrency is None:
+            max_concurrency = self.max_concurrency
+        self.nsessions += 1
+        return LimitedSession(
+            tf.Session(graph=graph, config=self.config), max_concurrency
+        )
+
+
+_context: Optional[ExecutionContext] = None
+_context_lock = threading.Lock()
+
+
+def get_execution_context() -> ExecutionContext:
+    """Get the execution context of this process, creating it if needed.
+
+    Returns
+    -------
+    ExecutionContext
+        the execution context
+    """
+    global _context
+    with _context_lock:
+        if _context is None:
+            _context = ExecutionContext()
+        return _context
+
+
+def init_execution_context(
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> ExecutionContext:
+    """Initialize the execution context of this process.
+
+    It should be called before any model is loaded, as TensorFlow creates
+    the shared thread pools with the thread counts of the first session.
+    Only `max_concurrency` can be changed afterwards, which applies to the
+    models loaded later.
+
+    Parameters
+    ----------
+    intra_op_threads : int, optional
+        the number of intra-op threads
+    inter_op_threads : int, optional
+        the number of inter-op threads
+    max_concurrency : int, optional
+        the default maximal number of concurrent runs of each model
+
+    Returns
+    -------
+    ExecutionContext
+        the execution context
+
+    Raises
+    ------
+    RuntimeError
+        if the thread counts are changed after sessions are created
+    """
+    global _context
+    with _context_lock:
+        context = ExecutionContext(
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            max_concurrency=max_concurrency,
+        )
+        if _context is not None and _context.nsessions > 0:
+            if (context.intra_op_threads, context.inter_op_threads) != (
+                _context.intra_op_threads,
+                _context.inter_op_threads,
+            ):
+                raise RuntimeError(
+                    "The thread counts cannot be changed after %d sessions are "
+                    "created" % _context.nsessions
+                )
+            context.nsessions = _context.nsessions
+        _context = context
+        return _context
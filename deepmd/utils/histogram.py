@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Histogram of durations for profiling."""
+
+from typing import (
+    Dict,
+)
+
+import numpy as np
+
+__all__ = ["PhaseHistogram"]
+
+
+class PhaseHistogram:
+    """Histogram of durations with logarithmic bins.
+
+    The memory usage does not grow with the number of samples. Percentiles
+    are estimated from the bins, with a relative error of about 6%.
+
+    Parameters
+    ----------
+    min_time : float, default: 1e-6
+        the lower bound of the histogram, in seconds
+    max_time : float, default: 1e4
+        the upper bound of the histogram, in seconds
+    nbins : int, default: 200
+        the number of bins
+    """
+
+    def __init__(self, min_time: float = 1e-6, max_time: float = 1e4, nbins: int = 200):
+        self.edges = np.geomspace(min_time, max_time, nbins + 1)
+        # the first and the last bins collect underflows and overflows
+        self.counts = np.zeros(nbins + 2, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float):
+        """Add a duration in seconds."""
+        self.counts[np.searchsorted(self.edges, duration, side="right")] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-th percentile, in seconds."""
+        if self.count == 0:
+            return 0.0
+        idx = int(np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.count))
+        if idx == 0:
+            return float(self.edges[0])
+        if idx > len(self.edges) - 1:
+            return self.max
+        # geometric center of the bin
+        return float(min(np.sqrt(self.edges[idx - 1] * self.edges[idx]), self.max))
+
+    def summary(self) -> Dict[str, float]:
+        """Summary of the durations, in seconds."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
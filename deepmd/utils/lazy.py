@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Helpers to defer expensive imports until the first use."""
+
+import importlib
+import sys
+from types import (
+    ModuleType,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+__all__ = ["LazyDict", "lazy_import", "shadow_submodules"]
+
+
+def lazy_import(
+    package: str,
+    submodules: Iterable[str] = (),
+    attrs: Optional[Mapping[str, str]] = None,
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Make the submodules and attributes of a package imported on first access.
+
+    The returned functions should be assigned to `__getattr__` and `__dir__`
+    of the package (PEP 562). Once imported, the value is stored in the
+    package, so `__getattr__` is not called again.
+
+    Parameters
+    ----------
+    package : str
+        the name of the package, i.e. `__name__`
+    submodules : iterable of str
+        the names of submodules imported by attribute access
+    attrs : mapping of str to str, optional
+        the names of attributes mapped to the relative names of the
+        submodules which define them
+
+    Returns
+    -------
+    __getattr__ : Callable[[str], Any]
+        the module-level `__getattr__`
+    __dir__ : Callable[[], List[str]]
+        the module-level `__dir__`
+
+    Examples
+    --------
+    >>> __getattr__, __dir__ = lazy_import(
+    ...     __name__, submodules=["descriptor"], attrs={"DeepPot": ".infer"}
+    ... )
+    """
+    submodules = set(submodules)
+    attrs = dict(attrs or {})
+
+    def __getattr__(name: str) -> Any:
+        if name in attrs:
+            module = importlib.import_module(attrs[name], package)
+            value = getattr(module, name)
+        elif name in submodules:
+            value = importlib.import_module(f".{name}", package)
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | submodules | set(attrs))
+
+    return __getattr__, __dir__
+
+
+def shadow_submodules(package: str, names: Iterable[str]):
+    """Keep the attributes of a package from being replaced by its submodules.
+
+    After a submodule is imported, the import system sets it as the attribute
+    of the package, which hides the lazy attribute of the same name, e.g. a
+    function defined in the submodule. The class of the package is replaced,
+    so that these submodules are not set as the attributes and the attributes
+    are still resolved by `__getattr__`. The submodules are still imported
+    and kept in `sys.modules`.
+
+    Parameters
+    ----------
+    package : str
+        the name of the package, i.e. `__name__`
+    names : iterable of str
+        the names of the attributes which are also the names of submodules
+    """
+    names = frozenset(names)
+
+    class _Package(ModuleType):
+        def __setattr__(self, name: str, value: Any):
+            if name in names and isinstance(value, ModuleType):
+                return
+            super().__setattr__(name, value)
+
+    module = sys.modules[package]
+    for name in names:
+        if isinstance(vars(module).get(name), ModuleType):
+            delattr(module, name)
+    module.__class__ = _Package
+
+
+class LazyDict(Mapping):
+    """A read-only dict whose keys are known but values are created on first use.
+
+    Parameters
+    ----------
+    keys : iterable of str
+        the keys
+    loader : Callable[[], Dict[str, Any]]
+        the function creating the dict, called once when a value is accessed
+    """
+
+    def __init__(self, keys: Iterable[str], loader: Callable[[], Dict[str, Any]]):
+        self._keys = list(keys)
+        self._loader = loader
+        self._data = None
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            data = self._loader()
+            assert list(data) == self._keys, "the loaded keys mismatch"
+            self._data = data
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._load()[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self):
+        return dict.fromkeys(self._keys).keys()
+
+    def __repr__(self) -> str:
+        return f"LazyDict({self._keys})"
@@ -10,13 +10,20 @@ import numpy as np
 
 from deepmd.env import (
     GLOBAL_NP_FLOAT_PRECISION,
-    default_tf_session_config,
     op_module,
     tf,
 )
 from deepmd.utils.data_system import (
     DeepmdDataSystem,
 )
+from deepmd.utils.distributed_stat import (
+    allgather,
+    get_size,
+    get_stat_systems,
+)
+from deepmd.utils.execution_context import (
+    get_execution_context,
+)
 from deepmd.utils.parallel_op import (
     ParallelOp,
 )
@@ -86,10 +93,11 @@ class NeighborStat:
             _max_nbor_size = tf.reduce_max(_max_nbor_size, axis=0)
             return place_holders, (_max_nbor_size, _min_nbor_dist, place_holders["dir"])
 
+        context = get_execution_context()
         with sub_graph.as_default():
-            self.p = ParallelOp(builder, config=default_tf_session_config)
+            self.p = ParallelOp(builder, config=context.config)
 
-        self.sub_sess = tf.Session(graph=sub_graph, config=default_tf_session_config)
+        self.sub_sess = context.new_session(sub_graph)
 
     def get_stat(self, data: DeepmdDataSystem) -> Tuple[float, List[int]]:
         """Get the data statistics of the training data, including nearest nbor distance between atoms, max nbor size of atoms.
@@ -105,6 +113,11 @@ class NeighborStat:
             The nearest distance between neighbor atoms
         max_nbor_size
             A list with ntypes integers, denotes the actual achieved max sel
+
+        Notes
+        -----
+        In :func:`deepmd.utils.distributed_stat.distributed_stat`, each rank only
+        scans its systems, and the results of all the ranks are reduced.
         """
         self.min_nbor_dist = 100.0
         self.max_nbor_size = [0]
@@ -112,7 +125,7 @@ class NeighborStat:
             self.max_nbor_size *= self.ntypes
 
         def feed():
-            for ii in range(len(data.system_dirs)):
+            for ii in get_stat_systems(data):
                 for jj in data.data_systems[ii].dirs:
                     data_set = data.data_systems[ii]._load_set(jj)
                     for kk in range(np.array(data_set["type"]).shape[0]):
@@ -129,6 +142,7 @@ class NeighborStat:
                             "dir": str(jj),
                         }
 
+        error = None
         for mn, dt, jj in self.p.generate(self.sub_sess, feed()):
             if np.isinf(dt):
                 log.warning(
@@ -139,12 +153,24 @@ class NeighborStat:
                 if math.isclose(dt, 0.0, rel_tol=1e-6):
                     # it's unexpected that the distance between two atoms is zero
                     # zero distance will cause nan (#874)
-                    raise RuntimeError(
+                    error = (
                         "Some atoms are overlapping in %s. Please check your"
                         " training data to remove duplicated atoms." % jj
                     )
+                    break
                 self.min_nbor_dist = dt
             self.max_nbor_size = np.maximum(mn, self.max_nbor_size)
+        if get_size() > 1:
+            # all the ranks should raise the error, otherwise they will hang
+            gathered = allgather(
+                (self.min_nbor_dist, self.max_nbor_size, error), "neighbor_stat"
+            )
+            errors = [ee for _, _, ee in gathered if ee is not None]
+            error = errors[0] if errors else None
+            self.min_nbor_dist = min(dd for dd, _, _ in gathered)
+            self.max_nbor_size = np.max([nn for _, nn, _ in gathered], axis=0)
+        if error is not None:
+            raise RuntimeError(error)
 
         # do sqrt in the final
         self.min_nbor_dist = math.sqrt(self.min_nbor_dist)
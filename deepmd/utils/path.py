@@ -13,6 +13,7 @@ from pathlib import (
 from typing import (
     List,
     Optional,
+    Tuple,
 )
 
 import h5py
@@ -52,6 +53,16 @@ class DPPath(ABC):
             loaded NumPy array
         """
 
+    @abstractmethod
+    def get_numpy_shape(self) -> Tuple[int, ...]:
+        """Get the shape of the NumPy array without loading the data.
+
+        Returns
+        -------
+        Tuple[int, ...]
+            shape of the NumPy array
+        """
+
     @abstractmethod
     def load_txt(self, **kwargs) -> np.ndarray:
         """Load NumPy array from text.
@@ -149,6 +160,17 @@ class DPOSPath(DPPath):
         """
         return np.load(str(self.path))
 
+    def get_numpy_shape(self) -> Tuple[int, ...]:
+        """Get the shape of the NumPy array without loading the data.
+
+        Returns
+        -------
+        Tuple[int, ...]
+            shape of the NumPy array
+        """
+        # only the header is read
+        return np.load(str(self.path), mmap_mode="r").shape
+
     def load_txt(self, **kwargs) -> np.ndarray:
         """Load NumPy array from text.
 
@@ -263,6 +285,16 @@ class DPH5Path(DPPath):
         """
         return self.root[self.name][:]
 
+    def get_numpy_shape(self) -> Tuple[int, ...]:
+        """Get the shape of the NumPy array without loading the data.
+
+        Returns
+        -------
+        Tuple[int, ...]
+            shape of the NumPy array
+        """
+        return self.root[self.name].shape
+
     def load_txt(self, dtype: Optional[np.dtype] = None, **kwargs) -> np.ndarray:
         """Load NumPy array from text.
 
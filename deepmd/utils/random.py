@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 from typing import (
     Optional,
+    Tuple,
 )
 
 import numpy as np
@@ -64,4 +65,26 @@ def shuffle(x: np.ndarray):
     _RANDOM_GENERATOR.shuffle(x)
 
 
-__all__ = ["choice", "random", "seed", "shuffle"]
+def get_state() -> Tuple:
+    """Get the state of the generator.
+
+    Returns
+    -------
+    tuple
+        The state, see :meth:`numpy.random.RandomState.get_state`.
+    """
+    return _RANDOM_GENERATOR.get_state()
+
+
+def set_state(state: Tuple):
+    """Restore the state of the generator.
+
+    Parameters
+    ----------
+    state : tuple
+        The state returned by :func:`get_state`.
+    """
+    _RANDOM_GENERATOR.set_state(state)
+
+
+__all__ = ["choice", "get_state", "random", "seed", "set_state", "shuffle"]
@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+"""Samplers of data systems."""
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy as np
+
+from deepmd.utils import random as dp_random
+
+__all__ = ["EpochSampler"]
+
+
+class EpochSampler:
+    """Schedule the systems epoch by epoch without replacement.
+
+    An epoch has as many units, i.e., batches or frames, as passing all the
+    systems once. The number of units of each system in an epoch is
+    proportional to its probability, so a system with the probability in
+    proportion to its size is passed exactly once. The units of an epoch are
+    shuffled at the beginning of the epoch.
+
+    The schedule of an epoch is determined by the seed and the index of the
+    epoch, so the position of the sampler can be saved by :meth:`get_state`
+    and restored by :meth:`set_state`.
+
+    Parameters
+    ----------
+    nunits : list of int
+        the number of units to pass each system once
+    probs : list of float
+        the probability of each system
+    seed : int, optional
+        the random seed of the schedules. If None, it is drawn from
+        :mod:`deepmd.utils.random`
+    """
+
+    def __init__(
+        self, nunits: List[int], probs: List[float], seed: Optional[int] = None
+    ):
+        probs = np.asarray(probs, dtype=float)
+        if len(nunits) != len(probs):
+            raise ValueError("the lengths of nunits and probs should be the same")
+        self.counts = self._get_counts(int(np.sum(nunits)), probs)
+        if seed is None:
+            seed = int(dp_random.random() * 2**32)
+        self.seed = seed
+        self.epoch = 0
+        self.index = 0
+        self.schedule = self._make_schedule(self.epoch)
+
+    @staticmethod
+    def _get_counts(total: int, probs: np.ndarray) -> np.ndarray:
+        """Split the units of an epoch by the largest remainder method."""
+        probs = probs / np.sum(probs)
+        exact = probs * total
+        counts = np.floor(exact).astype(int)
+        remainder = total - np.sum(counts)
+        if remainder > 0:
+            order = np.argsort(-(exact - counts), kind="stable")
+            counts[order[:remainder]] += 1
+        # a system with a positive probability is sampled at least once,
+        # taking the units one by one from the largest system
+        for ii in np.flatnonzero((counts == 0) & (probs > 0)):
+            largest = np.argmax(counts)
+            if counts[largest] <= 1:
+                raise ValueError(
+                    "the epoch of %d units is too short to sample each of the "
+                    "%d systems with a positive probability at least once"
+                    % (total, np.sum(probs > 0))
+                )
+            counts[largest] -= 1
+            counts[ii] = 1
+        return counts
+
+    def _make_schedule(self, epoch: int) -> np.ndarray:
+        """Make the shuffled schedule of an epoch."""
+        rng = np.random.RandomState((self.seed + epoch) % 2**32)
+        schedule = np.repeat(np.arange(len(self.counts)), self.counts)
+        rng.shuffle(schedule)
+        return schedule
+
+    def __len__(self) -> int:
+        """The number of units in an epoch."""
+        return len(self.schedule)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        """Get the index of the system of the next unit."""
+        if self.index >= len(self.schedule):
+            self.epoch += 1
+            self.index = 0
+            self.schedule = self._make_schedule(self.epoch)
+        sys_idx = int(self.schedule[self.index])
+        self.index += 1
+        return sys_idx
+
+    def get_state(self) -> Dict[str, int]:
+        """Get the position of the sampler.
+
+        Returns
+        -------
+        dict
+            the seed, the epoch and the index in the epoch
+        """
+        return {"seed": self.seed, "epoch": self.epoch, "index": self.index}
+
+    def set_state(self, state: Dict[str, int]):
+        """Restore the position of the sampler.
+
+        Parameters
+        ----------
+        state : dict
+            the state returned by :meth:`get_state`
+        """
+        self.seed = int(state["seed"])
+        self.epoch = int(state["epoch"])
+        self.index = int(state["index"])
+        self.schedule = self._make_schedule(self.epoch)
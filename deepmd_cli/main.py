@@ -129,6 +129,7 @@ def main_parser() -> argparse.ArgumentParser:
             dp train input.json
             dp train input.json --restart model.ckpt
             dp train input.json --init-model model.ckpt
+            dp train input.json --benchmark 100
         """
         ),
     )
@@ -176,6 +177,20 @@ def main_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Skip calculating neighbor statistics. Sel checking, automatic sel, and model compression will be disabled.",
     )
+    parser_train.add_argument(
+        "--benchmark",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Instead of training, measure the training throughput on N steps with "
+        "batches cached in memory. No validation is performed and no checkpoint is saved.",
+    )
+    parser_train.add_argument(
+        "--benchmark-output",
+        type=str,
+        default="benchmark.json",
+        help="The output file of the benchmark results.",
+    )
 
     # * freeze script ******************************************************************
     parser_frz = subparsers.add_parser(
@@ -536,6 +551,246 @@ def main_parser() -> argparse.ArgumentParser:
         help="treat all types as a single type. Used with se_atten descriptor.",
     )
 
+    # * benchmark inference **********************************************************
+    parser_bench = subparsers.add_parser(
+        "bench",
+        parents=[parser_log],
+        help="benchmark the inference performance of frozen models",
+        formatter_class=RawTextArgumentDefaultsHelpFormatter,
+        epilog=textwrap.dedent(
+            """\
+        examples:
+            dp bench -m graph.pb -n 192 1536 -o bench.json
+            dp bench -m graph.pb graph-compress.pb -n 192
+            dp bench -m graph.000.pb graph.001.pb graph.002.pb graph.003.pb
+        """
+        ),
+    )
+    parser_bench.add_argument(
+        "-m",
+        "--models",
+        default=["frozen_model.pb"],
+        nargs="+",
+        type=str,
+        help="Frozen models to benchmark. If more than one energy model is given, "
+        "the model deviation of them is also benchmarked.",
+    )
+    parser_bench.add_argument(
+        "-n",
+        "--natoms",
+        default=[192],
+        nargs="+",
+        type=int,
+        help="The numbers of atoms of the synthetic systems",
+    )
+    parser_bench.add_argument(
+        "-d",
+        "--density",
+        default=0.1,
+        type=float,
+        help="The number density of atoms in the synthetic systems, in 1/Angstrom^3",
+    )
+    parser_bench.add_argument(
+        "-t",
+        "--ntypes",
+        default=None,
+        type=int,
+        help="The number of atom types in the synthetic systems. "
+        "All types of the model are used if not given.",
+    )
+    parser_bench.add_argument(
+        "-f",
+        "--nframes",
+        default=8,
+        type=int,
+        help="The number of frames in a batch",
+    )
+    parser_bench.add_argument(
+        "--nloop",
+        default=20,
+        type=int,
+        help="The number of timed evaluations of each case",
+    )
+    parser_bench.add_argument(
+        "--warmup",
+        default=3,
+        type=int,
+        help="The number of evaluations before timing",
+    )
+    parser_bench.add_argument(
+        "-o",
+        "--output",
+        default="bench.json",
+        type=str,
+        help="The output JSON file of the benchmark results",
+    )
+    parser_bench.add_argument(
+        "-r", "--seed", type=int, default=None, help="The random seed"
+    )
+
+    # * extract descriptors **********************************************************
+    parser_eval_desc = subparsers.add_parser(
+        "eval-desc",
+        parents=[parser_log],
+        help="evaluate the descriptors of systems and write them to the disk",
+        formatter_class=RawTextArgumentDefaultsHelpFormatter,
+        epilog=textwrap.dedent(
+            """\
+        examples:
+            dp eval-desc -m graph.pb -s /path/to/systems -o desc
+            dp eval-desc -m graph.pb -s /path/to/systems -o desc --pooling mean --dtype float16 --format hdf5
+        """
+        ),
+    )
+    parser_eval_desc.add_argument(
+        "-m",
+        "--model",
+        default="frozen_model.pb",
+        type=str,
+        help="Frozen energy model file to import",
+    )
+    parser_eval_desc_subgroup = parser_eval_desc.add_mutually_exclusive_group()
+    parser_eval_desc_subgroup.add_argument(
+        "-s",
+        "--system",
+        default=".",
+        type=str,
+        help="The system dir. Recursively detect systems in this directory",
+    )
+    parser_eval_desc_subgroup.add_argument(
+        "-f",
+        "--datafile",
+        default=None,
+        type=str,
+        help="The path to file of system list.",
+    )
+    parser_eval_desc.add_argument(
+        "-S", "--set-prefix", default="set", type=str, help="The set prefix"
+    )
+    parser_eval_desc.add_argument(
+        "-o",
+        "--output",
+        default="descriptors",
+        type=str,
+        help="The output directory",
+    )
+    parser_eval_desc.add_argument(
+        "--pooling",
+        default="none",
+        type=str,
+        choices=["none", "mean", "max"],
+        help="Pooling of the descriptors over atoms in each frame",
+    )
+    parser_eval_desc.add_argument(
+        "--dtype",
+        default="float32",
+        type=str,
+        choices=["float32", "float16"],
+        help="The data type of the output",
+    )
+    parser_eval_desc.add_argument(
+        "--format",
+        default="npy",
+        type=str,
+        choices=["npy", "hdf5"],
+        help="The output format. npy files can be opened as memory-mapped arrays",
+    )
+    parser_eval_desc.add_argument(
+        "--chunk-atoms",
+        default=65536,
+        type=int,
+        help="The number of atoms evaluated and written at once",
+    )
+
+    # * deduplicate data ***********************************************************
+    parser_dedup = subparsers.add_parser(
+        "dedup",
+        parents=[parser_log],
+        help="remove near-duplicate frames from systems and subsample them by diversity",
+        formatter_class=RawTextArgumentDefaultsHelpFormatter,
+        epilog=textwrap.dedent(
+            """\
+        examples:
+            dp dedup -s /path/to/systems -o dedup_data
+            dp dedup -s /path/to/systems -o dedup_data.h5 -m graph.pb -n 10000
+        """
+        ),
+    )
+    parser_dedup_subgroup = parser_dedup.add_mutually_exclusive_group()
+    parser_dedup_subgroup.add_argument(
+        "-s",
+        "--system",
+        default=".",
+        type=str,
+        help="The system dir. Recursively detect systems in this directory",
+    )
+    parser_dedup_subgroup.add_argument(
+        "-f",
+        "--datafile",
+        default=None,
+        type=str,
+        help="The path to file of system list.",
+    )
+    parser_dedup.add_argument(
+        "-S", "--set-prefix", default="set", type=str, help="The set prefix"
+    )
+    parser_dedup.add_argument(
+        "-o",
+        "--output",
+        default="dedup_data",
+        type=str,
+        help="The output directory, or the HDF5 file if it ends with .h5 or .hdf5",
+    )
+    parser_dedup.add_argument(
+        "-m",
+        "--model",
+        default=None,
+        type=str,
+        help="Frozen energy model whose descriptors are used as the fingerprints. "
+        "If not given, the histograms of neighbor distances are used",
+    )
+    parser_dedup.add_argument(
+        "--rcut",
+        default=6.0,
+        type=float,
+        help="The cutoff radius of the distance histograms",
+    )
+    parser_dedup.add_argument(
+        "--nbins",
+        default=32,
+        type=int,
+        help="The number of bins of the distance histograms",
+    )
+    parser_dedup.add_argument(
+        "-t",
+        "--threshold",
+        default=0.05,
+        type=float,
+        help="Frames whose normalized fingerprints are closer than this distance "
+        "are duplicates. Deduplication is disabled if it is not positive",
+    )
+    parser_dedup.add_argument(
+        "-n",
+        "--nframes",
+        default=None,
+        type=int,
+        help="The total number of frames to keep after deduplication. "
+        "If not given, all unique frames are kept",
+    )
+    parser_dedup.add_argument(
+        "--seed",
+        default=None,
+        type=int,
+        help="The random seed",
+    )
+    parser_dedup.add_argument(
+        "-j",
+        "--jobs",
+        default=1,
+        type=int,
+        help="The number of processes computing the distance histograms in parallel",
+    )
+
     # --version
     parser.add_argument(
         "--version", action="version", version="DeePMD-kit v%s" % __version__
@@ -362,6 +362,26 @@ class TestParserOutput(unittest.TestCase):
 
         self.run_test(command="model-devi", mapping=ARGS)
 
+    def test_parser_bench(self):
+        """Test bench subparser."""
+        ARGS = {
+            "--models": {
+                "type": list,
+                "value": "GRAPH.000.pb GRAPH.001.pb",
+                "expected": ["GRAPH.000.pb", "GRAPH.001.pb"],
+            },
+            "--natoms": {
+                "type": list,
+                "value": "192 1536",
+                "expected": [192, 1536],
+            },
+            "--density": {"type": float, "value": 0.1},
+            "--nframes": {"type": int, "value": 8},
+            "--output": {"type": str, "value": "OUTFILE"},
+        }
+
+        self.run_test(command="bench", mapping=ARGS)
+
     def test_get_log_level(self):
         MAPPING = {
             "DEBUG": 10,
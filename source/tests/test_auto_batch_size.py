@@ -90,3 +90,18 @@ class TestAutoBatchSize(unittest.TestCase):
         auto_batch_size = AutoBatchSize(256, 2.0)
         dd2 = auto_batch_size.execute_all(np.array, 10000, 2, dd1)
         np.testing.assert_equal(dd1, dd2)
+
+    def test_execute_all_tuple(self):
+        dd1 = np.random.random((1000, 3))
+        dd2 = np.random.random((1000, 4, 2))
+        auto_batch_size = AutoBatchSize(256, 2.0)
+
+        def func(aa, bb):
+            # the second output has two rows per frame
+            if aa.shape[0] * 2 >= 512:
+                raise OutOfMemoryError
+            return aa * 2, bb.reshape(-1, 4)
+
+        rr1, rr2 = auto_batch_size.execute_all(func, 1000, 2, dd1, bb=dd2)
+        np.testing.assert_equal(rr1, dd1 * 2)
+        np.testing.assert_equal(rr2, dd2.reshape(-1, 4))
@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import json
+import os
+import unittest
+
+import numpy as np
+from common import (
+    tests_path,
+)
+
+from deepmd.entrypoints.bench import (
+    bench,
+    make_synthetic_system,
+)
+from deepmd.utils.convert import (
+    convert_pbtxt_to_pb,
+)
+
+
+class TestSyntheticSystem(unittest.TestCase):
+    def test_system(self):
+        coord, box, atype = make_synthetic_system(64, 0.1, 2, nframes=3, seed=1)
+        self.assertEqual(coord.shape, (3, 64, 3))
+        self.assertEqual(box.shape, (3, 9))
+        self.assertEqual(atype.shape, (64,))
+        np.testing.assert_allclose(box[:, 0], np.full(3, (64 / 0.1) ** (1 / 3)))
+        self.assertTrue(np.all((atype >= 0) & (atype < 2)))
+        # atoms are not too close
+        dist = np.linalg.norm(coord[0, :, None, :] - coord[0, None, :, :], axis=-1)
+        self.assertGreater(np.min(dist + np.eye(64) * 100), 0.5)
+
+
+class TestBench(unittest.TestCase):
+    def setUp(self):
+        self.models = ["bench_model.0.pb", "bench_model.1.pb"]
+        for mm in self.models:
+            convert_pbtxt_to_pb(
+                str(tests_path / os.path.join("infer", "deeppot.pbtxt")), mm
+            )
+        self.output = "bench_test.json"
+
+    def tearDown(self):
+        for ff in [*self.models, self.output]:
+            if os.path.exists(ff):
+                os.remove(ff)
+
+    def test_bench(self):
+        bench(
+            models=self.models,
+            natoms=[16, 32],
+            density=0.1,
+            ntypes=None,
+            nframes=2,
+            nloop=2,
+            warmup=1,
+            output=self.output,
+            seed=1,
+        )
+        with open(self.output) as f:
+            results = json.load(f)["results"]
+        cases = {(rr["model"], rr["case"], rr["natoms"]) for rr in results}
+        for nn in (16, 32):
+            for mm in self.models:
+                for case in ("single", "batched", "atomic"):
+                    self.assertIn((mm, case, nn), cases)
+            self.assertIn(("+".join(self.models), "model_devi", nn), cases)
+        for rr in results:
+            self.assertGreater(rr["atoms_per_second"], 0.0)
+            self.assertLessEqual(rr["p50"], rr["p99"])
+            self.assertFalse(rr["compressed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
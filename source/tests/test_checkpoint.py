@@ -0,0 +1,121 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import glob
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.train.checkpoint import (
+    DATA_STATE_SUFFIX,
+    CheckpointWriter,
+    load_data_state,
+    save_data_state,
+    select_checkpoints_to_keep,
+)
+
+
+class TestSelectCheckpoints(unittest.TestCase):
+    def test_keep_recent(self):
+        self.assertEqual(select_checkpoints_to_keep([1, 2, 3, 4], 2), [3, 4])
+
+    def test_keep_all(self):
+        self.assertEqual(select_checkpoints_to_keep([1, 2, 3, 4], 0), [1, 2, 3, 4])
+
+    def test_keep_freq(self):
+        self.assertEqual(
+            select_checkpoints_to_keep([1, 2, 3, 4, 5, 6, 7], 2, 3), [3, 6, 7]
+        )
+
+
+class TestDataState(unittest.TestCase):
+    def setUp(self):
+        self.path = "data_state_test.npz"
+
+    def tearDown(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def test_round_trip(self):
+        rng = np.random.RandomState(1)
+        state = {
+            "random": rng.get_state(),
+            "train": {
+                "pick_idx": 1,
+                "systems": [
+                    {"set_count": 0, "iterator": 0},
+                    {"set_count": 3, "iterator": 2, "batch_idx": np.array([2, 0, 1])},
+                ],
+                "sampler": None,
+            },
+        }
+        save_data_state(self.path, state)
+        loaded = load_data_state(self.path)
+        self.assertEqual(loaded["train"]["pick_idx"], 1)
+        self.assertNotIn("sampler", loaded["train"])
+        self.assertEqual(loaded["train"]["systems"][0], {"set_count": 0, "iterator": 0})
+        np.testing.assert_equal(loaded["train"]["systems"][1]["batch_idx"], [2, 0, 1])
+        rng_loaded = np.random.RandomState()
+        rng_loaded.set_state(tuple(loaded["random"]))
+        np.testing.assert_equal(rng_loaded.random_sample(5), rng.random_sample(5))
+
+
+class TestCheckpointWriter(unittest.TestCase):
+    def setUp(self):
+        self.save_dir = "ckpt_test_dir"
+        self.save_ckpt = os.path.join(self.save_dir, "model.ckpt")
+        os.makedirs(self.save_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.save_dir, ignore_errors=True)
+
+    def _run(self, async_write):
+        with tf.Graph().as_default():
+            var = tf.Variable(tf.zeros([3], dtype=tf.float64), name="var")
+            inc = var.assign_add(tf.ones([3], dtype=tf.float64))
+            saver = tf.train.Saver(save_relative_paths=True)
+            writer = CheckpointWriter(
+                saver,
+                self.save_ckpt,
+                max_ckpt_keep=2,
+                keep_ckpt_freq=3,
+                async_write=async_write,
+            )
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                for ii in range(1, 8):
+                    sess.run(inc)
+                    writer.save(sess, ii, data_state={"ranks": [{"step": ii}]})
+                writer.close()
+        kept = sorted(glob.glob(self.save_ckpt + "-*.index"))
+        self.assertEqual(kept, [f"{self.save_ckpt}-{ii}.index" for ii in (3, 6, 7)])
+        self.assertEqual(
+            tf.train.latest_checkpoint(self.save_dir),
+            os.path.join(self.save_dir, "model.ckpt-7"),
+        )
+        with tf.Graph().as_default():
+            saver = tf.train.import_meta_graph(self.save_ckpt + ".meta")
+            with tf.Session() as sess:
+                saver.restore(sess, self.save_ckpt)
+                value = sess.run(tf.get_default_graph().get_tensor_by_name("var:0"))
+        np.testing.assert_allclose(value, np.full(3, 7.0))
+        # the data state is kept and linked with the checkpoint
+        kept = sorted(glob.glob(self.save_ckpt + "-*" + DATA_STATE_SUFFIX))
+        self.assertEqual(
+            kept, [f"{self.save_ckpt}-{ii}{DATA_STATE_SUFFIX}" for ii in (3, 6, 7)]
+        )
+        state = load_data_state(self.save_ckpt + DATA_STATE_SUFFIX)
+        self.assertEqual(state, {"ranks": [{"step": 7}]})
+
+    def test_sync(self):
+        self._run(False)
+
+    def test_async(self):
+        self._run(True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,55 +12,77 @@ from deepmd.cluster import (
 kHostName = "compute-b24-1"
 
 
-class FakePopen:
-    def __init__(self, stdout=b"", stderr=b"", returncode=0):
-        self._stdout = stdout
-        self._stderr = stderr
-        self._returncode = returncode
-
-    def communicate(self):
-        return self._stdout, self._stderr
-
-    @property
-    def returncode(self):
-        return self._returncode
+class TestGPU(unittest.TestCase):
+    def setUp(self):
+        local._detect_gpus.cache_clear()
 
+    def tearDown(self):
+        local._detect_gpus.cache_clear()
 
-class TestGPU(unittest.TestCase):
+    @mock.patch.dict("os.environ", clear=True)
+    @mock.patch("tensorflow.compat.v1.config.experimental.list_physical_devices")
     @mock.patch("tensorflow.compat.v1.test.is_built_with_cuda")
-    @mock.patch("subprocess.Popen")
-    def test_none(self, mock_Popen, mock_is_built_with_cuda):
-        mock_Popen.return_value.__enter__.return_value = FakePopen(b"0", b"")
+    def test_none(self, mock_is_built_with_cuda, mock_list_physical_devices):
+        mock_list_physical_devices.return_value = []
         mock_is_built_with_cuda.return_value = True
         gpus = local.get_gpus()
         self.assertIsNone(gpus)
 
+    @mock.patch.dict("os.environ", clear=True)
+    @mock.patch("tensorflow.compat.v1.config.experimental.list_physical_devices")
     @mock.patch("tensorflow.compat.v1.test.is_built_with_cuda")
-    @mock.patch("subprocess.Popen")
-    def test_valid(self, mock_Popen, mock_is_built_with_cuda):
-        mock_Popen.return_value.__enter__.return_value = FakePopen(b"2", b"")
+    def test_valid(self, mock_is_built_with_cuda, mock_list_physical_devices):
+        mock_list_physical_devices.return_value = ["GPU:0", "GPU:1"]
         mock_is_built_with_cuda.return_value = True
         gpus = local.get_gpus()
         self.assertEqual(gpus, [0, 1])
+        # cached
+        gpus = local.get_gpus()
+        self.assertEqual(gpus, [0, 1])
+        mock_list_physical_devices.assert_called_once_with("GPU")
 
+    @mock.patch.dict("os.environ", clear=True)
+    @mock.patch("tensorflow.compat.v1.config.experimental.list_physical_devices")
     @mock.patch("tensorflow.compat.v1.test.is_built_with_cuda")
-    @mock.patch("subprocess.Popen")
-    def test_error(self, mock_Popen, mock_is_built_with_cuda):
-        mock_Popen.return_value.__enter__.return_value = FakePopen(
-            stderr=b"!", returncode=1
-        )
+    def test_error(self, mock_is_built_with_cuda, mock_list_physical_devices):
+        mock_list_physical_devices.side_effect = ValueError("!")
         mock_is_built_with_cuda.return_value = True
         with self.assertRaises(RuntimeError) as cm:
             _ = local.get_gpus()
-            self.assertIn("Failed to detect", str(cm.exception))
+        self.assertIn("Failed to detect", str(cm.exception))
 
+    @mock.patch("tensorflow.compat.v1.config.experimental.list_physical_devices")
+    @mock.patch("tensorflow.compat.v1.test.is_built_with_cuda")
+    def test_env(self, mock_is_built_with_cuda, mock_list_physical_devices):
+        mock_is_built_with_cuda.return_value = True
+        for environ, expected in (
+            ({"CUDA_VISIBLE_DEVICES": "2,3"}, [0, 1]),
+            ({"CUDA_VISIBLE_DEVICES": "GPU-a1b2,GPU-c3d4,GPU-e5f6"}, [0, 1, 2]),
+            ({"CUDA_VISIBLE_DEVICES": "0,-1,1"}, [0]),
+            ({"CUDA_VISIBLE_DEVICES": "-1"}, None),
+            ({"CUDA_VISIBLE_DEVICES": ""}, None),
+            ({"SLURM_JOB_GPUS": "4,5,6,7"}, [0, 1, 2, 3]),
+            ({"SLURM_STEP_GPUS": "1", "SLURM_JOB_GPUS": "0,1"}, [0]),
+            ({"CUDA_VISIBLE_DEVICES": "", "SLURM_JOB_GPUS": "0,1"}, None),
+        ):
+            with mock.patch.dict("os.environ", environ, clear=True):
+                self.assertEqual(local.get_gpus(), expected)
+        mock_list_physical_devices.assert_not_called()
+
+    @mock.patch("tensorflow.compat.v1.config.experimental.list_physical_devices")
     @mock.patch("tensorflow.compat.v1.test.is_built_with_rocm", create=True)
     @mock.patch("tensorflow.compat.v1.test.is_built_with_cuda")
-    def test_cpu(self, mock_is_built_with_cuda, mock_is_built_with_rocm):
+    def test_cpu(
+        self,
+        mock_is_built_with_cuda,
+        mock_is_built_with_rocm,
+        mock_list_physical_devices,
+    ):
         mock_is_built_with_cuda.return_value = False
         mock_is_built_with_rocm.return_value = False
         gpus = local.get_gpus()
         self.assertIsNone(gpus)
+        mock_list_physical_devices.assert_not_called()
 
 
 class TestLocal(unittest.TestCase):
@@ -1,5 +1,9 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 import os
+import tempfile
+from unittest import (
+    mock,
+)
 
 import numpy as np
 from common import (
@@ -164,3 +168,45 @@ class TestDataModifier(tf.test.TestCase):
         np.testing.assert_almost_equal(
             t_esti.ravel(), vv.ravel(), places, err_msg="virial component failed"
         )
+
+    def test_fused(self):
+        dcm = DipoleChargeModifier(
+            str(tests_path / os.path.join(modifier_datapath, "dipole.pb")),
+            [-8],
+            [6, 1],
+            1,
+            0.25,
+        )
+        data = Data()
+        coord, box, atype = data.get_data()
+        atype = atype[0]
+        ve, vf, vv = dcm.eval(coord, box, atype)
+        dcm.fused = True
+        fe, ff, fv = dcm.eval(coord, box, atype)
+        np.testing.assert_almost_equal(fe.ravel(), ve.ravel(), global_default_places)
+        np.testing.assert_almost_equal(ff.ravel(), vf.ravel(), global_default_places)
+        np.testing.assert_almost_equal(fv.ravel(), vv.ravel(), global_default_places)
+
+    def test_cache(self):
+        data = Data()
+        coord, box, atype = data.get_data()
+        atype = atype[0]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dcm = DipoleChargeModifier(
+                str(tests_path / os.path.join(modifier_datapath, "dipole.pb")),
+                [-8],
+                [6, 1],
+                1,
+                0.25,
+                cache_dir=cache_dir,
+            )
+            ve, vf, vv = dcm.eval_cached(coord, box, atype)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            with mock.patch.object(dcm, "eval", side_effect=RuntimeError):
+                ce, cf, cv = dcm.eval_cached(coord, box, atype)
+            np.testing.assert_equal(ce, ve)
+            np.testing.assert_equal(cf, vf)
+            np.testing.assert_equal(cv, vv)
+            # different frames are not read from the cache
+            dcm.eval_cached(coord + 0.01, box, atype)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
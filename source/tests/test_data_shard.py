@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from deepmd.utils.data_shard import (
+    get_sys_set_nframes,
+    partition_systems,
+    shard_systems,
+)
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+    get_sys_probs,
+)
+
+
+class TestPartitionSystems(unittest.TestCase):
+    def test_balance(self):
+        masses = [[0.1], [0.05, 0.05, 0.05, 0.05], [0.2], [0.3, 0.1], [0.1]]
+        shards = partition_systems(masses, 4)
+        self.assertEqual(len(shards), 4)
+        assigned = sorted(
+            (ii, jj) for shard in shards for ii, sets in shard for jj in sets
+        )
+        self.assertEqual(
+            assigned,
+            sorted((ii, jj) for ii, mm in enumerate(masses) for jj in range(len(mm))),
+        )
+        loads = [
+            sum(masses[ii][jj] for ii, sets in shard for jj in sets) for shard in shards
+        ]
+        self.assertAlmostEqual(sum(loads), 1.0)
+        self.assertLessEqual(max(loads), 0.3 + 1e-10)
+        self.assertGreaterEqual(min(loads), 0.2 - 1e-10)
+
+    def test_split_large_system(self):
+        shards = partition_systems([[0.25, 0.25, 0.25, 0.25]], 4)
+        self.assertEqual(
+            sorted(shards), [[(0, [0])], [(0, [1])], [(0, [2])], [(0, [3])]]
+        )
+
+    def test_zero_mass(self):
+        shards = partition_systems([[0.5], [0.0], [0.5]], 2)
+        self.assertEqual(sorted(shards), [[(0, [0])], [(2, [0])]])
+
+    def test_too_few(self):
+        self.assertIsNone(partition_systems([[0.5], [0.5]], 3))
+
+
+class TestShardSystems(unittest.TestCase):
+    def setUp(self):
+        self.nframes = [[3, 3], [4, 5, 6, 7], [2], [10]]
+        self.natoms = [3, 4, 6, 5]
+        self.systems = []
+        for ii, sys_nframes in enumerate(self.nframes):
+            sys_name = "shard_sys_%d" % ii
+            self.systems.append(sys_name)
+            os.makedirs(sys_name, exist_ok=True)
+            np.savetxt(
+                os.path.join(sys_name, "type.raw"),
+                np.zeros(self.natoms[ii], dtype=int),
+                fmt="%d",
+            )
+            for jj, nn in enumerate(sys_nframes):
+                set_name = os.path.join(sys_name, "set.%03d" % jj)
+                os.makedirs(set_name, exist_ok=True)
+                np.save(
+                    os.path.join(set_name, "coord.npy"),
+                    np.random.random([nn, self.natoms[ii] * 3]),
+                )
+                np.save(
+                    os.path.join(set_name, "box.npy"), np.random.random([nn, 9]) * 10
+                )
+
+    def tearDown(self):
+        for sys_name in self.systems:
+            shutil.rmtree(sys_name)
+
+    def test_nframes(self):
+        self.assertEqual(
+            get_sys_set_nframes(self.systems[1]),
+            {"set.000": 4, "set.001": 5, "set.002": 6, "set.003": 7},
+        )
+
+    def test_shard(self):
+        size = 3
+        nbatches = [sum(nn) for nn in self.nframes]
+        global_probs = get_sys_probs(None, "prob_sys_size", nbatches)
+        sys_probs = np.zeros(len(self.systems))
+        loaded = []
+        for rank in range(size):
+            shard = shard_systems(self.systems, 1, rank, size)
+            self.assertIsNotNone(shard)
+            self.assertAlmostEqual(np.sum(shard["sys_probs"]), 1.0)
+            for sys_name, sets, prob in zip(
+                shard["systems"], shard["sys_sets"], shard["sys_probs"]
+            ):
+                ii = self.systems.index(sys_name)
+                sys_probs[ii] += prob / size
+                loaded.extend((ii, ss) for ss in sets)
+            data = DeepmdDataSystem(
+                shard["systems"],
+                shard["batch_size"],
+                1,
+                6.0,
+                trn_all_set=True,
+                sys_probs=shard["sys_probs"],
+                sys_sets=shard["sys_sets"],
+            )
+            for ii, sets in enumerate(shard["sys_sets"]):
+                self.assertEqual(data.get_sys(ii).get_numb_set(), len(sets))
+            np.testing.assert_allclose(data.sys_probs, shard["sys_probs"])
+        # each set is loaded by one rank
+        self.assertEqual(
+            sorted(loaded),
+            sorted(
+                (ii, "set.%03d" % jj)
+                for ii, nn in enumerate(self.nframes)
+                for jj in range(len(nn))
+            ),
+        )
+        # balanced shards keep the global probabilities
+        np.testing.assert_allclose(sys_probs, global_probs, atol=0.05)
+
+    def test_batch_size_list(self):
+        shard = shard_systems(self.systems, [1, 2, 3, 4], 0, 2)
+        for sys_name, bs in zip(shard["systems"], shard["batch_size"]):
+            self.assertEqual(bs, self.systems.index(sys_name) + 1)
+
+    def test_too_few(self):
+        self.assertIsNone(shard_systems(self.systems[2:], 1, 0, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
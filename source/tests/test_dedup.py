@@ -0,0 +1,158 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import json
+import os
+import shutil
+import unittest
+
+import dpdata
+import numpy as np
+
+from deepmd.entrypoints.dedup import (
+    FingerprintIndex,
+    dedup,
+    diversity_subsample,
+    structure_fingerprint,
+)
+from deepmd.utils.data import (
+    DeepmdData,
+)
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.box = np.eye(3).reshape([-1]) * 8.0
+        self.coord = rng.random((20, 3)) * 8.0
+        self.atype = np.array([0] * 10 + [1] * 10)
+
+    def test_brute_force(self):
+        rcut, nbins = 4.0, 16
+        fp = structure_fingerprint(self.coord, self.box, self.atype, 2, rcut, nbins)
+        expected = np.zeros((2, 2, nbins))
+        shifts = np.stack(
+            np.meshgrid(*[np.arange(-1, 2)] * 3, indexing="ij"), axis=-1
+        ).reshape([-1, 3])
+        for ii in range(20):
+            for jj in range(20):
+                for ss in shifts:
+                    if ii == jj and not np.any(ss):
+                        continue
+                    rr = np.linalg.norm(self.coord[jj] + ss * 8.0 - self.coord[ii])
+                    if rr < rcut:
+                        ibin = min(int(rr / rcut * nbins), nbins - 1)
+                        expected[self.atype[ii], self.atype[jj], ibin] += 1
+        np.testing.assert_allclose(fp, expected.reshape([-1]) / 20)
+
+    def test_invariance(self):
+        fp0 = structure_fingerprint(self.coord, self.box, self.atype, 2, 4.0, 16)
+        perm = np.random.default_rng(1).permutation(20)
+        fp1 = structure_fingerprint(
+            self.coord[perm] + 3.3, self.box, self.atype[perm], 2, 4.0, 16
+        )
+        np.testing.assert_allclose(fp0, fp1)
+
+    def test_index(self):
+        rng = np.random.default_rng(2)
+        base = rng.random((50, 32))
+        fps = np.concatenate([base, base + rng.normal(scale=1e-4, size=base.shape)])
+        fps /= np.linalg.norm(fps, axis=1, keepdims=True)
+        index = FingerprintIndex(32, 0.2, seed=1)
+        keep = index.add_unique(b"a", fps, 0.05)
+        np.testing.assert_array_equal(keep, [True] * 50 + [False] * 50)
+        # different keys are never duplicates
+        keep = index.add_unique(b"b", fps[:50], 0.05)
+        self.assertTrue(np.all(keep))
+
+    def test_subsample(self):
+        rng = np.random.default_rng(3)
+        # a dense cluster and a few sparse frames
+        fps = np.concatenate(
+            [
+                np.tile([1.0, 0.0, 0.0], (90, 1))
+                + rng.normal(scale=1e-3, size=(90, 3)),
+                rng.normal(size=(10, 3)),
+            ]
+        )
+        fps /= np.linalg.norm(fps, axis=1, keepdims=True)
+        sel = diversity_subsample(fps, [b"a"] * 100, 10, seed=0)
+        self.assertEqual(sel.size, 10)
+        self.assertEqual(np.unique(sel).size, 10)
+        # the dense cluster does not dominate the selection
+        self.assertLess(np.sum(sel < 90), 10)
+
+
+class TestDedup(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.natoms = 6
+        unique = rng.random((4, self.natoms, 3)) * 6.0
+        # frames 4-7 are near duplicates of frames 0-3
+        coords = np.concatenate(
+            [unique, unique + rng.normal(scale=1e-5, size=unique.shape)]
+        )
+        self.nframes = coords.shape[0]
+        self.test_data = "test_dedup_system"
+        self.output = "test_dedup_output"
+        system = dpdata.LabeledSystem(
+            data={
+                "orig": np.zeros(3),
+                "atom_names": ["O", "H"],
+                "atom_numbs": [2, 4],
+                "atom_types": np.array([0, 1, 1, 0, 1, 1]),
+                "cells": np.tile(np.eye(3) * 6.0, (self.nframes, 1, 1)),
+                "coords": coords,
+                "energies": np.arange(self.nframes, dtype=float),
+                "forces": np.zeros((self.nframes, self.natoms, 3)),
+            }
+        )
+        system.to_deepmd_npy(self.test_data, set_size=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data, ignore_errors=True)
+        shutil.rmtree(self.output, ignore_errors=True)
+        if os.path.isfile(self.output + ".h5"):
+            os.remove(self.output + ".h5")
+
+    def _dedup(self, output, **kwargs):
+        dedup(
+            system=self.test_data,
+            datafile=None,
+            set_prefix="set",
+            output=output,
+            rcut=3.0,
+            nbins=16,
+            seed=0,
+            **kwargs,
+        )
+
+    def _load_energies(self, sys_path):
+        data = DeepmdData(sys_path, "set", shuffle_test=False)
+        data.add("energy", 1, atomic=False, must=True, high_prec=True)
+        energies = [data._load_set(ss)["energy"] for ss in data.dirs]
+        return np.concatenate(energies).reshape([-1])
+
+    def test_dedup(self):
+        self._dedup(self.output)
+        with open(os.path.join(self.output, "index.json")) as f:
+            index = json.load(f)
+        self.assertEqual(index["systems"][0]["nframes"], self.nframes)
+        self.assertEqual(index["systems"][0]["kept"], 4)
+        sys_path = os.path.join(self.output, index["systems"][0]["output"])
+        np.testing.assert_allclose(self._load_energies(sys_path), [0, 1, 2, 3])
+        np.testing.assert_array_equal(
+            np.loadtxt(os.path.join(sys_path, "type_map.raw"), dtype=str), ["O", "H"]
+        )
+
+    def test_hdf5_subsample(self):
+        output = self.output + ".h5"
+        self._dedup(output, nframes=2, jobs=2)
+        energies = self._load_energies(output + "#/000000")
+        self.assertEqual(energies.size, 2)
+        self.assertTrue(np.all(energies < 4))
+
+    def test_no_dedup(self):
+        self._dedup(self.output, threshold=0.0)
+        sys_path = os.path.join(self.output, "000000")
+        np.testing.assert_allclose(
+            self._load_energies(sys_path), np.arange(self.nframes)
+        )
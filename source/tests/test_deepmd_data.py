@@ -183,6 +183,27 @@ class TestData(unittest.TestCase):
         self.assertEqual(data["find_test_null"], 0)
         self._comp_np_mat2(data["test_null"], self.test_null)
 
+    def test_load_set_public(self):
+        class Modifier:
+            def __init__(self):
+                self.numb_calls = 0
+
+            def modify_data(self, data, data_sys):
+                self.numb_calls += 1
+                data["coord"] += 1.0
+
+        modifier = Modifier()
+        dd = DeepmdData(self.data_name, modifier=modifier).add(
+            "test_frame", 5, atomic=False, must=True
+        )
+        # loading the batches shuffles and modifies the set in use
+        dd.get_batch(1)
+        self.assertEqual(modifier.numb_calls, 1)
+        data = dd.load_set(os.path.join(self.data_name, "set.foo"))
+        self.assertEqual(modifier.numb_calls, 1)
+        self._comp_np_mat2(data["coord"], self.coord)
+        self._comp_np_mat2(data["test_frame"], self.test_frame)
+
     def test_shuffle(self):
         dd = (
             DeepmdData(self.data_name)
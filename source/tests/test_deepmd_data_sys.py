@@ -433,3 +433,138 @@ class TestDataSystem(unittest.TestCase):
                 data[kk][0, 3 * self.test_ndof : 6 * self.test_ndof],
                 np.zeros(3 * self.test_ndof),
             )
+
+    def test_state(self):
+        """Test resuming get_batch from the saved state."""
+        batch_size = 2
+        test_size = 1
+        random.seed(1)
+        ds = DeepmdDataSystem(self.sys_name, batch_size, test_size, 2.0)
+        ds.add("test", self.test_ndof, atomic=True, must=True)
+        for _ in range(7):
+            ds.get_batch()
+        random_state = random.get_state()
+        state = ds.get_state()
+        expected = [ds.get_batch() for _ in range(20)]
+        # a new data system resumes from the middle of the sets
+        random.seed(2)
+        ds = DeepmdDataSystem(self.sys_name, batch_size, test_size, 2.0)
+        ds.add("test", self.test_ndof, atomic=True, must=True)
+        ds.set_state(state)
+        random.set_state(random_state)
+        for ee in expected:
+            data = ds.get_batch()
+            for kk in ("coord", "box", "test"):
+                np.testing.assert_equal(data[kk], ee[kk])
+
+    def test_data_prec(self):
+        """Test storing the data in float32."""
+        batch_size = 3
+        test_size = 2
+        ds = DeepmdDataSystem(
+            self.sys_name, batch_size, test_size, 2.0, data_prec=np.float32
+        )
+        ds.add("test", self.test_ndof, atomic=True, must=True)
+        ds.add("energy", 1, atomic=False, must=False, high_prec=True)
+        ds.reduce("test_sum", "test")
+        sys_idx = 2
+        data = ds.get_batch(sys_idx=sys_idx)
+        self.assertEqual(data["coord"].dtype, np.float32)
+        self.assertEqual(data["box"].dtype, np.float32)
+        self.assertEqual(data["test"].dtype, np.float32)
+        # high precision items and reductions are not affected
+        self.assertEqual(data["energy"].dtype, np.float64)
+        self.assertEqual(data["test_sum"].dtype, np.float64)
+        # the reduction sums the stored data in high precision
+        np.testing.assert_allclose(
+            data["test_sum"],
+            np.sum(
+                data["test"]
+                .astype(np.float64)
+                .reshape([batch_size, self.natoms[sys_idx], self.test_ndof]),
+                axis=1,
+            ),
+            rtol=1e-12,
+        )
+        self._in_array(
+            np.load("sys_2/set.000/coord.npy").astype(np.float32),
+            ds.get_sys(sys_idx).idx_map,
+            3,
+            data["coord"],
+        )
+
+    def test_get_mixed_batch_bucket(self):
+        """Test get_batch with mixed system grouped by the number of atoms."""
+        batch_size = "mixed:4"
+        test_size = 2
+        for bucket_natoms in (2, [4]):
+            ds = DeepmdDataSystem(
+                self.sys_name, batch_size, test_size, 2.0, bucket_natoms=bucket_natoms
+            )
+            ds.add("test", self.test_ndof, atomic=True, must=True)
+            self.assertEqual([list(bb) for bb in ds.buckets], [[0, 1], [2, 3]])
+            # the number of atoms in the batches is about 4 times of the average
+            natoms_budget = 4 * np.dot(ds.sys_probs, self.natoms)
+            self.assertEqual(
+                ds.bucket_batch_size,
+                [round(natoms_budget / 4), round(natoms_budget / 6)],
+            )
+            # frames are drawn in proportion to the probabilities of systems
+            masses = np.array([np.sum(ds.sys_probs[:2]), np.sum(ds.sys_probs[2:])])
+            expected = masses / np.array(ds.bucket_batch_size)
+            np.testing.assert_almost_equal(ds.bucket_probs, expected / np.sum(expected))
+            random.seed(1)
+            for _ in range(10):
+                data = ds.get_batch()
+                real_natoms = data["real_natoms_vec"][:, 0]
+                bucket = 0 if real_natoms[0] <= 4 else 1
+                self.assertEqual(len(real_natoms), ds.bucket_batch_size[bucket])
+                if bucket == 0:
+                    self.assertTrue(np.all(real_natoms <= 4))
+                else:
+                    self.assertTrue(np.all(real_natoms >= 5))
+            self.assertLess(ds.get_padding_ratio(), 0.2)
+
+    def test_get_mixed_batch_bucket_uniform(self):
+        """Test get_batch with buckets and uniform probabilities of systems."""
+        ds = DeepmdDataSystem(
+            self.sys_name,
+            "mixed:4",
+            2,
+            2.0,
+            bucket_natoms=[4],
+            auto_prob_style="prob_uniform",
+        )
+        ds.add("test", self.test_ndof, atomic=True, must=True)
+        np.testing.assert_almost_equal(ds.sys_probs, [0.25] * self.nsys)
+        self.assertEqual([list(bb) for bb in ds.buckets], [[0, 1], [2, 3]])
+        for bucket_sys_probs in ds.bucket_sys_probs:
+            np.testing.assert_almost_equal(bucket_sys_probs, [0.5, 0.5])
+        random.seed(1)
+        for _ in range(10):
+            real_natoms = ds.get_batch()["real_natoms_vec"][:, 0]
+            self.assertTrue(np.all(real_natoms <= 4) or np.all(real_natoms >= 5))
+
+    def test_batch_size_budget(self):
+        """Test the batch size of a budget of atoms."""
+        shutil.copytree(self.sys_name[0], "sys_budget")
+        self.addCleanup(shutil.rmtree, "sys_budget")
+        systems = [*self.sys_name, "sys_budget"]
+        ds = DeepmdDataSystem(systems, "budget:12", 2, 2.0)
+        ds.add("test", self.test_ndof, atomic=True, must=True)
+        self.assertEqual(list(ds.batch_size), [4, 3, 2, 2, 4])
+        self.assertEqual(ds.natoms_budget, 12)
+        self.assertEqual(
+            [list(gg) for gg in ds.sys_groups], [[0, 4], [1], [2], [3], [0, 4]]
+        )
+        for auto_prob_style in ("prob_sys_size", "prob_uniform"):
+            ds = DeepmdDataSystem(
+                systems, "budget:12", 2, 2.0, auto_prob_style=auto_prob_style
+            )
+            ds.add("test", self.test_ndof, atomic=True, must=True)
+            random.seed(1)
+            for _ in range(20):
+                data = ds.get_batch()
+                # the sets of 3 frames are filled to the batch size
+                self.assertEqual(data["coord"].shape[0], ds.batch_size[ds.pick_idx])
+                self.assertEqual(data["test"].shape[0], ds.batch_size[ds.pick_idx])
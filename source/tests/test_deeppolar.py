@@ -15,6 +15,9 @@ from deepmd.env import (
 from deepmd.infer import (
     DeepPolar,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 from deepmd.utils.convert import (
     convert_pbtxt_to_pb,
 )
@@ -1088,3 +1091,37 @@ class TestDeepPolarNewPBC(unittest.TestCase):
         np.testing.assert_almost_equal(
             vv.reshape([-1]), expected_gv.reshape([-1]), decimal=default_places
         )
+
+    def test_3frame_full_atm_chunked(self):
+        # one frame per batch
+        dp = DeepPolar(
+            "deeppolar_new.pb", auto_batch_size=AutoBatchSize(len(self.atype))
+        )
+        coords3 = np.concatenate((self.coords, self.coords * 1.01, self.coords))
+        box3 = np.concatenate((self.box, self.box, self.box))
+        expected = self.dp.eval_full(
+            coords3.reshape(3, -1), box3, self.atype, atomic=True
+        )
+        results = dp.eval_full(coords3, box3, self.atype, atomic=True)
+        self.assertEqual(len(results), len(expected))
+        for rr, ee in zip(results, expected):
+            self.assertEqual(rr.shape, ee.shape)
+            np.testing.assert_almost_equal(rr, ee, decimal=default_places)
+        at = dp.eval(coords3, box3, self.atype)
+        np.testing.assert_almost_equal(at, expected[3], decimal=default_places)
+        gt = dp.eval(coords3, box3, self.atype, atomic=False)
+        np.testing.assert_almost_equal(gt, expected[0], decimal=default_places)
+
+    def test_select_outputs(self):
+        gt, ff, vv, at, av = self.dp.eval_full(
+            self.coords, self.box, self.atype, atomic=True
+        )
+        ret = self.dp.eval_full(
+            self.coords, self.box, self.atype, outputs={"global_tensor", "atom_tensor"}
+        )
+        self.assertEqual(set(ret), {"global_tensor", "atom_tensor"})
+        np.testing.assert_almost_equal(ret["global_tensor"], gt, decimal=default_places)
+        np.testing.assert_almost_equal(ret["atom_tensor"], at, decimal=default_places)
+        skipped = self.dp.get_skipped_ops({"global_tensor"})
+        self.assertIn("ProdForceSeA", skipped)
+        self.assertIn("ProdVirialSeA", skipped)
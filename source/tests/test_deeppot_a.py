@@ -303,6 +303,67 @@ class TestDeepPotAPBC(unittest.TestCase):
         expected_sv = np.sum(expected_v.reshape([nframes, -1, 9]), axis=1)
         np.testing.assert_almost_equal(vv.ravel(), expected_sv.ravel(), default_places)
 
+    def test_select_outputs(self):
+        coords2 = np.concatenate((self.coords, self.coords))
+        box2 = np.concatenate((self.box, self.box))
+        ee, ff, vv, ae, av = self.dp.eval(coords2, box2, self.atype, atomic=True)
+        ret = self.dp.eval(coords2, box2, self.atype, outputs={"force", "atom_energy"})
+        self.assertEqual(set(ret), {"force", "atom_energy"})
+        np.testing.assert_almost_equal(ret["force"], ff, default_places)
+        np.testing.assert_almost_equal(ret["atom_energy"], ae, default_places)
+        energy = self.dp.eval_energy(coords2, box2, self.atype)
+        self.assertEqual(energy.shape, (2, 1))
+        np.testing.assert_almost_equal(energy, ee, default_places)
+        with self.assertRaises(ValueError):
+            self.dp.eval(coords2, box2, self.atype, outputs={"stress"})
+
+    def test_skipped_ops(self):
+        skipped = self.dp.get_skipped_ops({"energy"})
+        self.assertIn("ProdForceSeA", skipped)
+        self.assertIn("ProdVirialSeA", skipped)
+        self.assertNotIn("ProdEnvMatA", skipped)
+        skipped = self.dp.get_skipped_ops({"energy", "force"})
+        self.assertNotIn("ProdForceSeA", skipped)
+        self.assertIn("ProdVirialSeA", skipped)
+        self.assertEqual(self.dp.get_skipped_ops({"energy", "force", "virial"}), {})
+
+    def test_ase_batch(self):
+        from ase import (
+            Atoms,
+        )
+
+        from deepmd.calculator import (
+            DP,
+        )
+
+        calc = DP("deeppot.pb")
+        coords2 = np.stack((self.coords, self.coords + 0.1)).reshape([2, -1, 3])
+        images = [
+            Atoms("OHHOHH", positions=cc, cell=self.box.reshape((3, 3)), pbc=True)
+            for cc in coords2
+        ]
+        ee, ff, vv = self.dp.eval(
+            coords2.reshape([2, -1]), np.tile(self.box, [2, 1]), self.atype
+        )
+        # only the energy is computed
+        calc.calculate(images[0], properties=["energy"])
+        self.assertNotIn("forces", calc.results)
+        self.assertAlmostEqual(calc.results["energy"], ee[0, 0], default_places)
+        images[1].calc = calc
+        np.testing.assert_almost_equal(images[1].get_forces(), ff[1], default_places)
+        results = calc.calculate_batch(
+            images, properties=["energy", "forces", "stress"]
+        )
+        for ii in range(2):
+            self.assertAlmostEqual(results[ii]["energy"], ee[ii, 0], default_places)
+            np.testing.assert_almost_equal(
+                results[ii]["forces"], ff[ii], default_places
+            )
+            np.testing.assert_almost_equal(
+                results[ii]["virial"], vv[ii].reshape(3, 3), default_places
+            )
+            self.assertEqual(results[ii]["stress"].shape, (6,))
+
     # TODO: needs to fix
     @unittest.skipIf(tf.test.is_gpu_available(), reason="Segfault in GPUs")
     def test_zero_input(self):
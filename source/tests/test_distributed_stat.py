@@ -0,0 +1,164 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from deepmd.model.model_stat import (
+    make_stat_input,
+)
+from deepmd.utils import random as dp_random
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+)
+from deepmd.utils.distributed_stat import (
+    distributed_stat,
+    gather_stat_dict,
+    get_rank,
+    get_size,
+    split_batches,
+)
+
+
+class FakeHVD:
+    """Horovod of a rank whose peers are replayed from the records of their runs."""
+
+    def __init__(self, rank, size, records=None):
+        self._rank = rank
+        self._size = size
+        # the objects sent by the other ranks, in the order of calls
+        self.records = records
+        self.sent = []
+
+    def rank(self):
+        return self._rank
+
+    def size(self):
+        return self._size
+
+    def allgather_object(self, obj, session=None, name=None):
+        idx = len(self.sent)
+        self.sent.append(obj)
+        if self.records is None:
+            return [obj] * self._size
+        return [
+            obj if rr == self._rank else self.records[rr][idx]
+            for rr in range(self._size)
+        ]
+
+
+def run_ranks(size, func):
+    """Run func on each rank, where the peers of the last rank are replayed."""
+    records = {}
+    # the results of the other ranks are not used, so their peers are themselves
+    for rr in range(size - 1):
+        hvd = FakeHVD(rr, size)
+        with distributed_stat(hvd):
+            func()
+        records[rr] = hvd.sent
+    hvd = FakeHVD(size - 1, size, records)
+    with distributed_stat(hvd):
+        return func()
+
+
+class TestSplitBatches(unittest.TestCase):
+    def test_serial(self):
+        self.assertEqual(get_rank(), 0)
+        self.assertEqual(get_size(), 1)
+        self.assertEqual(split_batches([1, 2, 3], None), ([1, 2, 3], None))
+        stat_dict = {"sumr": [np.ones(2)]}
+        self.assertIs(gather_stat_dict(stat_dict), stat_dict)
+
+    def test_gather(self):
+        batches = list(range(7))
+        serial = {"sumr": [np.full(2, ii) for ii in batches]}
+
+        def func():
+            (local,) = split_batches(batches)
+            return gather_stat_dict({"sumr": [np.full(2, ii) for ii in local]})
+
+        gathered = run_ranks(3, func)
+        np.testing.assert_equal(
+            np.sum(gathered["sumr"], axis=0), np.sum(serial["sumr"], axis=0)
+        )
+        self.assertEqual(len(gathered["sumr"]), len(batches))
+        # restored outside of the context
+        self.assertEqual(get_size(), 1)
+
+
+class TestMakeStatInput(unittest.TestCase):
+    def setUp(self):
+        self.natoms = [3, 4, 5, 6, 2]
+        self.systems = []
+        for ii, natoms in enumerate(self.natoms):
+            sys_name = "dist_stat_sys_%d" % ii
+            self.systems.append(sys_name)
+            set_name = os.path.join(sys_name, "set.000")
+            os.makedirs(set_name, exist_ok=True)
+            np.savetxt(
+                os.path.join(sys_name, "type.raw"),
+                np.zeros(natoms, dtype=int),
+                fmt="%d",
+            )
+            np.save(
+                os.path.join(set_name, "coord.npy"), np.random.random([4, natoms * 3])
+            )
+            np.save(os.path.join(set_name, "box.npy"), np.random.random([4, 9]))
+            np.save(os.path.join(set_name, "energy.npy"), np.full([4], ii, dtype=float))
+
+    def tearDown(self):
+        for sys_name in self.systems:
+            shutil.rmtree(sys_name)
+
+    def _make_data(self, systems=None, is_shard=False):
+        data = DeepmdDataSystem(
+            systems if systems is not None else self.systems,
+            2,
+            1,
+            6.0,
+            trn_all_set=True,
+            is_shard=is_shard,
+        )
+        data.add("energy", 1, must=True)
+        return data
+
+    def test_split(self):
+        dp_random.seed(1)
+        data = self._make_data()
+        loaded = []
+        orig_get_batch = data.get_batch
+
+        def get_batch(sys_idx=None):
+            loaded.append(sys_idx)
+            return orig_get_batch(sys_idx=sys_idx)
+
+        def func():
+            return make_stat_input(data, 2, merge_sys=False)
+
+        data.get_batch = get_batch
+        all_stat = run_ranks(2, func)
+        # the last rank gets the batches of the systems 1 and 3
+        self.assertEqual(sorted(set(loaded[-4:])), [1, 3])
+        self.assertEqual(len(all_stat["coord"]), len(self.systems))
+        for ii, natoms in enumerate(self.natoms):
+            self.assertEqual(len(all_stat["coord"][ii]), 2)
+            self.assertEqual(all_stat["coord"][ii][0].shape[1], natoms * 3)
+            np.testing.assert_equal(all_stat["energy"][ii][0], ii)
+
+    def test_shard(self):
+        shards = [self.systems[:2], self.systems[2:]]
+
+        def func():
+            data = self._make_data(shards[get_rank()], is_shard=True)
+            return make_stat_input(data, 1, merge_sys=False)
+
+        all_stat = run_ranks(2, func)
+        # the shards are in the order of ranks
+        self.assertEqual(len(all_stat["coord"]), len(self.systems))
+        for ii, natoms in enumerate(self.natoms):
+            np.testing.assert_equal(all_stat["energy"][ii][0], ii)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import json
+import os
+import shutil
+import unittest
+
+import dpdata
+import h5py
+import numpy as np
+from common import (
+    tests_path,
+)
+
+from deepmd.entrypoints.eval_desc import (
+    eval_desc,
+    pool_descriptor,
+)
+from deepmd.infer import (
+    DeepPot,
+)
+from deepmd.utils.convert import (
+    convert_pbtxt_to_pb,
+)
+
+
+class TestPoolDescriptor(unittest.TestCase):
+    def test_pool(self):
+        rng = np.random.default_rng(0)
+        descriptor = rng.random((2, 5, 4))
+        np.testing.assert_array_equal(pool_descriptor(descriptor, "none"), descriptor)
+        np.testing.assert_allclose(
+            pool_descriptor(descriptor, "mean"), descriptor.mean(axis=1)
+        )
+        np.testing.assert_allclose(
+            pool_descriptor(descriptor, "max"), descriptor.max(axis=1)
+        )
+        with self.assertRaises(ValueError):
+            pool_descriptor(descriptor, "sum")
+
+    def test_pool_virtual(self):
+        rng = np.random.default_rng(0)
+        descriptor = rng.random((2, 5, 4))
+        atype = np.array([[0, 1, 1, -1, -1], [0, 0, 1, 1, 1]])
+        expected_mean = np.stack(
+            [descriptor[0, :3].mean(axis=0), descriptor[1].mean(axis=0)]
+        )
+        expected_max = np.stack(
+            [descriptor[0, :3].max(axis=0), descriptor[1].max(axis=0)]
+        )
+        np.testing.assert_allclose(
+            pool_descriptor(descriptor, "mean", atype=atype), expected_mean
+        )
+        np.testing.assert_allclose(
+            pool_descriptor(descriptor, "max", atype=atype), expected_max
+        )
+
+
+class TestEvalDesc(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_name = "deeppot_eval_desc.pb"
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")), cls.model_name
+        )
+        cls.dp = DeepPot(cls.model_name)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.model_name)
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.atype = np.array([0, 1, 1, 0, 1, 1])
+        self.nframes = 5
+        self.coords = rng.random((self.nframes, 6, 3)) * 5.0
+        self.box = np.tile(np.eye(3) * 13.0, (self.nframes, 1, 1))
+        self.test_data = "test_eval_desc_system"
+        self.output = "test_eval_desc_output"
+        dpdata.System(
+            data={
+                "orig": np.zeros(3),
+                "atom_names": ["O", "H"],
+                "atom_numbs": [2, 4],
+                "atom_types": self.atype,
+                "cells": self.box,
+                "coords": self.coords,
+            }
+        ).to_deepmd_npy(self.test_data, set_size=3)
+        self.expected = self.dp.eval_descriptor(
+            self.coords.reshape(self.nframes, -1),
+            self.box.reshape(self.nframes, -1),
+            self.atype,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data, ignore_errors=True)
+        shutil.rmtree(self.output, ignore_errors=True)
+
+    def _eval_desc(self, **kwargs):
+        eval_desc(
+            model=self.model_name,
+            system=self.test_data,
+            datafile=None,
+            set_prefix="set",
+            output=self.output,
+            # two frames in a chunk
+            chunk_atoms=12,
+            **kwargs,
+        )
+        with open(os.path.join(self.output, "index.json")) as f:
+            return json.load(f)
+
+    def test_npy(self):
+        index = self._eval_desc()
+        self.assertEqual(len(index["systems"]), 1)
+        self.assertEqual(index["systems"][0]["shape"], list(self.expected.shape))
+        descriptor = np.load(
+            os.path.join(self.output, index["systems"][0]["output"]), mmap_mode="r"
+        )
+        self.assertEqual(descriptor.dtype, np.float32)
+        np.testing.assert_allclose(descriptor, self.expected, rtol=1e-5, atol=1e-6)
+
+    def test_hdf5_mean_float16(self):
+        index = self._eval_desc(pooling="mean", dtype="float16", format="hdf5")
+        self.assertEqual(index["file"], "descriptors.h5")
+        self.assertEqual(index["dtype"], "float16")
+        with h5py.File(os.path.join(self.output, index["file"]), "r") as f:
+            descriptor = f[index["systems"][0]["output"]][:]
+        self.assertEqual(descriptor.dtype, np.float16)
+        np.testing.assert_allclose(
+            descriptor, self.expected.mean(axis=1), rtol=1e-2, atol=1e-3
+        )
@@ -0,0 +1,92 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import threading
+import time
+import unittest
+from unittest import (
+    mock,
+)
+
+import numpy as np
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.utils import (
+    execution_context,
+)
+from deepmd.utils.execution_context import (
+    ExecutionContext,
+    LimitedSession,
+)
+
+
+class TestExecutionContext(unittest.TestCase):
+    def test_config(self):
+        context = ExecutionContext(intra_op_threads=3, inter_op_threads=2)
+        config = context.config
+        self.assertEqual(config.intra_op_parallelism_threads, 3)
+        self.assertEqual(config.inter_op_parallelism_threads, 2)
+        self.assertFalse(config.use_per_session_threads)
+        self.assertEqual(len(config.session_inter_op_thread_pool), 1)
+        self.assertEqual(config.session_inter_op_thread_pool[0].num_threads, 2)
+        self.assertEqual(
+            config.session_inter_op_thread_pool[0].global_name,
+            execution_context.INTER_OP_POOL_NAME,
+        )
+
+    def test_sessions(self):
+        context = ExecutionContext(max_concurrency=2)
+        outputs = []
+        for ii in range(2):
+            with tf.Graph().as_default() as graph:
+                t_in = tf.placeholder(tf.float64, [None])
+                t_out = t_in * (ii + 1)
+            sess = context.new_session(graph)
+            self.assertEqual(sess.max_concurrency, 2)
+            self.assertIs(sess.graph, graph)
+            outputs.append(sess.run(t_out, feed_dict={t_in: np.ones(3)}))
+            sess.close()
+        self.assertEqual(context.nsessions, 2)
+        np.testing.assert_allclose(outputs[0] * 2, outputs[1])
+
+    @mock.patch.object(execution_context, "_context", None)
+    def test_init(self):
+        context = execution_context.init_execution_context(max_concurrency=3)
+        self.assertIs(execution_context.get_execution_context(), context)
+        context.nsessions = 1
+        # only max_concurrency can be changed after sessions are created
+        execution_context.init_execution_context(max_concurrency=1)
+        with self.assertRaises(RuntimeError):
+            execution_context.init_execution_context(
+                intra_op_threads=context.intra_op_threads + 1
+            )
+
+
+class TestLimitedSession(unittest.TestCase):
+    def test_max_concurrency(self):
+        lock = threading.Lock()
+        state = {"running": 0, "max_running": 0}
+
+        class SlowSession:
+            def run(self, *args, **kwargs):
+                with lock:
+                    state["running"] += 1
+                    state["max_running"] = max(state["max_running"], state["running"])
+                time.sleep(0.05)
+                with lock:
+                    state["running"] -= 1
+                return 1
+
+        sess = LimitedSession(SlowSession(), max_concurrency=2)
+        threads = [threading.Thread(target=sess.run) for _ in range(6)]
+        for tt in threads:
+            tt.start()
+        for tt in threads:
+            tt.join()
+        self.assertEqual(state["max_running"], 2)
+        with self.assertRaises(ValueError):
+            sess.set_max_concurrency(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
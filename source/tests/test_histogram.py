@@ -0,0 +1,27 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import unittest
+
+import numpy as np
+
+from deepmd.utils.histogram import (
+    PhaseHistogram,
+)
+
+
+class TestPhaseHistogram(unittest.TestCase):
+    def test_percentile(self):
+        hist = PhaseHistogram()
+        durations = np.linspace(1e-3, 1e-1, 1000)
+        for dd in durations:
+            hist.add(dd)
+        self.assertEqual(hist.count, 1000)
+        self.assertAlmostEqual(hist.total, np.sum(durations))
+        for qq in (50, 95, 99):
+            np.testing.assert_allclose(
+                hist.percentile(qq), np.percentile(durations, qq), rtol=0.06
+            )
+        self.assertLessEqual(hist.percentile(100), hist.max)
+
+
+if __name__ == "__main__":
+    unittest.main()
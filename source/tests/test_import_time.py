@@ -0,0 +1,52 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import json
+import subprocess as sp
+import sys
+import unittest
+
+# the budget of the wall time to import the modules below, in seconds. It is
+# far more than needed, while importing TensorFlow alone often exceeds it
+IMPORT_TIME_BUDGET = 2.0
+
+CODE = """
+import json
+import sys
+import time
+
+tic = time.perf_counter()
+import {module}
+toc = time.perf_counter()
+print(json.dumps({{"time": toc - tic, "tf": "tensorflow" in sys.modules}}))
+"""
+
+
+class TestImportTime(unittest.TestCase):
+    def _import(self, module: str) -> dict:
+        # use a new process, as the modules may be imported in this process
+        out = sp.check_output([sys.executable, "-c", CODE.format(module=module)])
+        return json.loads(out.decode().splitlines()[-1])
+
+    def test_no_tensorflow(self):
+        for module in (
+            "deepmd",
+            "deepmd.utils.data",
+            "deepmd.utils.argcheck",
+            "deepmd.entrypoints.main",
+        ):
+            with self.subTest(module=module):
+                ret = self._import(module)
+                self.assertFalse(ret["tf"], f"{module} imports TensorFlow")
+                self.assertLess(ret["time"], IMPORT_TIME_BUDGET)
+
+    def test_lazy_attributes(self):
+        import deepmd
+        import deepmd.env
+
+        self.assertIn("DeepPotential", dir(deepmd))
+        self.assertIs(deepmd.cluster, sys.modules["deepmd.cluster"])
+        self.assertIs(
+            deepmd.utils.DeepmdData, sys.modules["deepmd.utils.data"].DeepmdData
+        )
+        self.assertTrue(hasattr(deepmd.env.tf, "Session"))
+        with self.assertRaises(AttributeError):
+            deepmd.env.not_exist
@@ -0,0 +1,176 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import asyncio
+import os
+import threading
+import unittest
+
+import numpy as np
+from common import (
+    tests_path,
+)
+
+from deepmd.env import (
+    GLOBAL_NP_FLOAT_PRECISION,
+)
+from deepmd.infer import (
+    DeepPot,
+    DeepPotServer,
+)
+from deepmd.utils.convert import (
+    convert_pbtxt_to_pb,
+)
+
+if GLOBAL_NP_FLOAT_PRECISION == np.float32:
+    default_places = 4
+else:
+    default_places = 10
+
+
+class TestDeepPotServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")),
+            "deeppot_server.pb",
+        )
+        cls.dp = DeepPot("deeppot_server.pb")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove("deeppot_server.pb")
+        cls.dp = None
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.coords = np.array(
+            [
+                12.83,
+                2.56,
+                2.18,
+                12.09,
+                2.87,
+                2.74,
+                00.25,
+                3.32,
+                1.68,
+                3.36,
+                3.00,
+                1.81,
+                3.51,
+                2.51,
+                2.60,
+                4.27,
+                3.22,
+                1.56,
+            ]
+        )
+        self.nrequests = 8
+        self.all_coords = self.coords[None, :] + rng.normal(
+            0.0, 0.05, (self.nrequests, self.coords.size)
+        )
+        self.atype = [0, 1, 1, 0, 1, 1]
+        self.box = np.array([13.0, 0.0, 0.0, 0.0, 13.0, 0.0, 0.0, 0.0, 13.0])
+
+    def test_threads(self):
+        results = [None] * self.nrequests
+        server = DeepPotServer(self.dp, max_batch_size=self.nrequests, max_latency=1.0)
+        with server:
+
+            def request(ii):
+                results[ii] = server.eval(
+                    self.all_coords[ii], self.box, self.atype, atomic=True
+                )
+
+            threads = [
+                threading.Thread(target=request, args=(ii,))
+                for ii in range(self.nrequests)
+            ]
+            for tt in threads:
+                tt.start()
+            for tt in threads:
+                tt.join()
+            metrics = server.metrics()
+        expected = self.dp.eval(
+            self.all_coords,
+            np.tile(self.box, [self.nrequests, 1]),
+            self.atype,
+            atomic=True,
+        )
+        for ii in range(self.nrequests):
+            self.assertEqual(len(results[ii]), 5)
+            for rr, ee in zip(results[ii], expected):
+                self.assertEqual(rr.shape, (1, *ee.shape[1:]))
+                np.testing.assert_almost_equal(rr[0], ee[ii], default_places)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(metrics["requests"], self.nrequests)
+        self.assertEqual(metrics["frames"], self.nrequests)
+        # all requests arrive within the latency budget
+        self.assertEqual(metrics["batches"], 1)
+        self.assertEqual(metrics["latency"]["count"], self.nrequests)
+
+    def test_asyncio(self):
+        with DeepPotServer(self.dp, max_batch_size=4, max_latency=1.0) as server:
+
+            async def main():
+                return await asyncio.gather(
+                    *[
+                        server.eval_async(self.all_coords[ii], None, self.atype)
+                        for ii in range(self.nrequests)
+                    ]
+                )
+
+            results = asyncio.run(main())
+            metrics = server.metrics()
+        expected = self.dp.eval(self.all_coords, None, self.atype)
+        for ii in range(self.nrequests):
+            for rr, ee in zip(results[ii], expected):
+                np.testing.assert_almost_equal(rr[0], ee[ii], default_places)
+        self.assertEqual(metrics["batches"], 2)
+        self.assertEqual(metrics["mean_batch_size"], 4.0)
+
+    def test_not_started(self):
+        server = DeepPotServer(self.dp)
+        with self.assertRaises(RuntimeError):
+            server.submit(self.coords, self.box, self.atype)
+
+    def test_stopped(self):
+        server = DeepPotServer(self.dp)
+        with server:
+            future = server.submit(self.coords, self.box, self.atype)
+        # the requests submitted before the stop are evaluated
+        self.assertEqual(len(future.result(timeout=60)), 3)
+        with self.assertRaises(RuntimeError):
+            server.submit(self.coords, self.box, self.atype)
+        # the server can be started again
+        with server:
+            self.assertEqual(len(server.eval(self.coords, self.box, self.atype)), 3)
+        self.assertEqual(server.queue_depth, 0)
+
+    def test_stop_race(self):
+        server = DeepPotServer(self.dp)
+        server.start()
+        futures = []
+        errors = []
+
+        def submit():
+            for _ in range(20):
+                try:
+                    futures.append(server.submit(self.coords, self.box, self.atype))
+                except RuntimeError as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for tt in threads:
+            tt.start()
+        server.stop()
+        for tt in threads:
+            tt.join()
+        # every accepted request is finished, none is left pending
+        for ff in futures:
+            self.assertEqual(len(ff.result(timeout=60)), 3)
+        self.assertEqual(len(futures) + len(errors), 80)
+        self.assertEqual(server.queue_depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from types import (
+    ModuleType,
+)
+
+PACKAGE_INIT = """
+from deepmd.utils.lazy import (
+    lazy_import,
+    shadow_submodules,
+)
+
+__getattr__, __dir__ = lazy_import(__name__, attrs={"func": ".func"})
+shadow_submodules(__name__, ["func"])
+"""
+
+SUBMODULE = """
+def func():
+    return 1
+"""
+
+
+class TestShadowSubmodules(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        package_dir = os.path.join(self.tmpdir, "lazy_test_pkg")
+        os.makedirs(package_dir)
+        with open(os.path.join(package_dir, "__init__.py"), "w") as f:
+            f.write(PACKAGE_INIT)
+        with open(os.path.join(package_dir, "func.py"), "w") as f:
+            f.write(SUBMODULE)
+        sys.path.insert(0, self.tmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        for name in ("lazy_test_pkg", "lazy_test_pkg.func"):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.tmpdir)
+
+    def test_submodule_first(self):
+        submodule = importlib.import_module("lazy_test_pkg.func")
+        from lazy_test_pkg import (
+            func,
+        )
+
+        self.assertIs(func, submodule.func)
+        self.assertIs(sys.modules["lazy_test_pkg.func"], submodule)
+
+    def test_attribute_first(self):
+        from lazy_test_pkg import (
+            func,
+        )
+
+        submodule = importlib.import_module("lazy_test_pkg.func")
+        package = sys.modules["lazy_test_pkg"]
+        self.assertIs(func, submodule.func)
+        self.assertIs(package.func, submodule.func)
+
+
+class TestEntrypoints(unittest.TestCase):
+    def test_submodule_first(self):
+        for name in (
+            "bench",
+            "compress",
+            "convert",
+            "dedup",
+            "eval_desc",
+            "freeze",
+            "neighbor_stat",
+            "test",
+            "transfer",
+        ):
+            submodule = importlib.import_module(f"deepmd.entrypoints.{name}")
+            package = importlib.import_module("deepmd.entrypoints")
+            value = getattr(package, name)
+            self.assertNotIsInstance(value, ModuleType, msg=name)
+            self.assertIs(value, getattr(submodule, name), msg=name)
+        from deepmd.entrypoints import (
+            convert,
+            test,
+            train_dp,
+        )
+        from deepmd.entrypoints.train import (
+            train,
+        )
+
+        self.assertTrue(callable(convert))
+        self.assertTrue(callable(test))
+        self.assertIs(train_dp, train)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import logging
+import unittest
+from unittest import (
+    mock,
+)
+
+from deepmd.loggers.loggers import (
+    _MPIHandler,
+)
+
+
+class FakeMPIFile:
+    def __init__(self):
+        self.writes = []
+        self.closed = False
+
+    def Write_shared(self, buffer):
+        self.writes.append(bytes(buffer).decode("utf-8"))
+
+    def Sync(self):
+        pass
+
+    def Close(self):
+        self.closed = True
+
+
+class FakeMPI:
+    COMM_WORLD = None
+
+    def __init__(self):
+        self.file = FakeMPIFile()
+        self.File = mock.Mock()
+        self.File.Open.return_value = self.file
+
+
+class TestMPIHandler(unittest.TestCase):
+    def setUp(self):
+        self.mpi = FakeMPI()
+        self.handler = _MPIHandler("fake.log", self.mpi, mode=0)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger = logging.getLogger("deepmd_test_mpi_handler")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def test_buffered(self):
+        for ii in range(3):
+            self.logger.info("message %d", ii)
+        # the messages are buffered
+        self.assertEqual(self.mpi.file.writes, [])
+        self.handler.close()
+        self.assertEqual(self.mpi.file.writes, ["message 0\nmessage 1\nmessage 2\n"])
+        self.assertTrue(self.mpi.file.closed)
+
+    def test_flush_size(self):
+        self.handler.stream.buffer_size = 20
+        for ii in range(3):
+            self.logger.info("message %d", ii)
+        self.assertEqual(self.mpi.file.writes, ["message 0\nmessage 1\n"])
+
+    def test_flush_interval(self):
+        self.handler.stream.flush_interval = 0.0
+        self.logger.info("message")
+        self.assertEqual(self.mpi.file.writes, ["message\n"])
+
+    def test_flush_warning(self):
+        self.logger.info("message")
+        self.logger.warning("Å warning")
+        self.assertEqual(self.mpi.file.writes, ["message\nÅ warning\n"])
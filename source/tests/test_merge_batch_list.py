@@ -0,0 +1,45 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import unittest
+
+import numpy as np
+
+from deepmd.train.trainer import (
+    merge_batch_list,
+)
+
+
+def _make_batch(nframes, natoms, find_energy=1.0):
+    return {
+        "coord": np.random.random((nframes, natoms * 3)),
+        "energy": np.random.random((nframes,)),
+        "type": np.zeros((nframes, natoms), dtype=int),
+        "find_energy": find_energy,
+        "natoms_vec": np.array([natoms, natoms, natoms]),
+        "default_mesh": np.zeros(6, dtype=int),
+    }
+
+
+class TestMergeBatchList(unittest.TestCase):
+    def test_merge(self):
+        batches = [
+            _make_batch(2, 3),
+            _make_batch(1, 4),
+            _make_batch(2, 3),
+            _make_batch(2, 3, find_energy=0.0),
+        ]
+        merged = merge_batch_list(batches)
+        self.assertEqual([nn for _, nn in merged], [2, 1, 1])
+        batch, _ = merged[0]
+        self.assertEqual(batch["coord"].shape, (4, 9))
+        self.assertEqual(batch["type"].shape, (4, 3))
+        np.testing.assert_equal(
+            batch["energy"],
+            np.concatenate([batches[0]["energy"], batches[2]["energy"]]),
+        )
+        np.testing.assert_equal(batch["natoms_vec"], batches[0]["natoms_vec"])
+        self.assertEqual(batch["find_energy"], 1.0)
+        self.assertIs(merged[1][0]["coord"], batches[1]["coord"])
+
+
+if __name__ == "__main__":
+    unittest.main()
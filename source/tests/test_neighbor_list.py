@@ -0,0 +1,153 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import os
+import unittest
+
+import numpy as np
+from common import (
+    tests_path,
+)
+
+from deepmd.env import (
+    GLOBAL_NP_FLOAT_PRECISION,
+)
+from deepmd.infer import (
+    DeepPot,
+)
+from deepmd.infer.neighbor_list import (
+    NeighborListCache,
+    VerletDeepPot,
+)
+from deepmd.utils.convert import (
+    convert_pbtxt_to_pb,
+)
+
+if GLOBAL_NP_FLOAT_PRECISION == np.float32:
+    default_places = 4
+else:
+    default_places = 10
+
+
+class TestNeighborListCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.cell = np.array([[7.0, 0.0, 0.0], [2.0, 6.5, 0.0], [1.0, -1.5, 8.0]])
+        self.coord = np.matmul(rng.uniform(-0.5, 1.5, (20, 3)), self.cell)
+        self.atype = rng.integers(2, size=20)
+        self.rcut = 5.0
+        self.nlist = NeighborListCache(self.rcut, 1.0)
+
+    def _count_brute_force(self, coord):
+        images = np.stack(
+            np.meshgrid(*([np.arange(-3, 4)] * 3), indexing="ij"), axis=-1
+        ).reshape(-1, 3)
+        shift = np.matmul(images, self.cell)
+        diff = coord[None, None, :, :] + shift[:, None, None, :] - coord[None, :, None]
+        dist = np.linalg.norm(diff, axis=-1)
+        return np.sum((dist < self.rcut) & (dist > 1e-8), axis=(0, 2))
+
+    def _count_nlist(self, coord):
+        nloc = coord.shape[0]
+        ext_coord = self.nlist.extend_coord(coord, self.cell.reshape([9]))
+        numneigh = self.nlist.mesh[16 + nloc : 16 + 2 * nloc]
+        jlist = self.nlist.mesh[16 + 2 * nloc :]
+        iatom = np.repeat(np.arange(nloc), numneigh)
+        dist = np.linalg.norm(ext_coord[jlist] - ext_coord[iatom], axis=-1)
+        return np.bincount(iatom[dist < self.rcut], minlength=nloc)
+
+    def test_reuse(self):
+        rng = np.random.default_rng(2)
+        coord = self.coord
+        box = self.cell.reshape([9])
+        self.assertTrue(self.nlist.update(coord, box, self.atype))
+        np.testing.assert_equal(
+            self._count_nlist(coord), self._count_brute_force(coord)
+        )
+        for _ in range(10):
+            coord = coord + rng.normal(0.0, 0.05, coord.shape)
+            self.nlist.update(coord, box, self.atype)
+            np.testing.assert_equal(
+                self._count_nlist(coord), self._count_brute_force(coord)
+            )
+        self.assertEqual(self.nlist.nupdate, 11)
+        self.assertLess(self.nlist.nbuild, 11)
+        # moving an atom by more than skin / 2 triggers a rebuild
+        coord = coord.copy()
+        coord[0] += 0.6
+        self.assertTrue(self.nlist.update(coord, box, self.atype))
+        self.assertFalse(self.nlist.update(coord, box, self.atype))
+        # changing the cell triggers a rebuild
+        self.assertTrue(self.nlist.update(coord, box * 1.01, self.atype))
+
+
+class TestVerletDeepPot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")),
+            "deeppot_nlist.pb",
+        )
+        cls.dp = DeepPot("deeppot_nlist.pb")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove("deeppot_nlist.pb")
+        cls.dp = None
+
+    def setUp(self):
+        self.coords = np.array(
+            [
+                12.83,
+                2.56,
+                2.18,
+                12.09,
+                2.87,
+                2.74,
+                00.25,
+                3.32,
+                1.68,
+                3.36,
+                3.00,
+                1.81,
+                3.51,
+                2.51,
+                2.60,
+                4.27,
+                3.22,
+                1.56,
+            ]
+        ).reshape([6, 3])
+        self.atype = [0, 1, 1, 0, 1, 1]
+        self.box = np.array([13.0, 0.0, 0.0, 0.0, 13.0, 0.0, 0.0, 0.0, 13.0])
+
+    def _check(self, vdp, coords, box):
+        ee, ff, vv, ae, av = vdp.eval(coords, box, self.atype, atomic=True)
+        ee0, ff0, vv0, ae0, av0 = self.dp.eval(
+            coords.reshape([1, -1]), box, self.atype, atomic=True
+        )
+        for rr, rr0 in ((ee, ee0), (ff, ff0), (vv, vv0), (ae, ae0), (av, av0)):
+            self.assertEqual(rr.shape, rr0.shape)
+            np.testing.assert_almost_equal(rr, rr0, default_places)
+
+    def test_pbc(self):
+        vdp = VerletDeepPot(self.dp, skin=1.0)
+        rng = np.random.default_rng(1)
+        coords = self.coords
+        for _ in range(5):
+            self._check(vdp, coords, self.box)
+            coords = coords + rng.normal(0.0, 0.02, coords.shape)
+        self.assertEqual(vdp.neval, 5)
+        self.assertEqual(vdp.nbuild, 1)
+        coords = coords.copy()
+        coords[2] += 1.0
+        self._check(vdp, coords, self.box)
+        self.assertEqual(vdp.nbuild, 2)
+
+    def test_nopbc(self):
+        vdp = VerletDeepPot(self.dp, skin=1.0)
+        self._check(vdp, self.coords, None)
+        self._check(vdp, self.coords + 0.01, None)
+        self.assertEqual(vdp.nbuild, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from deepmd.utils import (
+    random,
+)
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+)
+from deepmd.utils.sampler import (
+    EpochSampler,
+)
+
+
+class TestEpochSampler(unittest.TestCase):
+    def test_counts(self):
+        sampler = EpochSampler([2, 4, 3, 1], [0.2, 0.4, 0.3, 0.1], seed=1)
+        self.assertEqual(len(sampler), 10)
+        np.testing.assert_equal(sampler.counts, [2, 4, 3, 1])
+        # largest remainder, and at least once for a positive probability
+        sampler = EpochSampler([5, 5], [0.99, 0.01], seed=1)
+        np.testing.assert_equal(sampler.counts, [9, 1])
+        sampler = EpochSampler([5, 5], [1.0, 0.0], seed=1)
+        np.testing.assert_equal(sampler.counts, [10, 0])
+        # the units are taken one by one, so no system is left out
+        sampler = EpochSampler([1, 1, 1, 1], [0.5, 0.5, 1e-3, 1e-3], seed=1)
+        np.testing.assert_equal(sampler.counts, [1, 1, 1, 1])
+        sampler = EpochSampler([3, 3, 1, 1], [0.5, 0.5, 1e-3, 1e-3], seed=1)
+        np.testing.assert_equal(sampler.counts, [3, 3, 1, 1])
+        # too short to sample every system
+        with self.assertRaises(ValueError):
+            EpochSampler([1, 1, 0], [0.5, 0.25, 0.25], seed=1)
+
+    def test_without_replacement(self):
+        sampler = EpochSampler([2, 4, 3, 1], [0.2, 0.4, 0.3, 0.1], seed=1)
+        epochs = [[next(sampler) for _ in range(10)] for _ in range(3)]
+        for ee in epochs:
+            np.testing.assert_equal(np.bincount(ee), [2, 4, 3, 1])
+        self.assertEqual(sampler.epoch, 2)
+        self.assertNotEqual(epochs[0], epochs[1])
+
+    def test_state(self):
+        random.seed(20)
+        sampler = EpochSampler([2, 4, 3, 1], [0.2, 0.4, 0.3, 0.1])
+        for _ in range(13):
+            next(sampler)
+        state = sampler.get_state()
+        self.assertEqual(state["epoch"], 1)
+        self.assertEqual(state["index"], 3)
+        expected = [next(sampler) for _ in range(15)]
+        # a new sampler resumes from the middle of the epoch
+        resumed = EpochSampler([2, 4, 3, 1], [0.2, 0.4, 0.3, 0.1], seed=0)
+        resumed.set_state(state)
+        self.assertEqual([next(resumed) for _ in range(15)], expected)
+
+
+class TestDataSystemEpochSampler(unittest.TestCase):
+    def setUp(self):
+        self.nframes = [3, 6, 5]
+        self.natoms = [3, 4, 6]
+        self.sys_name = []
+        for ii in range(len(self.nframes)):
+            sys_name = "sampler_sys_%d" % ii
+            self.sys_name.append(sys_name)
+            set_name = os.path.join(sys_name, "set.000")
+            os.makedirs(set_name, exist_ok=True)
+            np.savetxt(
+                os.path.join(sys_name, "type.raw"), [0] * self.natoms[ii], fmt="%d"
+            )
+            # tag the frames by the coordinates
+            coord = np.tile(
+                np.arange(self.nframes[ii], dtype=float)[:, None],
+                [1, self.natoms[ii] * 3],
+            )
+            np.save(os.path.join(set_name, "coord.npy"), coord + 100 * ii)
+            np.save(
+                os.path.join(set_name, "box.npy"),
+                np.tile(np.eye(3).ravel() * 10, [self.nframes[ii], 1]),
+            )
+        np.save(os.path.join(self.sys_name[0], "set.000", "numb_copy.npy"), [1, 2, 1])
+
+    def tearDown(self):
+        for sys_name in self.sys_name:
+            shutil.rmtree(sys_name)
+
+    def test_epoch(self):
+        random.seed(1)
+        ds = DeepmdDataSystem(self.sys_name, 1, 1, 2.0, sampler="epoch")
+        # numb_copy is counted
+        self.assertEqual(len(ds.sampler), 4 + 6 + 5)
+        # each frame is passed once in the epoch
+        frames = sorted(int(ds.get_batch()["coord"][0, 0]) for _ in range(15))
+        self.assertEqual(frames, [0, 1, 1, 2, *range(100, 106), *range(200, 205)])
+
+    def test_state(self):
+        random.seed(1)
+        ds = DeepmdDataSystem(self.sys_name, 1, 1, 2.0, sampler="epoch")
+        for _ in range(20):
+            ds.get_batch()
+        state = ds.get_sampler_state()
+        self.assertEqual(state["epoch"], 1)
+        self.assertEqual(state["index"], 5)
+        picks = []
+        for _ in range(10):
+            ds.get_batch()
+            picks.append(ds.pick_idx)
+        ds = DeepmdDataSystem(self.sys_name, 1, 1, 2.0, sampler="epoch")
+        ds.set_sampler_state(state)
+        resumed = []
+        for _ in range(10):
+            ds.get_batch()
+            resumed.append(ds.pick_idx)
+        self.assertEqual(resumed, picks)
+
+    def test_random(self):
+        ds = DeepmdDataSystem(self.sys_name, 1, 1, 2.0)
+        self.assertIsNone(ds.sampler)
+        self.assertIsNone(ds.get_sampler_state())
@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import json
+import os
+import unittest
+
+import numpy as np
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.train.step_profiler import (
+    StepProfiler,
+)
+
+
+class TestStepProfiler(unittest.TestCase):
+    def setUp(self):
+        self.output_file = "step_profile_test.json"
+
+    def tearDown(self):
+        if os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+    def test_disabled(self):
+        profiler = StepProfiler(False, self.output_file, op_stats_freq=1)
+        with profiler.phase("run"):
+            pass
+        self.assertEqual(profiler.run_options(0), (None, None))
+        profiler.write(0)
+        self.assertFalse(os.path.exists(self.output_file))
+
+    def test_profile(self):
+        with tf.Graph().as_default() as graph:
+            aa = tf.placeholder(tf.float64, [8, 8])
+            bb = tf.matmul(aa, aa)
+            profiler = StepProfiler(
+                True, self.output_file, op_stats_freq=2, graph=graph
+            )
+            with tf.Session() as sess:
+                for ii in range(4):
+                    run_options, run_metadata = profiler.run_options(ii)
+                    with profiler.phase("run"):
+                        sess.run(
+                            bb,
+                            feed_dict={aa: np.ones((8, 8))},
+                            options=run_options,
+                            run_metadata=run_metadata,
+                        )
+                    profiler.add_run_metadata(run_metadata)
+        profiler.write(4)
+        with open(self.output_file) as f:
+            summary = json.load(f)
+        self.assertEqual(summary["step"], 4)
+        self.assertEqual(summary["phases"]["run"]["count"], 4)
+        for kk in ("mean", "p50", "p95", "p99", "max", "total"):
+            self.assertIn(kk, summary["phases"]["run"])
+        self.assertEqual(summary["op_types"]["traced_steps"], 2)
+        self.assertIn("MatMul", summary["op_types"]["ops"])
+
+
+if __name__ == "__main__":
+    unittest.main()
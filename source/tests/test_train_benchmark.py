@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import json
+import os
+import unittest
+from unittest import (
+    mock,
+)
+
+from common import (
+    j_loader,
+    run_dp,
+    tests_path,
+)
+
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+)
+from deepmd.utils.path import (
+    DPOSPath,
+)
+
+
+class TestTrainBenchmark(unittest.TestCase):
+    def setUp(self):
+        data_file = str(tests_path / os.path.join("model_compression", "data"))
+        self.input_file = "benchmark_input.json"
+        self.output_file = "benchmark_test.json"
+        jdata = j_loader(
+            str(tests_path / os.path.join("model_compression", "input.json"))
+        )
+        jdata["training"]["training_data"]["systems"] = data_file
+        jdata["training"]["validation_data"]["systems"] = data_file
+        jdata["training"]["disp_file"] = "benchmark_lcurve.out"
+        jdata["training"]["save_ckpt"] = "benchmark.ckpt"
+        with open(self.input_file, "w") as fp:
+            json.dump(jdata, fp, indent=4)
+
+    def tearDown(self):
+        for ff in (self.input_file, self.output_file, "out.json"):
+            if os.path.exists(ff):
+                os.remove(ff)
+
+    def test_benchmark(self):
+        numb_loads = [0]
+        numb_loads_after_batch = [0]
+        load_numpy = DPOSPath.load_numpy
+        get_batch = DeepmdDataSystem.get_batch
+
+        def counted_load_numpy(path):
+            numb_loads[0] += 1
+            return load_numpy(path)
+
+        def counted_get_batch(data, *args, **kwargs):
+            batch = get_batch(data, *args, **kwargs)
+            numb_loads_after_batch[0] = numb_loads[0]
+            return batch
+
+        with mock.patch.object(
+            DPOSPath, "load_numpy", counted_load_numpy
+        ), mock.patch.object(DeepmdDataSystem, "get_batch", counted_get_batch):
+            run_dp(
+                "dp train --skip-neighbor-stat --benchmark 3 --benchmark-output "
+                + self.output_file
+                + " "
+                + self.input_file
+            )
+        # the data are loaded only until the batches are cached
+        self.assertGreater(numb_loads[0], 0)
+        self.assertEqual(numb_loads[0], numb_loads_after_batch[0])
+        with open(self.output_file) as f:
+            results = json.load(f)
+        self.assertEqual(results["numb_steps"], 3)
+        self.assertGreater(results["steps_per_second"], 0.0)
+        self.assertGreater(results["atoms_per_second"], 0.0)
+        self.assertIn("peak_memory_host", results)
+        self.assertIn("peak_memory_device", results)
+        if os.name == "posix":
+            self.assertGreater(results["peak_memory_host"], 0)
+        # neither a learning curve nor a checkpoint is written
+        self.assertFalse(os.path.exists("benchmark_lcurve.out"))
+        self.assertFalse(os.path.exists("benchmark.ckpt.index"))
+
+
+if __name__ == "__main__":
+    unittest.main()
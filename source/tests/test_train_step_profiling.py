@@ -0,0 +1,77 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+import glob
+import json
+import os
+import time
+import unittest
+from unittest import (
+    mock,
+)
+
+from common import (
+    j_loader,
+    run_dp,
+    tests_path,
+)
+
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+)
+
+
+class TestStepProfilerTraining(unittest.TestCase):
+    def setUp(self):
+        data_file = str(tests_path / os.path.join("model_compression", "data"))
+        self.input_file = "step_profile_input.json"
+        self.output_file = "step_profile_train.json"
+        jdata = j_loader(
+            str(tests_path / os.path.join("model_compression", "input.json"))
+        )
+        jdata["training"]["training_data"]["systems"] = data_file
+        jdata["training"].pop("validation_data")
+        jdata["training"]["numb_steps"] = 4
+        jdata["training"]["disp_freq"] = 2
+        jdata["training"]["save_freq"] = 4
+        jdata["training"]["save_ckpt"] = "step_profile.ckpt"
+        jdata["training"]["disp_file"] = "step_profile_lcurve.out"
+        jdata["training"]["step_profiling"] = True
+        jdata["training"]["step_profiling_file"] = self.output_file
+        with open(self.input_file, "w") as fp:
+            json.dump(jdata, fp, indent=4)
+
+    def tearDown(self):
+        for ff in (
+            self.input_file,
+            self.output_file,
+            "step_profile_lcurve.out",
+            "out.json",
+            "checkpoint",
+        ):
+            if os.path.exists(ff):
+                os.remove(ff)
+        for ff in glob.glob("step_profile.ckpt*"):
+            os.remove(ff)
+
+    def test_slow_data(self):
+        delay = 0.5
+        get_batch = DeepmdDataSystem.get_batch
+
+        def slow_get_batch(data, *args, **kwargs):
+            time.sleep(delay)
+            return get_batch(data, *args, **kwargs)
+
+        with mock.patch.object(DeepmdDataSystem, "get_batch", slow_get_batch):
+            run_dp("dp train --skip-neighbor-stat " + self.input_file)
+        with open(self.output_file) as f:
+            phases = json.load(f)["phases"]
+        self.assertEqual(phases["data"]["count"], 4)
+        self.assertEqual(phases["run"]["count"], 4)
+        # loading the next batch within the session run is counted as data,
+        # which takes most of the run
+        self.assertGreaterEqual(phases["data"]["p50"], 0.9 * delay)
+        self.assertGreaterEqual(phases["run"]["p50"], 0.9 * delay)
+        self.assertGreater(phases["data"]["mean"], 0.5 * phases["run"]["mean"])
+
+
+if __name__ == "__main__":
+    unittest.main()